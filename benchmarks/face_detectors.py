@@ -0,0 +1,120 @@
+"""Compare face detector backends on CPU: per-frame latency and recall.
+
+Recall is measured against YOLO-format face labels when ``--labels`` is given
+(one ``<image stem>.txt`` per image, IoU >= 0.5 counts as a hit). Without
+labels each backend is scored against the union of what all backends found,
+which still shows which one misses faces the other sees.
+
+    python benchmarks/face_detectors.py
+    python benchmarks/face_detectors.py --images data/faces/images --labels data/faces/labels
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from utils.face_detection import BACKENDS, create_face_detector  # noqa: E402
+from utils.tiling import nms  # noqa: E402
+from utils.tracking import iou_matrix, xywh_to_xyxy  # noqa: E402
+
+# Training mosaics of the emotion model are mostly faces.
+BUNDLED_IMAGES = "model/emotion/yolov11_finetuned/*_batch*.jpg"
+RESOLUTIONS = ["640x480", "1280x720"]
+
+
+def load_images(pattern):
+    paths = sorted(glob.glob(pattern if os.path.isabs(pattern) else os.path.join(BASE_DIR, pattern)))
+    images = [(path, cv2.imread(path)) for path in paths]
+    return [(path, image) for path, image in images if image is not None]
+
+
+def load_labels(labels_dir, path, shape):
+    label_path = os.path.join(labels_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(label_path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    h, w = shape[:2]
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1).astype(np.float32)
+
+
+def matched(truth, found, threshold=0.5):
+    if len(truth) == 0 or len(found) == 0:
+        return 0
+    return int((iou_matrix(truth, found).max(axis=1) >= threshold).sum())
+
+
+def time_backend(detector, images, resolution, repeats):
+    width, height = (int(v) for v in resolution.split("x"))
+    frames = [cv2.resize(image, (width, height)) for _, image in images]
+    detector.detect(frames[0])
+    latencies = []
+    for _ in range(repeats):
+        for frame in frames:
+            start = time.perf_counter()
+            detector.detect(frame)
+            latencies.append(time.perf_counter() - start)
+    ms = np.array(latencies) * 1000
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends.")
+    parser.add_argument("--backends", nargs="+", default=sorted(BACKENDS), choices=sorted(BACKENDS))
+    parser.add_argument("--images", help="Directory or glob of images (defaults to the bundled mosaics)")
+    parser.add_argument("--labels", help="Directory of YOLO-format face labels for the images")
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=1, help="OpenCV threads (1 approximates one busy stream)")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.threads)
+    pattern = args.images or BUNDLED_IMAGES
+    if args.images and os.path.isdir(args.images):
+        pattern = os.path.join(args.images, "*")
+    images = load_images(pattern)
+    if not images:
+        parser.error(f"No images found for {pattern}")
+
+    detectors = {name: create_face_detector(name) for name in args.backends}
+    found = {name: [xywh_to_xyxy(detector.boxes(image)) for _, image in images] for name, detector in detectors.items()}
+    if args.labels:
+        truth = [load_labels(args.labels, path, image.shape) for path, image in images]
+    else:
+        # Reference set: union of all backends, with duplicates of the same face merged.
+        truth = []
+        for i in range(len(images)):
+            boxes = np.concatenate([found[name][i] for name in detectors]) if detectors else np.zeros((0, 4))
+            keep = nms(boxes, np.ones(len(boxes), dtype=np.float32), np.zeros(len(boxes), dtype=int)) if len(boxes) else []
+            truth.append(boxes[keep])
+
+    total = sum(len(t) for t in truth)
+    print(f"{len(images)} images, {total} reference faces ({'labels' if args.labels else 'union of backends'}), "
+          f"{args.threads} OpenCV thread(s)")
+    header = f"{'backend':<8} {'recall':>7} {'found':>6}"
+    for resolution in args.resolutions:
+        header += f" {resolution + ' p50':>14} {'p95':>7}"
+    print(header)
+    for name, detector in detectors.items():
+        if detector.name != name:
+            print(f"{name:<8} unavailable, fell back to {detector.name}")
+            continue
+        hits = sum(matched(t, f) for t, f in zip(truth, found[name]))
+        line = f"{name:<8} {hits / total if total else 0.0:7.3f} {sum(len(f) for f in found[name]):6d}"
+        for resolution in args.resolutions:
+            p50, p95 = time_backend(detector, images, resolution, args.repeats)
+            line += f" {p50:12.2f}ms {p95:5.2f}ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Replay frame sequences through every video callback and record per-frame cost.
+
+Each (callback, resolution) case runs in its own interpreter so peak RSS is
+attributable to that case. Results are written as JSON and can be compared
+against a previous run:
+
+    python benchmarks/frame_callbacks.py --out bench.json
+    python benchmarks/frame_callbacks.py --out new.json --compare bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+CALLBACKS = [
+    "exam_supervisor",
+    "attendance_monitoring",
+    "emotion_detector",
+    "face_capture",
+    "face_verification",
+]
+
+RESOLUTIONS = ["320x240", "640x480", "1280x720", "1920x1080"]
+
+# Mosaics of real training images shipped with the repo; they contain faces and people.
+BUNDLED_FRAMES = [
+    "model/cheating/yolov9m_finetuned/val_batch*_labels.jpg",
+    "model/emotion/yolov11_finetuned/val_batch*_labels.jpg",
+]
+
+
+def load_frames(resolution, count, video=None):
+    """Return ``count`` av.VideoFrame objects at ``resolution``."""
+    import av
+    import cv2
+    import numpy as np
+
+    width, height = (int(v) for v in resolution.split("x"))
+    sources = []
+    if video:
+        with av.open(video) as container:
+            for frame in container.decode(video=0):
+                sources.append(frame.to_ndarray(format="bgr24"))
+                if len(sources) >= count:
+                    break
+    else:
+        for pattern in BUNDLED_FRAMES:
+            for path in sorted(glob.glob(os.path.join(BASE_DIR, pattern))):
+                image = cv2.imread(path)
+                if image is not None:
+                    sources.append(image)
+    if not sources:
+        rng = np.random.default_rng(0)
+        sources = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8)]
+
+    frames = []
+    for i in range(count):
+        image = cv2.resize(sources[i % len(sources)], (width, height))
+        # Small horizontal drift so consecutive frames are not identical.
+        image = np.roll(image, (i * 3) % width, axis=1)
+        frames.append(av.VideoFrame.from_ndarray(image, format="bgr24"))
+    return frames
+
+
+def require_models(*names):
+    """Wait for ``names`` to load; raise with the manager's error so the case is reported as failed.
+
+    A callback without its model returns the frame untouched, which would
+    otherwise look like an implausibly fast measurement.
+    """
+    from utils.model_manager import get_model_manager
+    manager = get_model_manager()
+    for name in names:
+        if manager.get(name) is None:
+            raise RuntimeError(f"model {name!r} not loaded: {manager.errors.get(name) or manager.status.get(name)}")
+
+
+def build_callback(name):
+    """Import the app module behind ``name`` with stubs and return a frame -> output callable."""
+    from benchmarks.stubs import install_stubs
+
+    st = install_stubs()
+    st.session_state.monitoring = True
+
+    if name == "exam_supervisor":
+        from modules import exam_supervisor
+        require_models("cheating", *(["person_gate"] if exam_supervisor.gate_config["enabled"] else []))
+
+        def run(frame):
+            out = exam_supervisor.video_frame_callback(frame)
+            while not exam_supervisor.result_queue.empty():
+                exam_supervisor.result_queue.get_nowait()
+            return out
+        return run
+
+    if name == "attendance_monitoring":
+        from modules import attendance_monitoring
+        require_models("person")
+        attendance_monitoring.global_seats.update({
+            label: {"region": (25 + i * 150, 150, 100, 100), "occupied": False,
+                    "start_time": None, "accumulated_time": 0.0}
+            for i, label in enumerate("ABCD")
+        })
+
+        def run(frame):
+            out = attendance_monitoring.video_frame_callback(frame)
+            while not attendance_monitoring.seat_updates_queue.empty():
+                attendance_monitoring.seat_updates_queue.get_nowait()
+            return out
+        return run
+
+    if name == "emotion_detector":
+        from model.emotion.emotion_model import EmotionDetector
+        require_models("emotion")
+        return EmotionDetector().recv
+
+    if name == "face_capture":
+        from modules.face_registration import FaceCaptureProcessor
+        return FaceCaptureProcessor("benchmark").recv
+
+    if name == "face_verification":
+        from modules.face_verification import FaceVerificationTransformer
+        return FaceVerificationTransformer().transform
+
+    raise ValueError(f"Unknown callback: {name}")
+
+
+def run_case(name, resolution, frames, warmup, video=None):
+    import numpy as np
+
+    result = {"callback": name, "resolution": resolution, "frames": frames}
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            callback = build_callback(name)
+            sequence = load_frames(resolution, frames + warmup, video)
+            for frame in sequence[:warmup]:
+                callback(frame)
+            latencies = []
+            start = time.perf_counter()
+            for frame in sequence[warmup:]:
+                t = time.perf_counter()
+                callback(frame)
+                latencies.append(time.perf_counter() - t)
+            total = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    ms = np.array(latencies) * 1000
+    result.update({
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "fps": frames / total if total > 0 else 0.0,
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    })
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r["callback"], r["resolution"]): r for r in baseline["results"]}
+    header = f"{'callback':<22} {'resolution':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fps':>7} {'rss MB':>8}"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    for r in results:
+        if "error" in r:
+            print(f"{r['callback']:<22} {r['resolution']:<10} error: {r['error']}")
+            continue
+        line = (f"{r['callback']:<22} {r['resolution']:<10} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+                f"{r['p99_ms']:8.2f} {r['fps']:7.1f} {r['peak_rss_mb']:8.1f}")
+        old = previous.get((r["callback"], r["resolution"]))
+        if old and "p95_ms" in old and old["p95_ms"] > 0:
+            line += f"  {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AiSee frame callbacks.")
+    parser.add_argument("--callbacks", nargs="+", default=CALLBACKS, choices=CALLBACKS)
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--video", help="Replay this video file instead of the bundled images")
+    parser.add_argument("--out", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare p95 latency against")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(BASE_DIR)
+
+    if args.case:
+        name, resolution = args.case.split("@")
+        print(json.dumps(run_case(name, resolution, args.frames, args.warmup, args.video)))
+        return
+
+    results = []
+    for name in args.callbacks:
+        for resolution in args.resolutions:
+            cmd = [sys.executable, os.path.abspath(__file__), "--case", f"{name}@{resolution}",
+                   "--frames", str(args.frames), "--warmup", str(args.warmup)]
+            if args.video:
+                cmd += ["--video", args.video]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            try:
+                results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (IndexError, json.JSONDecodeError):
+                error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"
+                results.append({"callback": name, "resolution": resolution, "error": error})
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
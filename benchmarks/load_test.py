@@ -0,0 +1,440 @@
+"""Multi-client WebRTC load test for the video pages, entirely on localhost.
+
+A server process hosts one page's frame callback the way streamlit-webrtc
+does: every peer connection gets its own worker that always processes the
+newest received frame and drops the rest. The harness then opens N headless
+aiortc clients that stream video into it, sweeping N:
+
+    python benchmarks/load_test.py --page exam_supervisor --clients 1 2 4 8
+    python benchmarks/load_test.py --page face_verification --video clip.mp4 --out load.json
+
+Each client stamps a frame number into the pixels it sends and reads it back
+from the returned video, which gives round-trip latency and dropped frames
+without relying on RTP timestamps. Server CPU and RSS are sampled from the
+server process. No STUN/TURN servers are configured; ICE uses host candidates.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.frame_callbacks import CALLBACKS, load_frames  # noqa: E402
+
+### Frame stamps ###
+# 12-bit frame number + 4-bit checksum, drawn as 16x16 black/white blocks in
+# the bottom-left corner so it survives VP8 compression.
+STAMP_BITS = 16
+STAMP_BLOCK = 16
+STAMP_MODULO = 1 << 12
+
+
+def _checksum(value):
+    return (value + (value >> 4) + (value >> 8)) & 0xF
+
+
+def stamp(image, frame_id):
+    value = (frame_id << 4) | _checksum(frame_id)
+    h = image.shape[0]
+    for bit in range(STAMP_BITS):
+        x = bit * STAMP_BLOCK
+        image[h - STAMP_BLOCK:h, x:x + STAMP_BLOCK] = 255 if value >> (STAMP_BITS - 1 - bit) & 1 else 0
+    return image
+
+
+def read_stamp(image):
+    h = image.shape[0]
+    quarter = STAMP_BLOCK // 4
+    value = 0
+    for bit in range(STAMP_BITS):
+        x = bit * STAMP_BLOCK
+        block = image[h - STAMP_BLOCK + quarter:h - quarter, x + quarter:x + STAMP_BLOCK - quarter]
+        value = (value << 1) | int(block.mean() > 127)
+    frame_id = value >> 4
+    return frame_id if _checksum(frame_id) == value & 0xF else None
+
+
+def rtc_configuration():
+    from aiortc import RTCConfiguration
+    return RTCConfiguration(iceServers=[])
+
+
+### Server ###
+def to_video_frame(output, source):
+    import av
+    frame = output if isinstance(output, av.VideoFrame) else av.VideoFrame.from_ndarray(output, format="bgr24")
+    frame.pts = source.pts
+    frame.time_base = source.time_base
+    return frame
+
+
+class ProcessedTrack:
+    """Outgoing track that runs ``callback`` on the newest incoming frame, dropping stale ones."""
+
+    def __init__(self, source, callback, stats):
+        from aiortc import MediaStreamTrack
+
+        class Track(MediaStreamTrack):
+            kind = "video"
+
+            async def recv(track):
+                return await self.results.get()
+
+        self.track = Track()
+        self.source = source
+        self.callback = callback
+        self.stats = stats
+        self.latest = None
+        self.new_frame = asyncio.Event()
+        self.results = asyncio.Queue(maxsize=2)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.tasks = [asyncio.ensure_future(self._receive()), asyncio.ensure_future(self._process())]
+
+    async def _receive(self):
+        with contextlib.suppress(Exception):
+            while True:
+                frame = await self.source.recv()
+                if self.latest is not None:
+                    self.stats["dropped"] += 1
+                self.latest = frame
+                self.new_frame.set()
+
+    async def _process(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.new_frame.wait()
+            self.new_frame.clear()
+            frame, self.latest = self.latest, None
+            if frame is None:
+                continue
+            output = await loop.run_in_executor(self.executor, self.callback, frame)
+            self.stats["processed"] += 1
+            if self.results.full():
+                self.results.get_nowait()
+            self.results.put_nowait(to_video_frame(output, frame))
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False)
+
+
+async def serve(page, port):
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from benchmarks.frame_callbacks import build_callback
+
+    with contextlib.redirect_stdout(sys.stderr):
+        build_callback(page)
+    stats = {"connections": 0, "processed": 0, "dropped": 0}
+
+    async def handle(reader, writer):
+        offer = json.loads(await reader.readline())
+        pc = RTCPeerConnection(rtc_configuration())
+        with contextlib.redirect_stdout(sys.stderr):
+            callback = build_callback(page)
+        processed = []
+
+        @pc.on("track")
+        def on_track(track):
+            if track.kind == "video":
+                processed.append(ProcessedTrack(track, callback, stats))
+                pc.addTrack(processed[-1].track)
+
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=offer["sdp"], type=offer["type"]))
+        await pc.setLocalDescription(await pc.createAnswer())
+        writer.write((json.dumps({"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}) + "\n").encode())
+        await writer.drain()
+        stats["connections"] += 1
+        # The signalling socket stays open for the life of the connection.
+        await reader.read()
+        for item in processed:
+            item.stop()
+        await pc.close()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    print(json.dumps({"ready": port}), flush=True)
+    async with server:
+        while True:
+            await asyncio.sleep(5)
+            print(json.dumps(stats), file=sys.stderr, flush=True)
+
+
+### Clients ###
+class LoadClient:
+    def __init__(self, index, port, page, frames, fps):
+        self.index = index
+        self.port = port
+        self.page = page
+        self.frames = frames
+        self.fps = fps
+        self.sent_at = {}
+        self.latencies = []
+        self.sent = 0
+        self.received = 0
+        self.unreadable = 0
+        self.measuring = False
+        self.pc = None
+        self.writer = None
+        self.reader_task = None
+
+    def _source_track(self):
+        from aiortc import MediaStreamTrack
+        import av
+        client = self
+
+        class Track(MediaStreamTrack):
+            kind = "video"
+
+            def __init__(track):
+                super().__init__()
+                track.count = 0
+                track.start = None
+
+            async def recv(track):
+                if track.start is None:
+                    track.start = time.perf_counter()
+                target = track.start + track.count / client.fps
+                await asyncio.sleep(max(0.0, target - time.perf_counter()))
+                frame_id = track.count % STAMP_MODULO
+                image = stamp(client.frames[track.count % len(client.frames)].copy(), frame_id)
+                if client.measuring:
+                    client.sent_at[frame_id] = time.perf_counter()
+                    client.sent += 1
+                frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+                frame.pts = track.count * int(90000 / client.fps)
+                frame.time_base = client.time_base
+                track.count += 1
+                return frame
+
+        return Track()
+
+    async def _read(self, track):
+        with contextlib.suppress(Exception):
+            while True:
+                frame = await track.recv()
+                now = time.perf_counter()
+                frame_id = read_stamp(frame.to_ndarray(format="bgr24"))
+                if frame_id is None:
+                    self.unreadable += int(self.measuring)
+                    continue
+                sent = self.sent_at.pop(frame_id, None)
+                if sent is not None:
+                    self.received += 1
+                    self.latencies.append(now - sent)
+
+    async def connect(self):
+        from fractions import Fraction
+        from aiortc import RTCPeerConnection, RTCSessionDescription
+
+        self.time_base = Fraction(1, 90000)
+        self.pc = RTCPeerConnection(rtc_configuration())
+        self.pc.addTransceiver(self._source_track(), direction="sendrecv")
+
+        @self.pc.on("track")
+        def on_track(track):
+            self.reader_task = asyncio.ensure_future(self._read(track))
+
+        await self.pc.setLocalDescription(await self.pc.createOffer())
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        offer = {"sdp": self.pc.localDescription.sdp, "type": self.pc.localDescription.type, "page": self.page}
+        self.writer.write((json.dumps(offer) + "\n").encode())
+        await self.writer.drain()
+        answer = json.loads(await reader.readline())
+        await self.pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+
+    async def close(self):
+        if self.reader_task:
+            self.reader_task.cancel()
+        if self.pc:
+            await self.pc.close()
+        if self.writer:
+            self.writer.close()
+
+    def result(self, duration):
+        ms = np.array(self.latencies) * 1000
+        return {
+            "client": self.index,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.sent - self.received,
+            "unreadable": self.unreadable,
+            "fps": self.received / duration if duration else 0.0,
+            "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+            "p95_ms": float(np.percentile(ms, 95)) if len(ms) else None,
+        }
+
+
+### Server resource sampling ###
+class ProcessSampler(threading.Thread):
+    """Sample CPU time and RSS of a process from /proc (or psutil where /proc is missing)."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.stop_event = threading.Event()
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except OSError:
+            import psutil
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            import psutil
+            return psutil.Process(self.pid).memory_info().rss / (1024 * 1024)
+        return 0.0
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            with contextlib.suppress(Exception):
+                self.peak_rss_mb = max(self.peak_rss_mb, self.rss_mb())
+
+    def stop(self):
+        self.stop_event.set()
+
+
+async def run_level(n, args, frames, sampler):
+    clients = [LoadClient(i, args.port, args.page, frames, args.fps) for i in range(n)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    await asyncio.sleep(args.warmup)
+
+    sampler.peak_rss_mb = 0.0
+    cpu_start, start = sampler.cpu_seconds(), time.perf_counter()
+    for client in clients:
+        client.measuring = True
+    await asyncio.sleep(args.duration)
+    for client in clients:
+        client.measuring = False
+    duration = time.perf_counter() - start
+    cpu = sampler.cpu_seconds() - cpu_start
+    # Let in-flight frames come back before counting drops.
+    await asyncio.sleep(args.drain)
+    await asyncio.gather(*(client.close() for client in clients))
+
+    per_client = [client.result(duration) for client in clients]
+    latencies = np.concatenate([np.array(c.latencies) for c in clients]) * 1000 if clients else np.array([])
+    sent = sum(c["sent"] for c in per_client)
+    dropped = sum(c["dropped"] for c in per_client)
+    return {
+        "clients": n,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "drop_rate": dropped / sent if sent else 1.0,
+        "fps_per_client": float(np.mean([c["fps"] for c in per_client])),
+        "server_cpu_pct": cpu / duration * 100,
+        "server_peak_rss_mb": sampler.peak_rss_mb,
+        "per_client": per_client,
+    }
+
+
+def saturated(level, args):
+    return (level["p95_ms"] is None or level["p95_ms"] > args.max_latency_ms
+            or level["drop_rate"] > args.max_drop_rate)
+
+
+def start_server(args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--page", args.page, "--port", str(args.port)]
+    server = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL, text=True)
+    ready = queue.Queue()
+    threading.Thread(target=lambda: ready.put(server.stdout.readline()), daemon=True).start()
+    try:
+        line = ready.get(timeout=args.startup_timeout)
+    except queue.Empty:
+        line = ""
+    if '"ready"' not in line:
+        server.kill()
+        raise RuntimeError("Load-test server did not start; rerun with --verbose for its output.")
+    return server
+
+
+async def sweep(args, server):
+    frames = [frame.to_ndarray(format="bgr24") for frame in load_frames(args.resolution, args.source_frames, args.video)]
+    sampler = ProcessSampler(server.pid)
+    sampler.start()
+    levels = []
+    saturation = None
+    print(f"{'clients':>7} {'p50 ms':>8} {'p95 ms':>8} {'drop %':>7} {'fps/client':>10} {'cpu %':>7} {'rss MB':>8}")
+    for n in args.clients:
+        level = await run_level(n, args, frames, sampler)
+        levels.append(level)
+        fmt = lambda v: f"{v:8.1f}" if v is not None else f"{'-':>8}"
+        print(f"{n:7d} {fmt(level['p50_ms'])} {fmt(level['p95_ms'])} {level['drop_rate'] * 100:7.1f} "
+              f"{level['fps_per_client']:10.1f} {level['server_cpu_pct']:7.1f} {level['server_peak_rss_mb']:8.1f}")
+        if saturated(level, args):
+            saturation = n
+            if not args.full_sweep:
+                break
+    sampler.stop()
+    return levels, saturation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep concurrent WebRTC clients against one page's callback.")
+    parser.add_argument("--page", default="exam_supervisor", choices=CALLBACKS)
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--video", help="Stream this video file instead of the bundled images")
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds after connecting before measuring")
+    parser.add_argument("--drain", type=float, default=2.0)
+    parser.add_argument("--source-frames", type=int, default=60)
+    parser.add_argument("--max-latency-ms", type=float, default=500.0, help="p95 latency treated as saturated")
+    parser.add_argument("--max-drop-rate", type=float, default=0.2, help="Drop rate treated as saturated")
+    parser.add_argument("--full-sweep", action="store_true", help="Keep going after the saturation point")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(BASE_DIR)
+    if args.serve:
+        asyncio.run(serve(args.page, args.port))
+        return
+
+    server = start_server(args)
+    try:
+        levels, saturation = asyncio.run(sweep(args, server))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    if saturation is None:
+        print(f"Not saturated up to {args.clients[-1]} client(s).")
+    else:
+        print(f"Saturated at {saturation} client(s) (p95 > {args.max_latency_ms:.0f} ms or drops > {args.max_drop_rate:.0%}).")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"page": args.page, "resolution": args.resolution, "fps": args.fps,
+                       "saturation": saturation, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Report cold import and first-render latency of the Streamlit app.
+
+Runs with stubbed secrets, so no Firebase or Cloudinary account is needed:
+
+    python benchmarks/startup.py [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+STUB_SECRETS = {
+    "CLOUDINARY_CLOUD_NAME": "stub",
+    "CLOUDINARY_API_KEY": "stub",
+    "CLOUDINARY_API_SECRET": "stub",
+    "FIREBASE_SERVICE_ACCOUNT": {
+        "type": "service_account",
+        "project_id": "stub",
+        "private_key_id": "stub",
+        "private_key": "stub",
+        "client_email": "stub@example.com",
+        "client_id": "stub",
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": "stub",
+        "universe_domain": "googleapis.com",
+    },
+}
+
+IMPORT_TARGETS = [
+    "streamlit",
+    "utils.auth",
+    "modules.face_registration",
+    "modules.face_verification",
+    "modules.attendance_monitoring",
+    "modules.exam_supervisor",
+]
+
+PAGES = ["Face Registration", "Face Verification", "Attendance Monitoring", "Exam Supervisor"]
+
+
+def cold_import_time(module):
+    """Import ``module`` in a fresh interpreter and return seconds spent."""
+    code = (
+        "import time, importlib; t = time.perf_counter(); "
+        f"importlib.import_module({module!r}); print(time.perf_counter() - t)"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    return {"seconds": float(proc.stdout.strip())}
+
+
+def render_time(at):
+    start = time.perf_counter()
+    error = None
+    try:
+        at.run()
+        if at.exception:
+            error = str(at.exception[0].message)
+    except Exception as e:
+        error = str(e)
+    result = {"seconds": time.perf_counter() - start}
+    if error:
+        result["error"] = error
+    return result
+
+
+def new_app():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(BASE_DIR, "main.py"), default_timeout=120)
+    for key, value in STUB_SECRETS.items():
+        at.secrets[key] = value
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(BASE_DIR)
+    results = {"imports": {}, "render": {}}
+
+    for module in IMPORT_TARGETS:
+        results["imports"][module] = cold_import_time(module)
+
+    at = new_app()
+    results["render"]["login"] = render_time(at)
+    results["render"]["login_rerun"] = render_time(at)
+
+    for page in PAGES:
+        at = new_app()
+        at.session_state["logged_in"] = True
+        at.session_state["page"] = page
+        results["render"][page] = render_time(at)
+
+    for section, entries in results.items():
+        print(f"== {section}")
+        for name, entry in entries.items():
+            line = f"{name:<36} {entry['seconds'] * 1000:9.1f} ms" if "seconds" in entry else f"{name:<36} {'-':>12}"
+            if "error" in entry:
+                line += f"  ({entry['error']})"
+            print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
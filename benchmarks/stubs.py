@@ -0,0 +1,80 @@
+"""Lightweight stand-ins for Streamlit, streamlit-webrtc, Firebase and Cloudinary.
+
+Benchmarks import the page modules directly; these stubs let them do so
+without a running Streamlit server or real credentials.
+"""
+import enum
+import functools
+import sys
+import types
+
+
+class SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def _cache_resource(func=None, **kwargs):
+    if func is None:
+        return lambda f: _cache_resource(f, **kwargs)
+    cached = functools.lru_cache(maxsize=None)(func)
+    cached.clear = cached.cache_clear
+    return cached
+
+
+class _StubModule(types.ModuleType):
+    """Module whose unknown attributes are no-op callables."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _noop
+
+
+def _streamlit():
+    st = _StubModule("streamlit")
+    st.cache_resource = _cache_resource
+    st.cache_data = _cache_resource
+    st.session_state = SessionState()
+    st.secrets = {}
+    return st
+
+
+def _streamlit_webrtc():
+    webrtc = _StubModule("streamlit_webrtc")
+
+    class VideoProcessorBase:
+        pass
+
+    class WebRtcMode(enum.Enum):
+        RECVONLY = "recvonly"
+        SENDONLY = "sendonly"
+        SENDRECV = "sendrecv"
+
+    webrtc.VideoProcessorBase = VideoProcessorBase
+    webrtc.VideoTransformerBase = VideoProcessorBase
+    webrtc.WebRtcMode = WebRtcMode
+    return webrtc
+
+
+def install_stubs():
+    """Register the stubs in ``sys.modules``; call before importing app modules."""
+    st = sys.modules["streamlit"] = _streamlit()
+    st.components = sys.modules["streamlit.components"] = _StubModule("streamlit.components")
+    st.components.v1 = sys.modules["streamlit.components.v1"] = _StubModule("streamlit.components.v1")
+    sys.modules["streamlit_webrtc"] = _streamlit_webrtc()
+    for name in ("firebase_admin", "firebase_admin.credentials", "firebase_admin.firestore",
+                 "cloudinary", "cloudinary.api", "cloudinary.uploader"):
+        sys.modules[name] = _StubModule(name)
+    sys.modules["firebase_admin"]._apps = {}
+    return sys.modules["streamlit"]
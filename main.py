@@ -1,6 +1,20 @@
+import importlib
 import streamlit as st
 from utils.auth import login_form
-from modules import face_registration, face_verification, attendance_monitoring, exam_supervisor
+from utils.model_manager import get_model_manager
+from utils.face_detection import start_face_detector
+from utils import metrics
+
+PAGE_MODULES = {
+    "Face Registration": "modules.face_registration",
+    "Face Verification": "modules.face_verification",
+    "Attendance Monitoring": "modules.attendance_monitoring",
+    "Exam Supervisor": "modules.exam_supervisor",
+}
+
+def load_page(page_name):
+    """Import a page module on first navigation; later calls hit the import cache."""
+    return importlib.import_module(PAGE_MODULES[page_name])
 
 st.set_page_config(
     page_title="AIsee - Intelligent Student Monitoring",
@@ -89,6 +103,10 @@ def load_css():
     """, unsafe_allow_html=True)
 
 load_css()
+get_model_manager()
+start_face_detector()
+if metrics.enabled():
+    metrics.start_metrics_server()
 
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -127,19 +145,23 @@ def render_sidebar():
             st.rerun()
         st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
+def teardown_previous_page(page):
+    """Let the page the user just left stop its background work (via an optional ``teardown()``)."""
+    previous = st.session_state.get("rendered_page")
+    if previous != page and previous in PAGE_MODULES:
+        teardown = getattr(load_page(previous), "teardown", None)
+        if teardown is not None:
+            teardown()
+    st.session_state.rendered_page = page
+
 def render_main():
     if not st.session_state.logged_in:
         login_form()
     else:
         page = st.session_state.page
-        if page == "Face Registration":
-            face_registration.render()
-        elif page == "Face Verification":
-            face_verification.render()
-        elif page == "Attendance Monitoring":
-            attendance_monitoring.render()
-        elif page == "Exam Supervisor":
-            exam_supervisor.render()
+        teardown_previous_page(page)
+        if page in PAGE_MODULES:
+            load_page(page).render()
 
 render_sidebar()
 render_main()
@@ -1,33 +1,108 @@
+import atexit
+import logging
+import threading
 import cv2
 import time
 import numpy as np
+from utils.face_detection import get_recognition_detector
 
-face_cascade = cv2.CascadeClassifier('model/absensi/haarcascade_frontalface_default.xml')
+logger = logging.getLogger(__name__)
 
-def detect_faces_from_camera(timeout=5, num_images=10, streamlit_placeholder=None):
-    cap = cv2.VideoCapture(0)
-    collected_faces = []
-    start_time = time.time()
+class FaceCollector:
+    """Keeps a camera open between enrollments and streams face crops as they are detected."""
+
+    def __init__(self, camera_index=0, thumb_size=24, min_difference=12.0):
+        self.camera_index = camera_index
+        self.thumb_size = thumb_size
+        self.min_difference = min_difference
+        self.cap = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        if self.cap is None or not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(self.camera_index)
+        return self.cap
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _thumbnail(self, face):
+        return cv2.resize(face, (self.thumb_size, self.thumb_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _is_distinct(self, thumb, thumbs):
+        """A crop counts only if it differs enough from every crop already kept."""
+        return all(np.mean(np.abs(thumb - other)) >= self.min_difference for other in thumbs)
 
-    while time.time() - start_time < timeout and len(collected_faces) < num_images:
-        ret, frame = cap.read()
-        if not ret:
-            continue
+    def read(self):
+        """Grab one frame; the lock covers only the capture, never a consumer."""
+        with self.lock:
+            return self.open().read()
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+    def stream_faces(self, num_images=10, timeout=5, streamlit_placeholder=None, preview_fps=5,
+                     max_read_failures=20, retry_delay=0.05):
+        """Yield distinct grayscale face crops until ``num_images`` are collected or ``timeout`` expires.
 
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            face = gray[y:y + h, x:x + w]
-            collected_faces.append(face)
-            break
+        Failed reads back off (up to 0.5 s); after ``max_read_failures`` in a row
+        the camera is released so the next call reopens it, and the stream ends.
+        """
+        thumbs = []
+        start_time = time.time()
+        last_preview = 0.0
+        preview_interval = 1.0 / preview_fps if preview_fps else None
+        failures = 0
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        if streamlit_placeholder:
-            streamlit_placeholder.image(rgb_frame, channels="RGB")
+        while time.time() - start_time < timeout and len(thumbs) < num_images:
+            ret, frame = self.read()
+            if not ret:
+                failures += 1
+                if failures >= max_read_failures:
+                    logger.warning("Camera %s returned no frames %d times in a row; giving up.",
+                                   self.camera_index, failures)
+                    with self.lock:
+                        self.release()
+                    return
+                time.sleep(min(retry_delay * 2 ** (failures - 1), 0.5))
+                continue
+            failures = 0
 
-        cv2.waitKey(100)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            detector = get_recognition_detector()
+            faces = detector.boxes(frame) if detector is not None else []
 
-    cap.release()
-    return collected_faces
+            new_face = None
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                face = gray[y:y + h, x:x + w]
+                thumb = self._thumbnail(face)
+                if self._is_distinct(thumb, thumbs):
+                    thumbs.append(thumb)
+                    new_face = face
+                break
+
+            now = time.time()
+            if streamlit_placeholder and preview_interval and now - last_preview >= preview_interval:
+                streamlit_placeholder.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB")
+                last_preview = now
+            if new_face is not None:
+                yield new_face
+
+_collectors = {}
+_collectors_lock = threading.Lock()
+
+def get_collector(camera_index=0):
+    """Return the process-wide collector for a camera, creating it on first use."""
+    with _collectors_lock:
+        if camera_index not in _collectors:
+            _collectors[camera_index] = FaceCollector(camera_index)
+        return _collectors[camera_index]
+
+@atexit.register
+def release_cameras():
+    for collector in _collectors.values():
+        collector.release()
+
+def detect_faces_from_camera(timeout=5, num_images=10, streamlit_placeholder=None):
+    return list(get_collector().stream_faces(num_images=num_images, timeout=timeout,
+                                             streamlit_placeholder=streamlit_placeholder))
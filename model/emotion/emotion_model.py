@@ -1,25 +1,183 @@
-import streamlit as st
+import threading
+import time
 import cv2
 import av
+import numpy as np
 from streamlit_webrtc import VideoProcessorBase
-from ultralytics import YOLO
+from utils.model_manager import get_model_manager
+from utils.tracking import IoUTracker, xywh_to_xyxy
+from utils.detections import DetectionBatch
+from utils import metrics
+from utils.face_detection import get_face_detector
+from utils.governor import get_governor
+from utils.inference_profile import predict_kwargs
+from utils.video_profile import working_frame
+
+STREAM = "emotion_detector"
 
-@st.cache_resource
 def load_model():
-    return YOLO('./emotion-yolov11-model/yolov11_finetuned.pt')
+    return get_model_manager().get("emotion", wait=False)
+
+class SeatEmotionCounters:
+    """Per-seat emotion counts: lifetime totals plus an exponentially decayed recent view.
+
+    Memory is one pair of arrays per seat, sized by the number of emotion classes.
+    """
+    def __init__(self, num_classes, half_life=60.0):
+        self.num_classes = num_classes
+        self.decay_rate = np.log(2) / half_life
+        self.totals = {}
+        self.recent = {}
+        self.updated = {}
+        self.lock = threading.Lock()
+
+    def add(self, seat, class_id, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            if seat not in self.totals:
+                self.totals[seat] = np.zeros(self.num_classes, dtype=np.int64)
+                self.recent[seat] = np.zeros(self.num_classes, dtype=np.float64)
+                self.updated[seat] = now
+            self.recent[seat] *= np.exp(-self.decay_rate * (now - self.updated[seat]))
+            self.updated[seat] = now
+            self.totals[seat][class_id] += 1
+            self.recent[seat][class_id] += 1.0
+
+    def distribution(self, seat, recent=True):
+        with self.lock:
+            counts = (self.recent if recent else self.totals).get(seat)
+            if counts is None or counts.sum() == 0:
+                return None
+            return counts / counts.sum()
+
+    def seats(self):
+        with self.lock:
+            return list(self.totals)
 
 class EmotionDetector(VideoProcessorBase):
-    def __init__(self):
+    """Classify emotions on tracked face crops at a reduced cadence.
+
+    Faces are detected every ``detect_every`` frames and tracked in between.
+    Each track keeps its last label for ``ttl`` seconds; only tracks whose
+    label is missing or stale are sent to the emotion model, in one batch.
+    """
+    def __init__(self, seats_provider=None, detect_every=3, ttl=1.5, detect_scale=0.5, crop_margin=0.25, profile=None):
         self.model = load_model()
-    
-    def recv(self, frame):
-        img = frame.to_ndarray(format="bgr24")
-        results = self.model(img)
-        for box in results[0].boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            conf = box.conf[0].item()
-            cls = box.cls[0].item()
-            label = self.model.names[cls]
+        self.profile = profile
+        self.seats_provider = seats_provider
+        self.detect_every = detect_every
+        self.ttl = ttl
+        self.detect_scale = detect_scale
+        self.crop_margin = crop_margin
+        self.tracker = IoUTracker(iou_threshold=0.3, max_missed=detect_every * 2)
+        self.cache = {}
+        self.frame_index = 0
+        self.counters = None
+
+    def detect_tracks(self, img):
+        small = cv2.resize(img, None, fx=self.detect_scale, fy=self.detect_scale, interpolation=cv2.INTER_AREA)
+        faces = get_face_detector().boxes(small)
+        tracks, _ = self.tracker.update(xywh_to_xyxy(faces) / self.detect_scale)
+        live_ids = set(self.tracker.tracks)
+        for track_id in list(self.cache):
+            if track_id not in live_ids:
+                del self.cache[track_id]
+        return tracks
+
+    def crop(self, img, box):
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = box
+        mx = (x2 - x1) * self.crop_margin
+        my = (y2 - y1) * self.crop_margin
+        return img[max(int(y1 - my), 0):min(int(y2 + my), h), max(int(x1 - mx), 0):min(int(x2 + mx), w)]
+
+    def classify(self, img, tracks, now, imgsz=None):
+        stale = [t for t in tracks if now - self.cache.get(t.track_id, (None, 0.0, 0.0, None))[2] > self.ttl]
+        crops = [self.crop(img, t.box) for t in stale]
+        pairs = [(t, c) for t, c in zip(stale, crops) if c.size > 0]
+        if not pairs:
+            return
+        results = self.model.predict([c for _, c in pairs], verbose=False, **predict_kwargs("emotion", imgsz))
+        for (track, _), result in zip(pairs, results):
+            batch = DetectionBatch.from_result(result)
+            if len(batch) == 0:
+                self.cache[track.track_id] = (None, 0.0, now, None)
+                continue
+            best = int(np.argmax(batch.scores))
+            class_id = int(batch.class_ids[best])
+            self.cache[track.track_id] = (self.model.names[class_id], float(batch.scores[best]), now, class_id)
+            self.record_seat(track.box, class_id, now)
+
+    def record_seat(self, box, class_id, now):
+        if self.seats_provider is None:
+            return
+        if self.counters is None:
+            self.counters = SeatEmotionCounters(len(self.model.names))
+        cx = (box[0] + box[2]) / 2
+        cy = (box[1] + box[3]) / 2
+        for label, seat_data in self.seats_provider().items():
+            sx, sy, sw, sh = seat_data["region"]
+            if sx <= cx <= sx + sw and sy <= cy <= sy + sh:
+                self.counters.add(label, class_id, now)
+                break
+
+    def seat_distribution(self, recent=True):
+        """Return {seat: {emotion: share}} from the streaming counters."""
+        if self.counters is None:
+            return {}
+        names = self.model.names
+        out = {}
+        for seat in self.counters.seats():
+            dist = self.counters.distribution(seat, recent=recent)
+            if dist is not None:
+                out[seat] = {names[i]: float(p) for i, p in enumerate(dist) if p > 0}
+        return out
+
+    def analyze(self, img, decision, now=None):
+        """Track faces in a BGR working frame and classify stale tracks.
+
+        Returns (box, label, confidence) per live track for drawing; ``label``
+        is None until the track has been classified. Used by ``recv`` and by
+        pages that run emotion inside their own frame callback.
+        """
+        if self.model is None:
+            self.model = load_model()
+            if self.model is None:
+                return []
+        now = time.time() if now is None else now
+        with metrics.span(STREAM, "detect"):
+            if decision.run and self.frame_index % self.detect_every == 0:
+                tracks = self.detect_tracks(img)
+            else:
+                tracks = [t for t in self.tracker.tracks.values() if t.missed == 0]
+        self.frame_index += 1
+        if decision.run:
+            with metrics.span(STREAM, "predict"):
+                self.classify(img, tracks, now, imgsz=decision.imgsz)
+        faces = []
+        for track in tracks:
+            label, conf, _, _ = self.cache.get(track.track_id, (None, 0.0, 0.0, None))
+            faces.append((track.box, label, conf))
+        return faces
+
+    @staticmethod
+    def draw(img, faces):
+        for box, label, conf in faces:
+            x1, y1, x2, y2 = map(int, box)
             cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(img, f"{label} {conf:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-        return av.VideoFrame.from_ndarray(img, format="bgr24")
\ No newline at end of file
+            if label is not None:
+                cv2.putText(img, f"{label} {conf:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+        return img
+
+    def recv(self, frame):
+        with metrics.span(STREAM, "to_ndarray"):
+            img = working_frame(frame, self.profile) if self.profile else frame.to_ndarray(format="bgr24")
+        faces = self.analyze(img, get_governor().admit(STREAM))
+        if self.model is None:
+            return frame
+        with metrics.span(STREAM, "draw"):
+            self.draw(img, faces)
+        metrics.frame_done(STREAM)
+        metrics.draw_overlay(img, STREAM)
+        with metrics.span(STREAM, "from_ndarray"):
+            return av.VideoFrame.from_ndarray(img, format="bgr24")
@@ -1,17 +1,96 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import cv2
+import os
+import sys
 import time
 import csv
+import logging
+import threading
+from collections import deque
 from ultralytics import YOLO
 from PIL import Image, ImageTk
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BASE_DIR)
+
+from utils.detections import DetectionBatch  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+class LatestFrame:
+    """Single-slot buffer that always holds the newest item; older items are dropped."""
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.seq = 0
+
+    def put(self, item):
+        with self.cond:
+            self.item = item
+            self.seq += 1
+            self.cond.notify_all()
+
+    def get_newer(self, seq):
+        with self.cond:
+            if self.seq > seq:
+                return self.item, self.seq
+            return None, seq
+
+    def wait_newer(self, seq, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq, timeout=timeout)
+            if self.seq > seq:
+                return self.item, self.seq
+            return None, seq
+
+class RateMeter:
+    def __init__(self, window=30):
+        self.times = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def tick(self):
+        with self.lock:
+            self.times.append(time.perf_counter())
+
+    def rate(self):
+        with self.lock:
+            if len(self.times) < 2:
+                return 0.0
+            return (len(self.times) - 1) / max(self.times[-1] - self.times[0], 1e-6)
+
+class RateLimitedLog:
+    """Emit each message key at most once per interval, reporting how many were suppressed."""
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last = {}
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def _emit(self, level, key, message):
+        now = time.time()
+        with self.lock:
+            if now - self.last.get(key, 0.0) < self.interval:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return
+            self.last[key] = now
+            suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        logger.log(level, message)
+
+    def info(self, key, message):
+        self._emit(logging.INFO, key, message)
+
+    def warn(self, key, message):
+        self._emit(logging.WARNING, key, message)
+
 class SeatOccupancyApp:
     def __init__(self, root, model_path="yolov9m.pt", camera_index=0):
         self.root = root
         self.root.title("Seat Occupancy Tracking")
         self.model = YOLO(model_path)
-        print("Model class names:", self.model.names)
+        logger.info("Model class names: %s", self.model.names)
         self.cap = cv2.VideoCapture(camera_index)
         if not self.cap.isOpened():
             messagebox.showerror("Error", "Cannot open camera or video source!")
@@ -23,7 +102,22 @@ class SeatOccupancyApp:
             "C": {"region": (325, 150, 100, 100), "occupied": False, "start_time": None, "accumulated_time": 0.0},
             "D": {"region": (475, 150, 100, 100), "occupied": False, "start_time": None, "accumulated_time": 0.0}
         }
+        self.seats_lock = threading.Lock()
+        self.persons_inside_seats = []
+        self.log = RateLimitedLog(interval=5.0)
+        self.raw_frame = LatestFrame()
+        self.display_frame = LatestFrame()
+        self.displayed_seq = 0
+        self.capture_fps = RateMeter()
+        self.inference_fps = RateMeter()
+        self.display_fps = RateMeter()
+        self.stop_event = threading.Event()
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.capture_thread = threading.Thread(target=self.capture_loop, name="capture", daemon=True)
+        self.inference_thread = threading.Thread(target=self.inference_loop, name="inference", daemon=True)
+        self.capture_thread.start()
+        self.inference_thread.start()
         self.update_frame()
 
     def create_widgets(self):
@@ -33,6 +127,8 @@ class SeatOccupancyApp:
         self.left_frame.pack(side="left", fill="both", expand=True)
         self.video_label = tk.Label(self.left_frame)
         self.video_label.pack()
+        self.fps_label = tk.Label(self.left_frame, anchor="w")
+        self.fps_label.pack(fill="x")
         self.right_frame = tk.Frame(self.main_frame, width=200)
         self.right_frame.pack(side="right", fill="y")
         self.reset_button = ttk.Button(self.right_frame, text="Reset All Timer", command=self.reset_all_timers)
@@ -43,10 +139,11 @@ class SeatOccupancyApp:
         self.change_region_button.pack(pady=10, fill="x")
 
     def reset_all_timers(self):
-        for seat_data in self.seats.values():
-            seat_data["accumulated_time"] = 0.0
-            seat_data["start_time"] = None
-            seat_data["occupied"] = False
+        with self.seats_lock:
+            for seat_data in self.seats.values():
+                seat_data["accumulated_time"] = 0.0
+                seat_data["start_time"] = None
+                seat_data["occupied"] = False
 
     def download_csv(self):
         file_path = filedialog.asksaveasfilename(
@@ -56,12 +153,16 @@ class SeatOccupancyApp:
         )
         if not file_path:
             return
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("Seat Label,Accumulated Time (s)\n")
+        with self.seats_lock:
+            rows = []
             for label, seat_data in self.seats.items():
                 total_time = seat_data["accumulated_time"]
                 if seat_data["occupied"] and seat_data["start_time"]:
                     total_time += time.time() - seat_data["start_time"]
+                rows.append((label, total_time))
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("Seat Label,Accumulated Time (s)\n")
+            for label, total_time in rows:
                 f.write(f"{label},{total_time:.2f}\n")
         messagebox.showinfo("CSV Downloaded", f"Data saved to {file_path}.")
 
@@ -99,12 +200,13 @@ class SeatOccupancyApp:
                 return
             if seat_label in self.seats:
                 messagebox.showwarning("Warning", f"Seat '{seat_label}' already exists. Overwriting it.")
-            self.seats[seat_label] = {
-                "region": (sx, sy, sw, sh),
-                "occupied": False,
-                "start_time": None,
-                "accumulated_time": 0.0
-            }
+            with self.seats_lock:
+                self.seats[seat_label] = {
+                    "region": (sx, sy, sw, sh),
+                    "occupied": False,
+                    "start_time": None,
+                    "accumulated_time": 0.0
+                }
             messagebox.showinfo("Success", f"Seat '{seat_label}' added/updated.")
             popup.destroy()
 
@@ -120,7 +222,8 @@ class SeatOccupancyApp:
                 messagebox.showerror("Error", "Please enter a seat label to delete.")
                 return
             if seat_label_to_delete in self.seats:
-                del self.seats[seat_label_to_delete]
+                with self.seats_lock:
+                    del self.seats[seat_label_to_delete]
                 messagebox.showinfo("Success", f"Seat '{seat_label_to_delete}' deleted.")
                 popup.destroy()
             else:
@@ -136,45 +239,69 @@ class SeatOccupancyApp:
         sx, sy, sw, sh = seat_region
         return (sx <= cx <= sx + sw) and (sy <= cy <= sy + sh)
 
-    def update_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            self.video_label.config(text="No video frame available.")
-            return
-        results = self.model(frame)
-        person_detections = []
-        if len(results) > 0:
-            boxes = results[0].boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                xyxy = box.xyxy[0].cpu().numpy()
-                x_min, y_min, x_max, y_max = xyxy
-                w = x_max - x_min
-                h = y_max - y_min
-                if cls == 0 and conf > 0.7:
-                    person_detections.append({
-                        "box": (x_min, y_min, w, h),
-                        "conf": conf
-                    })
-                else:
-                    print(f"Ignored detection: class={self.model.names[cls]}, conf={conf}")
-        for seat_label, seat_data in self.seats.items():
-            seat_region = seat_data["region"]
-            seat_occupied_now = False
+    def capture_loop(self):
+        """Read the camera, overlay the latest detections and hand the result to the Tk thread."""
+        while not self.stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self.log.warn("capture", "No video frame available.")
+                time.sleep(0.05)
+                continue
+            self.raw_frame.put(frame)
+            annotated = self.draw_frame(frame.copy())
+            rgb_frame = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+            self.display_frame.put(Image.fromarray(rgb_frame))
+            self.capture_fps.tick()
+
+    def inference_loop(self):
+        """Run the model on the most recent camera frame and update seat state."""
+        last_seq = 0
+        while not self.stop_event.is_set():
+            frame, last_seq = self.raw_frame.wait_newer(last_seq, timeout=0.5)
+            if frame is None:
+                continue
+            results = self.model(frame, verbose=False)
+            batch = DetectionBatch.from_result(results[0]) if len(results) > 0 else DetectionBatch()
+            keep = (batch.class_ids == 0) & (batch.scores > 0.7)
+            persons = batch[keep]
+            for label, conf, _ in batch[~keep]:
+                self.log.info("ignored", f"Ignored detection: class={label}, conf={conf}")
+            person_detections = [
+                {"box": tuple(box), "conf": float(conf)} for box, conf in zip(persons.xywh(), persons.scores)
+            ]
+            self.update_seats(person_detections)
+            self.inference_fps.tick()
+
+    def update_seats(self, person_detections):
+        with self.seats_lock:
+            for seat_label, seat_data in self.seats.items():
+                seat_region = seat_data["region"]
+                seat_occupied_now = False
+                for det in person_detections:
+                    if self.is_person_in_seat(det["box"], seat_region):
+                        seat_occupied_now = True
+                        break
+                if seat_occupied_now and not seat_data["occupied"]:
+                    seat_data["occupied"] = True
+                    seat_data["start_time"] = time.time()
+                elif not seat_occupied_now and seat_data["occupied"]:
+                    elapsed = time.time() - seat_data["start_time"]
+                    seat_data["accumulated_time"] += elapsed
+                    seat_data["start_time"] = None
+                    seat_data["occupied"] = False
+            persons_inside_seats = []
             for det in person_detections:
-                if self.is_person_in_seat(det["box"], seat_region):
-                    seat_occupied_now = True
-                    break
-            if seat_occupied_now and not seat_data["occupied"]:
-                seat_data["occupied"] = True
-                seat_data["start_time"] = time.time()
-            elif not seat_occupied_now and seat_data["occupied"]:
-                elapsed = time.time() - seat_data["start_time"]
-                seat_data["accumulated_time"] += elapsed
-                seat_data["start_time"] = None
-                seat_data["occupied"] = False
-        for seat_label, seat_data in self.seats.items():
+                for seat_data in self.seats.values():
+                    if self.is_person_in_seat(det["box"], seat_data["region"]):
+                        persons_inside_seats.append(det)
+                        break
+            self.persons_inside_seats = persons_inside_seats
+
+    def draw_frame(self, frame):
+        with self.seats_lock:
+            seats = {label: dict(seat_data) for label, seat_data in self.seats.items()}
+            persons_inside_seats = list(self.persons_inside_seats)
+        for seat_label, seat_data in seats.items():
             sx, sy, sw, sh = seat_data["region"]
             color = (0, 255, 0) if seat_data["occupied"] else (0, 0, 255)
             cv2.rectangle(frame, (int(sx), int(sy)), (int(sx + sw), int(sy + sh)), color, 2)
@@ -190,14 +317,7 @@ class SeatOccupancyApp:
             duration_text = f"{mm}:{ss:02d}"
             cv2.putText(frame, duration_text, (int(sx), int(sy + sh + 20)),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        persons_inside_seats = []
-        for det in person_detections:
-            for seat_data in self.seats.values():
-                if self.is_person_in_seat(det["box"], seat_data["region"]):
-                    persons_inside_seats.append(det)
-                    break
         for idx, det in enumerate(persons_inside_seats, start=1):
-            print(f"Drawing person_{idx} at {det['box']}")
             (x_min, y_min, w_box, h_box) = det["box"]
             conf = det["conf"]
             x_max = x_min + w_box
@@ -206,15 +326,32 @@ class SeatOccupancyApp:
             label = f"person_{idx} [{conf:.2f}]"
             cv2.putText(frame, label, (int(x_min), int(y_min) - 5),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        print("Frame shape:", rgb_frame.shape, "Sample pixel:", rgb_frame[0, 0])
-        pil_img = Image.fromarray(rgb_frame)
-        imgtk = ImageTk.PhotoImage(image=pil_img)
-        self.video_label.imgtk = imgtk 
-        self.video_label.configure(image=imgtk)
-        self.root.after(10, self.update_frame)
+        return frame
+
+    def update_frame(self):
+        """Blit the most recent annotated frame; runs on the Tk thread only."""
+        if self.stop_event.is_set():
+            return
+        pil_img, self.displayed_seq = self.display_frame.get_newer(self.displayed_seq)
+        if pil_img is not None:
+            imgtk = ImageTk.PhotoImage(image=pil_img)
+            self.video_label.imgtk = imgtk
+            self.video_label.configure(image=imgtk)
+            self.display_fps.tick()
+            self.fps_label.config(
+                text=f"Display {self.display_fps.rate():.1f} fps | Inference {self.inference_fps.rate():.1f} fps"
+            )
+        self.root.after(15, self.update_frame)
+
+    def on_close(self):
+        self.stop_event.set()
+        for worker in (self.capture_thread, self.inference_thread):
+            worker.join(timeout=2)
+        self.cap.release()
+        self.root.destroy()
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     root = tk.Tk()
     app = SeatOccupancyApp(root, model_path="yolov9m.pt", camera_index=0)
     root.mainloop()
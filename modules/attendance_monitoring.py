@@ -5,38 +5,62 @@ import numpy as np
 import os
 import time
 import csv
-from ultralytics import YOLO
 from datetime import datetime
 from io import StringIO
 import av
+import functools
 import queue
+import tempfile
 import threading
 import time
 from model.emotion.emotion_model import EmotionDetector
+from utils.model_manager import get_model_manager, render_model_status
+from utils import metrics, overlay
+from utils.tiling import plan_tiles, tiled_predict, tiles_worthwhile
+from utils.occupancy_store import get_occupancy_store
+from utils.inference_pool import get_inference_pool
+from utils.governor import get_governor, render_governor_status
+from utils.inference_profile import predict_kwargs
+from utils.video_profile import PROFILES, working_frame
+from utils.detections import DetectionBatch
 
 global_seats = {}
 seats_lock = threading.Lock()
 seat_updates_queue = queue.Queue()
+tiling_config = {"enabled": False, "tile_size": 640}
+occupancy_config = {"session_id": None}
+# The monitoring session's EmotionDetector; the frame callback runs it on each frame.
+emotion_config = {"detector": None}
+_session = threading.local()
+
+STREAM = "attendance_monitoring"
+
+def video_profile(tiled):
+    """Hall cameras stream at full resolution when tiled inference is on."""
+    return PROFILES["attendance_hall"] if tiled else PROFILES[STREAM]
+
+def video_constraints():
+    return video_profile(st.session_state.get("tiled_inference", False)).constraints()
 
 class SnapshotTransformer(VideoTransformerBase):
     def __init__(self):
         self.frame_queue = queue.Queue(maxsize=1)
     
     def transform(self, frame):
-        img = frame.to_ndarray(format="bgr24")
+        # Same working size as monitoring, so seat regions drawn on the snapshot line up.
+        img = working_frame(frame, video_profile(tiling_config["enabled"]))
         try:
             self.frame_queue.put(img, timeout=1)
         except queue.Full:
             pass
         return img
 
-@st.cache_resource
 def load_model():
-    model_path = "model/emotion/yolov11_finetuned.pt"
-    if not os.path.exists(model_path):
-        st.error(f"Model file not found at {model_path}.")
-        st.stop()
-    return YOLO(model_path)
+    return get_model_manager().get("person", wait=False)
+
+def get_global_seats():
+    with seats_lock:
+        return dict(global_seats)
 
 def draw_seats(frame, seats):
     frame_copy = frame.copy()
@@ -46,15 +70,29 @@ def draw_seats(frame, seats):
         cv2.rectangle(frame_copy, (sx, sy), (sx + sw, sy + sh), color, 2)
         cv2.putText(frame_copy, label, (sx, sy - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         if st.session_state.get("monitoring", False):
-            total_duration = seat_data.get("accumulated_time", 0.0)
-            if seat_data.get("occupied", False) and seat_data.get("start_time"):
-                total_duration += time.time() - seat_data["start_time"]
-            mm = int(total_duration // 60)
-            ss = int(total_duration % 60)
-            duration_text = f"{mm}:{ss:02d}"
-            cv2.putText(frame_copy, duration_text, (sx, sy + sh + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            cv2.putText(frame_copy, seat_duration_text(seat_data), (sx, sy + sh + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
     return frame_copy
 
+def seat_duration_text(seat_data):
+    total_duration = seat_data.get("accumulated_time", 0.0)
+    if seat_data.get("occupied", False) and seat_data.get("start_time"):
+        total_duration += time.time() - seat_data["start_time"]
+    mm = int(total_duration // 60)
+    ss = int(total_duration % 60)
+    return f"{mm}:{ss:02d}"
+
+def overlay_shapes(seats, person_detections):
+    """Seat and person boxes for the browser overlay, matching draw_seats and the person boxes."""
+    shapes = []
+    for label, seat_data in seats.items():
+        sx, sy, sw, sh = seat_data["region"]
+        # draw_seats colours are RGB; overlay shapes take BGR.
+        color = (0, 255, 0) if seat_data.get("occupied", False) else (0, 0, 255)
+        shapes.append(overlay.shape((sx, sy, sx + sw, sy + sh), color, label, seat_duration_text(seat_data)))
+    for (x, y, w, h) in person_detections:
+        shapes.append(overlay.shape((x, y, x + w, y + h), (255, 0, 0), "Person"))
+    return shapes
+
 def is_person_in_seat(person_box, seat_region):
     px, py, pw, ph = person_box
     cx = px + pw / 2
@@ -62,28 +100,52 @@ def is_person_in_seat(person_box, seat_region):
     sx, sy, sw, sh = seat_region
     return (sx <= cx <= sx + sw) and (sy <= cy <= sy + sh)
 
-def video_frame_callback(frame: av.VideoFrame) -> av.VideoFrame:
+def video_frame_callback(frame: av.VideoFrame, overlay_key=None) -> av.VideoFrame:
+    """Track seat occupancy; with ``overlay_key`` the boxes go to the browser and ``frame`` is returned untouched."""
     model = load_model()
+    if model is None:
+        return frame
     with seats_lock:
         seats = global_seats.copy()
+        tiling = dict(tiling_config)
+        session_id = occupancy_config["session_id"]
+        emotion = emotion_config["detector"]
     
-    img = frame.to_ndarray(format="bgr24")
-    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    with metrics.span(STREAM, "to_ndarray"):
+        img = working_frame(frame, video_profile(tiling["enabled"]))
+    with metrics.span(STREAM, "cvt_color"):
+        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     
-    results = model.predict(rgb_img, conf=0.3)
-    person_detections = []
-    if len(results) > 0:
-        boxes = results[0].boxes
-        for box in boxes:
-            if int(box.cls[0]) == 0:
-                x_min, y_min, x_max, y_max = box.xyxy[0].cpu().numpy()
-                person_detections.append((x_min, y_min, x_max - x_min, y_max - y_min))
+    tiles = ()
+    if tiling["enabled"] and seats:
+        regions = tuple(tuple(seat_data["region"]) for seat_data in seats.values())
+        tiles = plan_tiles(regions, rgb_img.shape[:2], tile_size=tiling["tile_size"])
+    decision = get_governor().admit(STREAM)
+    if not decision.run:
+        # Skipped under load: seat state is re-evaluated against the last detections.
+        person_detections = getattr(_session, "person_detections", [])
+    else:
+        with metrics.span(STREAM, "predict"):
+            if tiles and decision.imgsz >= tiling["tile_size"] and tiles_worthwhile(tiles, rgb_img.shape):
+                batch = tiled_predict(model, rgb_img, tiles, tile_size=tiling["tile_size"], conf=0.3,
+                                      classes=predict_kwargs("person").get("classes"))
+            else:
+                pool = get_inference_pool()
+                # The pool answers None when it is saturated; run the model here instead.
+                batch = pool.predict("person", rgb_img, conf=0.3, **predict_kwargs("person", decision.imgsz)) if pool is not None else None
+                if batch is None:
+                    results = model.predict(rgb_img, conf=0.3, **predict_kwargs("person", decision.imgsz))
+                    batch = DetectionBatch.from_result(results[0]) if len(results) > 0 else DetectionBatch()
+        person_detections = batch.filter(classes=[0]).xywh()
+    _session.person_detections = person_detections
     
     for label, seat_data in seats.items():
         seat_region = seat_data["region"]
         occupied = any(is_person_in_seat(person_box, seat_region) for person_box in person_detections)
         
         if occupied != seat_data["occupied"]:
+            if session_id:
+                get_occupancy_store().append(label, session_id, occupied)
             if occupied:
                 seat_data["start_time"] = time.time()
             else:
@@ -93,16 +155,34 @@ def video_frame_callback(frame: av.VideoFrame) -> av.VideoFrame:
                     seat_data["start_time"] = None
             seat_data["occupied"] = occupied
     
-    frame_with_seats = draw_seats(rgb_img, seats)
-    
-    for (x, y, w, h) in person_detections:
-        cv2.rectangle(frame_with_seats, (int(x), int(y)), (int(x + w), int(y + h)), (0, 0, 255), 2)
-        cv2.putText(frame_with_seats, "Person", (int(x), int(y) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-    
     seat_updates = {label: {"occupied": seat_data["occupied"], "start_time": seat_data["start_time"], "accumulated_time": seat_data["accumulated_time"]} for label, seat_data in seats.items()}
     seat_updates_queue.put(seat_updates)
+
+    faces = []
+    if emotion is not None:
+        with metrics.span(STREAM, "emotion"):
+            faces = emotion.analyze(img, decision)
+
+    if overlay_key:
+        with metrics.span(STREAM, "overlay"):
+            shapes = overlay_shapes(seats, person_detections)
+            shapes += [overlay.shape(box, (0, 255, 0), label and f"{label} {conf:.2f}" or "") for box, label, conf in faces]
+            overlay.publish(overlay_key, img.shape, shapes)
+        metrics.frame_done(STREAM)
+        return frame
+
+    with metrics.span(STREAM, "draw"):
+        frame_with_seats = draw_seats(rgb_img, seats)
+        
+        for (x, y, w, h) in person_detections:
+            cv2.rectangle(frame_with_seats, (int(x), int(y)), (int(x + w), int(y + h)), (0, 0, 255), 2)
+            cv2.putText(frame_with_seats, "Person", (int(x), int(y) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        EmotionDetector.draw(frame_with_seats, faces)
+    metrics.frame_done(STREAM)
+    metrics.draw_overlay(frame_with_seats, STREAM)
     
-    return av.VideoFrame.from_ndarray(cv2.cvtColor(frame_with_seats, cv2.COLOR_RGB2BGR), format="bgr24")
+    with metrics.span(STREAM, "from_ndarray"):
+        return av.VideoFrame.from_ndarray(cv2.cvtColor(frame_with_seats, cv2.COLOR_RGB2BGR), format="bgr24")
 
 def process_seat_updates():
     try:
@@ -133,19 +213,94 @@ def process_seat_updates():
     except queue.Empty:
         pass
 
-def download_csv(seats):
+def download_csv(seats, session_id, session_start):
+    """Per-seat occupied time for one monitoring session, read from the occupancy store."""
+    totals = get_occupancy_store().seat_time(session_start, time.time(), session=session_id)
     output = StringIO()
     writer = csv.writer(output)
     writer.writerow(["Seat Label", "Accumulated Time (s)"])
-    for label, seat_data in seats.items():
-        total_time = seat_data.get("accumulated_time", 0.0)
-        if seat_data.get("occupied", False) and seat_data.get("start_time"):
-            total_time += time.time() - seat_data["start_time"]
-        writer.writerow([label, f"{total_time:.2f}"])
+    for label in seats:
+        writer.writerow([label, f"{totals.get(label, 0.0):.2f}"])
     csv_data = output.getvalue()
     output.close()
     return csv_data.encode('utf-8')
 
+def start_occupancy_session():
+    st.session_state.occupancy_session = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    st.session_state.occupancy_session_start = time.time()
+
+def close_occupancy_session():
+    """Record a leave event for every occupied seat so stored intervals are closed."""
+    session_id = st.session_state.get("occupancy_session")
+    if not session_id:
+        return
+    store = get_occupancy_store()
+    for label, seat_data in st.session_state.seats.items():
+        if seat_data.get("occupied", False):
+            store.append(label, session_id, False)
+    store.flush()
+
+def export_event_log(store, start, end):
+    """Stream the event log for [start, end] into a temporary CSV file and return its path."""
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as f:
+        for chunk in store.iter_csv(start, end):
+            f.write(chunk)
+    return f.name
+
+def occupancy_history():
+    """Range queries and exports over the stored enter/leave events, run on demand."""
+    with st.expander("Occupancy History"):
+        today = datetime.now().date()
+        date_range = st.date_input("Date range", value=(today, today))
+        if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+            st.info("Select a start and end date.")
+            return
+        start = datetime.combine(date_range[0], datetime.min.time()).timestamp()
+        end = datetime.combine(date_range[1], datetime.max.time()).timestamp()
+        store = get_occupancy_store()
+
+        col1, col2 = st.columns(2)
+        if col1.button("Show History"):
+            heatmap = store.heatmap(start, min(end, time.time()))
+            st.session_state.occupancy_history = {
+                "range": tuple(date_range),
+                "totals": store.seat_time(start, end),
+                "heatmap": heatmap[(heatmap > 0).any(axis=1)],
+            }
+        if col2.button("Prepare Event Log"):
+            previous = st.session_state.get("occupancy_export")
+            if previous and os.path.exists(previous["path"]):
+                os.remove(previous["path"])
+            st.session_state.occupancy_export = {
+                "range": tuple(date_range),
+                "path": export_event_log(store, start, end),
+            }
+
+        export = st.session_state.get("occupancy_export")
+        if export and export["range"] == tuple(date_range) and os.path.exists(export["path"]):
+            with open(export["path"], "rb") as f:
+                st.download_button(
+                    label="Download Event Log",
+                    data=f,
+                    file_name=f"seat_events_{date_range[0]}_{date_range[1]}.csv",
+                    mime="text/csv"
+                )
+
+        history = st.session_state.get("occupancy_history")
+        if not history or history["range"] != tuple(date_range):
+            return
+        if not history["totals"]:
+            st.write("No occupancy recorded in this range.")
+            return
+        for label, seconds in sorted(history["totals"].items()):
+            st.write(f"Seat {label}: {int(seconds // 60)}:{int(seconds % 60):02d}")
+
+        if not history["heatmap"].empty:
+            import plotly.express as px
+            fig = px.imshow(history["heatmap"].T, aspect="auto", color_continuous_scale="Greens",
+                            labels={"x": "Minute", "y": "Seat", "color": "Occupied"})
+            st.plotly_chart(fig, use_container_width=True)
+
 def capture_snapshot_callback(frame: av.VideoFrame) -> av.VideoFrame:
     img = frame.to_ndarray(format="bgr24")
     if not hasattr(st.session_state, "snapshot_frame"):
@@ -166,20 +321,31 @@ def monitor_attendance():
     if "monitoring" not in st.session_state:
         st.session_state.monitoring = False
 
+    if "tiled_inference" not in st.session_state:
+        st.session_state.tiled_inference = False
+
+    if st.session_state.monitoring and "emotion_detector" not in st.session_state:
+        st.session_state.emotion_detector = EmotionDetector(seats_provider=get_global_seats)
+
     with seats_lock:
         global_seats = st.session_state.seats.copy()
+        tiling_config["enabled"] = st.session_state.tiled_inference
+        occupancy_config["session_id"] = st.session_state.get("occupancy_session") if st.session_state.monitoring else None
+        emotion_config["detector"] = st.session_state.get("emotion_detector") if st.session_state.monitoring else None
 
     if st.session_state.snapshot is None:
         st.subheader("Step 1: Capture Snapshot")
+        st.session_state.tiled_inference = st.checkbox(
+            "High-resolution hall camera (tiled inference)",
+            value=st.session_state.tiled_inference,
+            help="Streams at 1920x1080 and runs detection only on tiles that cover the configured seats.",
+        )
         
         ctx = webrtc_streamer(
             key="snapshot-capture",
             video_transformer_factory=SnapshotTransformer,
             mode=WebRtcMode.SENDRECV,
-            media_stream_constraints={
-                "video": {"width": 640, "height": 480},
-                "audio": False
-            },
+            media_stream_constraints=video_constraints(),
             async_processing=True,
         )
 
@@ -253,12 +419,15 @@ def monitor_attendance():
         if st.session_state.seats:
             if st.button("Start Monitoring"):
                 st.session_state.monitoring = True
+                start_occupancy_session()
                 st.rerun()
         else:
             st.warning("Please add at least one seat before starting monitoring.")
 
     else:
         st.subheader("Step 3: Monitoring Seats")
+        render_model_status(["person", "emotion"])
+        render_governor_status()
         process_seat_updates()
         
         st.write("Current Seat Configuration:")
@@ -266,14 +435,29 @@ def monitor_attendance():
             x, y, w, h = seat_data["region"]
             st.write(f"Seat {label}: (x={x}, y={y}, width={w}, height={h})")
             
-        webrtc_ctx = webrtc_streamer(
-            key="seat-monitoring",
-            video_processor_factory=EmotionDetector,
-            video_frame_callback=video_frame_callback,
-            mode=WebRtcMode.SENDRECV,
-            media_stream_constraints={"video": {"width": 640, "height": 480}, "audio": False},
-            async_processing=True,
+        profile = video_profile(st.session_state.tiled_inference)
+        overlay_mode = st.checkbox(
+            "Draw seats in the browser",
+            value=False,
+            help="The server only analyses the video and sends seat and person boxes; it no longer draws on or re-encodes every frame.",
         )
+        if overlay_mode:
+            overlay_key = overlay.render_overlay_preview(STREAM, profile)
+            webrtc_streamer(
+                key="seat-monitoring-overlay",
+                video_frame_callback=functools.partial(video_frame_callback, overlay_key=overlay_key),
+                mode=WebRtcMode.SENDONLY,
+                media_stream_constraints=video_constraints(),
+                async_processing=True,
+            )
+        else:
+            webrtc_streamer(
+                key="seat-monitoring",
+                video_frame_callback=video_frame_callback,
+                mode=WebRtcMode.SENDRECV,
+                media_stream_constraints=video_constraints(),
+                async_processing=True,
+            )
 
         if st.session_state.seats:
             st.write("### Current Seat Status")
@@ -286,14 +470,27 @@ def monitor_attendance():
                 ss = int(total_time % 60)
                 st.write(f"Seat {label}: {status} - Total time: {mm}:{ss:02d}")
 
+        emotion = st.session_state.get("emotion_detector")
+        if emotion is not None:
+            distributions = emotion.seat_distribution()
+            if distributions:
+                st.write("### Recent Emotions per Seat")
+                for label, dist in distributions.items():
+                    top = sorted(dist.items(), key=lambda item: item[1], reverse=True)[:3]
+                    st.write(f"Seat {label}: " + ", ".join(f"{name} {share:.0%}" for name, share in top))
+
         col1, col2, col3 = st.columns(3)
         with col1:
             if st.button("Stop Monitoring"):
+                close_occupancy_session()
+                st.session_state.pop("emotion_detector", None)
                 st.session_state.monitoring = False
                 st.rerun()
         
         with col2:
             if st.button("Reset All Timers"):
+                close_occupancy_session()
+                start_occupancy_session()
                 for seat_data in st.session_state.seats.values():
                     seat_data["accumulated_time"] = 0.0
                     seat_data["start_time"] = None
@@ -302,13 +499,21 @@ def monitor_attendance():
                 st.rerun()
         
         with col3:
-            csv_data = download_csv(st.session_state.seats)
-            st.download_button(
-                label="Download CSV",
-                data=csv_data,
-                file_name=f"seat_occupancy_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            if st.button("Prepare CSV"):
+                st.session_state.occupancy_csv = download_csv(
+                    st.session_state.seats,
+                    st.session_state.get("occupancy_session"),
+                    st.session_state.get("occupancy_session_start", time.time()),
+                )
+            if st.session_state.get("occupancy_csv"):
+                st.download_button(
+                    label="Download CSV",
+                    data=st.session_state.occupancy_csv,
+                    file_name=f"seat_occupancy_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+
+    occupancy_history()
 
 def render():
     monitor_attendance()
\ No newline at end of file
@@ -1,73 +1,172 @@
+import functools
 import logging
 import queue
 from pathlib import Path
-from typing import List, NamedTuple
 
 import av
 import cv2
-import numpy as np
 import streamlit as st
-from ultralytics import YOLO
-import os
 from streamlit_webrtc import WebRtcMode, webrtc_streamer
+from utils.model_manager import get_model_manager, render_model_status
+from utils import metrics, overlay
+from utils.person_gate import FULL_FRAME, PersonGate
+from utils.evidence import EvidenceRecorder
+from utils.inference_pool import get_inference_pool
+from utils.governor import get_governor, render_governor_status
+from utils.inference_profile import predict_kwargs
+from utils.video_profile import PROFILES, working_frame
+from utils.detections import DetectionBatch
+import threading
 
 logger = logging.getLogger(__name__)
 
-class Detection(NamedTuple):
-    class_id: int
-    label: str
-    score: float
-    box: np.ndarray
+STREAM = "exam_supervisor"
+VIDEO_PROFILE = PROFILES[STREAM]
 
-@st.cache_resource
 def load_model():
-    model_path = "model/cheating/yolov9m_finetuned.pt"
-    if not os.path.exists(model_path):
-        st.error(f"Model file not found at {model_path}. Please ensure the path is correct.")
-        st.stop()
-    return YOLO(model_path)
+    return get_model_manager().get("cheating", wait=False)
 
-result_queue: "queue.Queue[List[Detection]]" = queue.Queue()
+result_queue: "queue.Queue[DetectionBatch]" = queue.Queue()
+gate_config = {"enabled": True}
+person_gate = PersonGate()
+evidence_config = {"enabled": True}
+_session = threading.local()
 
-def video_frame_callback(frame: av.VideoFrame) -> av.VideoFrame:
+INCIDENT_KEYWORDS = ("cheating", "mobile")
+
+def get_recorder():
+    """One evidence recorder per WebRTC session (each session has its own callback thread)."""
+    recorder = getattr(_session, "recorder", None)
+    if recorder is None:
+        recorder = _session.recorder = EvidenceRecorder(STREAM)
+    return recorder
+
+LABEL_COLORS = {"cheating": (0, 0, 255), "mobile": (0, 165, 255), "normal": (0, 200, 0)}
+
+def detect(model, image, imgsz=640):
+    """Run the cheating model behind the person gate; returns a full-frame DetectionBatch."""
+    region = FULL_FRAME
+    if gate_config["enabled"]:
+        person_model = get_model_manager().get("person_gate", wait=False)
+        if person_model is not None:
+            with metrics.span(STREAM, "gate"):
+                region = person_gate.select_region(person_model, image)
+    if region is None:
+        return DetectionBatch(names=model.names)
+
+    if region == FULL_FRAME:
+        x_off, y_off, source = 0, 0, image
+    else:
+        x1, y1, x2, y2 = region
+        x_off, y_off, source = x1, y1, image[y1:y2, x1:x2]
+    # The working frame was already downscaled once; the model's letterbox fits it to imgsz.
+    kwargs = predict_kwargs("cheating", imgsz)
+
+    pool = get_inference_pool()
+    with metrics.span(STREAM, "predict"):
+        # The pool answers None when it is saturated; run the model here instead.
+        detections = pool.predict("cheating", source, conf=0.5, **kwargs) if pool is not None else None
+        if detections is None:
+            results = model.predict(source, conf=0.5, verbose=False, **kwargs)
+            detections = DetectionBatch.from_result(results[0])
+    return detections.mapped(offset=(x_off, y_off))
+
+def draw_detections(image, detections):
+    for label, score, box in detections:
+        x1, y1, x2, y2 = map(int, box)
+        color = next((c for key, c in LABEL_COLORS.items() if key in label.lower()), (255, 0, 0))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(image, f"{label} {score:.2f}", (x1, max(y1 - 8, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return image
+
+def overlay_shapes(detections):
+    shapes = []
+    for label, score, box in detections:
+        color = next((c for key, c in LABEL_COLORS.items() if key in label.lower()), (255, 0, 0))
+        shapes.append(overlay.shape(box, color, f"{label} {score:.2f}"))
+    return shapes
+
+def video_frame_callback(frame: av.VideoFrame, overlay_key=None) -> av.VideoFrame:
+    """Annotate ``frame``, or with ``overlay_key`` publish the boxes for the browser and leave it untouched."""
     model = load_model()
-    image = frame.to_ndarray(format="bgr24")
+    if model is None:
+        return frame
+    with metrics.span(STREAM, "to_ndarray"):
+        image = working_frame(frame, VIDEO_PROFILE)
     
-    results = model.predict(image, conf=0.5)
-    annotated_frame = results[0].plot()
+    decision = get_governor().admit(STREAM)
+    if decision.run:
+        detections = _session.detections = detect(model, image, imgsz=decision.imgsz)
+    else:
+        # Skipped under load: keep showing the last boxes rather than flickering.
+        detections = getattr(_session, "detections", DetectionBatch())
+    if overlay_key:
+        with metrics.span(STREAM, "overlay"):
+            overlay.publish(overlay_key, image.shape, overlay_shapes(detections))
+        # Evidence clips get the plain frames; the incident label is stored with the clip.
+        annotated_frame = image
+    else:
+        with metrics.span(STREAM, "draw"):
+            annotated_frame = draw_detections(image, detections)
     
-    detections = []
-    for result in results[0].boxes:
-        class_id = int(result.cls)
-        label = model.names[class_id]
-        score = float(result.conf)
-        box = result.xyxy[0].cpu().numpy()
-        
-        detections.append(
-            Detection(
-                class_id=class_id,
-                label=label,
-                score=score,
-                box=box,
-            )
-        )
+    if evidence_config["enabled"]:
+        with metrics.span(STREAM, "evidence"):
+            recorder = get_recorder()
+            recorder.add_frame(annotated_frame)
+            for label, score, _ in detections if decision.run else ():
+                if any(keyword in label.lower() for keyword in INCIDENT_KEYWORDS):
+                    recorder.trigger(label, score)
     
-    result_queue.put(detections)
+    if decision.run:
+        result_queue.put(detections)
+    metrics.frame_done(STREAM)
+    if overlay_key:
+        return frame
+    metrics.draw_overlay(annotated_frame, STREAM)
     
-    return av.VideoFrame.from_ndarray(annotated_frame, format="bgr24")
+    with metrics.span(STREAM, "from_ndarray"):
+        return av.VideoFrame.from_ndarray(annotated_frame, format="bgr24")
 
 def render():
     st.title("Real-Time Exam Cheating Detection")
     st.write("This app uses a fine-tuned YOLOv9 model to detect 'Cheating', 'Mobile', or 'Normal' behaviors in real-time via webcam.")
     st.info("When start camera, click the play button to avoid connection error")
-
-    webrtc_ctx = webrtc_streamer(
-        key="exam-cheating-detection",
-        mode=WebRtcMode.SENDRECV,
-        video_frame_callback=video_frame_callback,
-        media_stream_constraints={"video": True, "audio": False},
-        async_processing=True,
+    gate_config["enabled"] = st.checkbox(
+        "Skip frames without examinees (person gate)",
+        value=True,
+        help="A small person detector runs first; the cheating model only sees the area around detected examinees.",
+    )
+    evidence_config["enabled"] = st.checkbox(
+        "Record evidence clips",
+        value=True,
+        help="Keeps the last few seconds in memory and saves a clip to the evidence/ folder when cheating or a mobile device is detected.",
+    )
+    overlay_mode = st.checkbox(
+        "Draw boxes in the browser",
+        value=False,
+        help="The server only analyses the video and sends box coordinates; it no longer draws on or re-encodes every frame.",
     )
+    render_model_status(["cheating", "person_gate"] if gate_config["enabled"] else ["cheating"])
+    render_governor_status()
+
+    if overlay_mode:
+        overlay_key = overlay.render_overlay_preview(STREAM, VIDEO_PROFILE)
+        webrtc_ctx = webrtc_streamer(
+            key="exam-cheating-detection-overlay",
+            mode=WebRtcMode.SENDONLY,
+            video_frame_callback=functools.partial(video_frame_callback, overlay_key=overlay_key),
+            media_stream_constraints=VIDEO_PROFILE.constraints(),
+            async_processing=True,
+        )
+    else:
+        webrtc_ctx = webrtc_streamer(
+            key="exam-cheating-detection",
+            mode=WebRtcMode.SENDRECV,
+            video_frame_callback=video_frame_callback,
+            media_stream_constraints=VIDEO_PROFILE.constraints(),
+            async_processing=True,
+        )
 
     if st.checkbox("Show detection alerts", value=True):
         if webrtc_ctx.state.playing:
@@ -76,12 +175,12 @@ def render():
             while True:
                 try:
                     detections = result_queue.get()
-                    for detection in detections:
-                        if "cheating" in detection.label.lower():
-                            alerts_placeholder.warning(f"Cheating Detected! {detection.label} (Confidence: {detection.score:.2f})")
-                        elif "mobile" in detection.label.lower():
-                            alerts_placeholder.warning(f"Mobile Device Detected! {detection.label} (Confidence: {detection.score:.2f})")
-                        elif "normal" in detection.label.lower():
-                            alerts_placeholder.success(f"Normal Behavior Detected! {detection.label} (Confidence: {detection.score:.2f})")
+                    for label, score, _ in detections:
+                        if "cheating" in label.lower():
+                            alerts_placeholder.warning(f"Cheating Detected! {label} (Confidence: {score:.2f})")
+                        elif "mobile" in label.lower():
+                            alerts_placeholder.warning(f"Mobile Device Detected! {label} (Confidence: {score:.2f})")
+                        elif "normal" in label.lower():
+                            alerts_placeholder.success(f"Normal Behavior Detected! {label} (Confidence: {score:.2f})")
                 except queue.Empty:
                     continue
@@ -2,30 +2,17 @@ import streamlit as st
 import cv2
 import numpy as np
 import base64
-import firebase_admin
-from firebase_admin import credentials, firestore, initialize_app
-import cloudinary
-import cloudinary.uploader
 import time
 from streamlit_webrtc import WebRtcMode, webrtc_streamer, VideoProcessorBase
 import av
 from collections import deque
+from utils.clients import get_db, get_cloudinary
+from utils import metrics
+from utils.face_detection import get_recognition_detector
+from utils.video_profile import PROFILES, working_frame
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(st.secrets["FIREBASE_SERVICE_ACCOUNT"].to_dict())
-    initialize_app(cred)
-db = firestore.client()
-
-cloudinary.config(
-    cloud_name=st.secrets["CLOUDINARY_CLOUD_NAME"],
-    api_key=st.secrets["CLOUDINARY_API_KEY"],
-    api_secret=st.secrets["CLOUDINARY_API_SECRET"],
-    secure=True
-)
-
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-)
+STREAM = "face_registration"
+VIDEO_PROFILE = PROFILES[STREAM]
 
 class FaceCaptureProcessor(VideoProcessorBase):
     def __init__(self, name):
@@ -39,16 +26,15 @@ class FaceCaptureProcessor(VideoProcessorBase):
         self.name = name
     
     def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-        img = frame.to_ndarray(format="bgr24")
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        with metrics.span(STREAM, "to_ndarray"):
+            img = working_frame(frame, VIDEO_PROFILE)
+        with metrics.span(STREAM, "cvt_color"):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        faces = face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.05, 
-            minNeighbors=5, 
-            minSize=(50, 50), 
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
+        with metrics.span(STREAM, "detect"):
+            # Crops train the LBPH recognizer, so use its pinned detector.
+            detector = get_recognition_detector()
+            faces = detector.boxes(img, min_size=50, fine=True) if detector is not None else []
         
         print(f"Detected faces: {len(faces)}, Coordinates: {faces}")
         self.last_detected_count = len(faces)
@@ -65,7 +51,8 @@ class FaceCaptureProcessor(VideoProcessorBase):
                     self.detected_faces.append(face_img)
                     self.last_capture_time = current_time
                     try:
-                        url = upload_to_cloudinary(face_img, self.name, len(self.detected_faces) - 1)
+                        with metrics.span(STREAM, "upload"):
+                            url = upload_to_cloudinary(face_img, self.name, len(self.detected_faces) - 1)
                         self.uploaded_urls.append(url)
                         print(f"Uploaded face #{len(self.uploaded_urls)} to Cloudinary: {url}")
                     except Exception as e:
@@ -75,10 +62,14 @@ class FaceCaptureProcessor(VideoProcessorBase):
                     self.capture_complete = True
                     self.capturing = False
         
-        for (x, y, w, h) in faces:
-            cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        with metrics.span(STREAM, "draw"):
+            for (x, y, w, h) in faces:
+                cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        metrics.frame_done(STREAM)
+        metrics.draw_overlay(img, STREAM)
             
-        return av.VideoFrame.from_ndarray(img, format="bgr24")
+        with metrics.span(STREAM, "from_ndarray"):
+            return av.VideoFrame.from_ndarray(img, format="bgr24")
 
 def upload_to_cloudinary(image_np, name, idx):
     try:
@@ -87,7 +78,7 @@ def upload_to_cloudinary(image_np, name, idx):
         image_np_3ch = cv2.cvtColor(image_np, cv2.COLOR_GRAY2RGB)
         _, buffer = cv2.imencode('.jpg', image_np_3ch)
         b64_img = base64.b64encode(buffer).decode()
-        upload_result = cloudinary.uploader.upload(
+        upload_result = get_cloudinary().uploader.upload(
             "data:image/jpeg;base64," + b64_img,
             folder=f"AiSee/{name}",
             public_id=f"{name}_{idx}"
@@ -131,11 +122,12 @@ def register_user():
             st.rerun()
 
     if st.session_state.capture_started:
+        get_cloudinary()
         ctx = webrtc_streamer(
             key="face-registration",
             mode=WebRtcMode.SENDRECV,
             video_processor_factory=lambda: FaceCaptureProcessor(name),
-            media_stream_constraints={"video": True, "audio": False},
+            media_stream_constraints=VIDEO_PROFILE.constraints(),
             async_processing=True,
             rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]}
         )
@@ -183,7 +175,7 @@ def register_user():
                         user_data["grade"] = grade
                     elif type == "University":
                         user_data["semester"] = semester
-                db.collection("users").add(user_data)
+                get_db().collection("users").add(user_data)
                 print("User data saved to Firebase")
 
             st.session_state.registration_complete = True
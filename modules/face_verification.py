@@ -4,56 +4,49 @@ import cv2
 import numpy as np
 import os
 import requests
-import cloudinary
-import cloudinary.api
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore, initialize_app
 from datetime import datetime
+import threading
+import time
+from utils.clients import get_db, get_cloudinary
+from utils.presence import PresenceScheduler
+from utils.attendance_counters import log_attendance, meets_minimum
+from utils import metrics
+from utils.face_detection import get_recognition_detector
+from utils import cloudinary_manifest
+from utils.user_directory import get_user_directory
+from utils.video_profile import PROFILES, working_frame
+from utils.training_jobs import JobRunner
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(st.secrets["FIREBASE_SERVICE_ACCOUNT"].to_dict())
-    initialize_app(cred)
-db = firestore.client()
+STREAM = "face_verification"
+TRAIN_STREAM = "training"
+VIDEO_PROFILE = PROFILES[STREAM]
 
-cloudinary.config(
-    cloud_name=st.secrets["CLOUDINARY_CLOUD_NAME"],
-    api_key=st.secrets["CLOUDINARY_API_KEY"],
-    api_secret=st.secrets["CLOUDINARY_API_SECRET"],
-    secure=True
-)
-
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-face_recognizer = cv2.face.LBPHFaceRecognizer_create()
 model_path = 'model/absensi/face_recognizer.yml'
-TRAINED_FOLDERS_FILE = 'model/absensi/trained_folders.json'
+TRAINED_RESOURCES_FILE = 'model/absensi/trained_resources.json'
 LABEL_MAPPING_FILE = 'model/absensi/label_mapping.json'
+# Which face detector produced the training crops; verification must use the same one.
+RECOGNIZER_META_FILE = 'model/absensi/recognizer_meta.json'
+
+# (recognizer, label_mapping, model mtime) currently serving predictions.
+_recognizer = None
+_recognizer_lock = threading.Lock()
 
 ### Helper Functions ###
-def list_user_folders():
-    """List all subfolders in the 'AiSee' folder on Cloudinary."""
-    try:
-        result = cloudinary.api.subfolders("AiSee")
-        folders = [folder['name'] for folder in result['folders']]
-        return folders
-    except Exception as e:
-        st.error(f"Error accessing Cloudinary: {e}")
-        return []
-
-def load_trained_folders():
-    """Load the list of trained folders from a local JSON file."""
-    if os.path.exists(TRAINED_FOLDERS_FILE):
-        with open(TRAINED_FOLDERS_FILE, 'r') as f:
+def load_trained_resources():
+    """Load {public_id: version} of the images the current model was trained on."""
+    if os.path.exists(TRAINED_RESOURCES_FILE):
+        with open(TRAINED_RESOURCES_FILE, 'r') as f:
             return json.load(f)
-    return []
+    return {}
 
-def save_trained_folders(folders):
-    """Save the list of trained folders to a local JSON file."""
-    os.makedirs(os.path.dirname(TRAINED_FOLDERS_FILE), exist_ok=True)
-    with open(TRAINED_FOLDERS_FILE, 'w') as f:
-        json.dump(folders, f)
+def save_trained_resources(resources):
+    """Save {public_id: version} of the images the current model was trained on."""
+    os.makedirs(os.path.dirname(TRAINED_RESOURCES_FILE), exist_ok=True)
+    with open(TRAINED_RESOURCES_FILE, 'w') as f:
+        json.dump(resources, f)
 
 def load_label_mapping():
     """Load the label mapping from a local JSON file."""
@@ -68,72 +61,202 @@ def save_label_mapping(mapping):
     with open(LABEL_MAPPING_FILE, 'w') as f:
         json.dump(mapping, f)
 
-def train_model():
-    """Train or update the face recognition model with new folders using integer labels."""
-    global face_recognizer
-    
-    user_folders = list_user_folders()
-    if not user_folders:
-        st.warning("No user folders found in Cloudinary.")
-        return False
-
-    trained_folders = load_trained_folders()
-    new_folders = [folder for folder in user_folders if folder not in trained_folders]
+def load_recognizer_meta():
+    if os.path.exists(RECOGNIZER_META_FILE):
+        with open(RECOGNIZER_META_FILE, 'r') as f:
+            return json.load(f)
+    return {}
 
-    if not new_folders and os.path.exists(model_path):
-        return True
+def save_recognizer_meta(meta):
+    os.makedirs(os.path.dirname(RECOGNIZER_META_FILE), exist_ok=True)
+    with open(RECOGNIZER_META_FILE, 'w') as f:
+        json.dump(meta, f)
+
+def detect_recognition_faces(image):
+    """Face boxes from the recognizer's pinned detector; none while it is still loading."""
+    detector = get_recognition_detector()
+    return detector.boxes(image) if detector is not None else []
+
+def load_recognizer():
+    """Return (recognizer, label_mapping), reloading both only when the model file changes.
+
+    A changed file is read into a fresh recognizer that then replaces the current
+    one, so predictions running on other threads never see a half-loaded model.
+    """
+    global _recognizer
+    mtime = os.path.getmtime(model_path)
+    with _recognizer_lock:
+        if _recognizer is None or _recognizer[2] != mtime:
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(model_path)
+            _recognizer = (recognizer, load_label_mapping(), mtime)
+        return _recognizer[0], _recognizer[1]
+
+def install_recognizer(recognizer, label_mapping):
+    """Serve a freshly trained recognizer that has just been written to ``model_path``."""
+    global _recognizer
+    with _recognizer_lock:
+        _recognizer = (recognizer, dict(label_mapping), os.path.getmtime(model_path))
+
+def train_model(job):
+    """Train or update the face recognition model from the Cloudinary manifest using integer labels.
+
+    Runs inside a training job (see ``get_training_runner``); raises on failure.
+    When images were only added since the last training, the existing model is
+    updated with just those images; otherwise it is retrained from scratch.
+    The previous recognizer keeps serving until the new one is written.
+    """
+    job.stage("listing")
+    with metrics.span(TRAIN_STREAM, "list", session="train_model"):
+        try:
+            manifest = cloudinary_manifest.sync_manifest(get_cloudinary())
+        except Exception as e:
+            raise RuntimeError(f"Error accessing Cloudinary: {e}") from e
+    if not cloudinary_manifest.folders(manifest):
+        raise RuntimeError("No user folders found in Cloudinary.")
+
+    detector = get_recognition_detector(wait=True)
+    trained = load_trained_resources()
+    added, changed, removed = cloudinary_manifest.diff(trained, manifest)
+    model_exists = os.path.exists(model_path)
+    # A model trained on another detector's crops is retrained from scratch.
+    same_detector = load_recognizer_meta().get("detector") == detector.name
+    if not (added or changed or removed) and model_exists and same_detector:
+        return False
 
-    face_recognizer = cv2.face.LBPHFaceRecognizer_create()
+    incremental = model_exists and same_detector and bool(trained) and not changed and not removed
+    work_set = added if incremental else list(manifest["resources"])
 
     label_mapping = load_label_mapping()
     next_label_id = max(label_mapping.values(), default=-1) + 1
 
+    job.stage("fetching", total=len(work_set))
+    images = []
+    for public_id in work_set:
+        entry = manifest["resources"][public_id]
+        job.advance()
+        if not entry.get("folder"):
+            continue
+        try:
+            with metrics.span(TRAIN_STREAM, "fetch", session="train_model"):
+                resp = requests.get(entry["secure_url"], stream=True)
+                images.append((public_id, np.asarray(bytearray(resp.raw.read()), dtype=np.uint8)))
+        except Exception as e:
+            job.warn(f"Error fetching image {public_id}: {e}")
+
+    job.stage("detecting", total=len(images))
     faces = []
     labels = []
-
-    for folder in user_folders:
+    processed = {}
+    for public_id, img_array in images:
+        entry = manifest["resources"][public_id]
+        folder = entry["folder"]
+        job.advance()
         if folder not in label_mapping:
             label_mapping[folder] = next_label_id
             next_label_id += 1
-
-        images = cloudinary.api.resources(type='upload', prefix=f"AiSee/{folder}/")['resources']
-        for img in images:
-            try:
-                url = img['secure_url']
-                resp = requests.get(url, stream=True)
-                img_array = np.asarray(bytearray(resp.raw.read()), dtype=np.uint8)
+        try:
+            with metrics.span(TRAIN_STREAM, "detect", session="train_model"):
                 frame = cv2.imdecode(img_array, cv2.IMREAD_GRAYSCALE)
-                detected_faces = face_cascade.detectMultiScale(frame, scaleFactor=1.2, minNeighbors=5)
-                for (x, y, w, h) in detected_faces:
-                    face = frame[y:y+h, x:x+w]
-                    faces.append(face)
-                    labels.append(label_mapping[folder])
-            except Exception as e:
-                st.warning(f"Error processing image {img['public_id']}: {e}")
-
-    if faces:
-        face_recognizer.train(faces, np.array(labels, dtype=np.int32))
-        face_recognizer.write(model_path)
-        save_trained_folders(user_folders)
-        save_label_mapping(label_mapping)
-        return True
+                detected_faces = detector.boxes(frame)
+            for (x, y, w, h) in detected_faces:
+                face = frame[y:y+h, x:x+w]
+                faces.append(face)
+                labels.append(label_mapping[folder])
+            processed[public_id] = entry.get("version")
+        except Exception as e:
+            job.warn(f"Error processing image {public_id}: {e}")
+
+    job.stage("training", total=len(faces))
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    if incremental:
+        recognizer.read(model_path)
+        if faces:
+            with metrics.span(TRAIN_STREAM, "train", session="train_model"):
+                recognizer.update(faces, np.array(labels, dtype=np.int32))
+        processed = {**trained, **processed}
+    elif faces:
+        with metrics.span(TRAIN_STREAM, "train", session="train_model"):
+            recognizer.train(faces, np.array(labels, dtype=np.int32))
     else:
-        st.error("No faces found for training.")
+        raise RuntimeError("No faces found for training.")
+    job.advance(len(faces))
+
+    job.stage("writing")
+    with metrics.span(TRAIN_STREAM, "write", session="train_model"):
+        # The mapping only ever grows, so the old model stays valid against it.
+        save_label_mapping(label_mapping)
+        # OpenCV picks the format from the extension, so the temp file keeps ".yml".
+        tmp_path = model_path[:-len(".yml")] + ".tmp.yml"
+        recognizer.write(tmp_path)
+        os.replace(tmp_path, model_path)
+        save_recognizer_meta({"detector": detector.name})
+    install_recognizer(recognizer, label_mapping)
+    save_trained_resources(processed)
+    return True
+
+@st.cache_resource
+def get_training_runner():
+    """One training runner per process, so concurrent sessions share a single run."""
+    return JobRunner("face-training", train_model)
+
+def render_training_status(job):
+    """Show progress of ``job``; returns True while it is still running."""
+    if job is None:
         return False
+    if job.running:
+        st.progress(job.fraction(), text=f"Training face recognition model: {job.describe()}")
+    elif job.state == "failed":
+        st.error(f"Failed to train the face recognition model: {job.error}")
+    for warning in job.warnings[-5:]:
+        st.warning(warning)
+    return job.running
 
 def get_user_id_by_name(name):
     """Get user ID by name from the users collection."""
-    users_ref = db.collection("users").where("name", "==", name).stream()
-    for user in users_ref:
-        return user.id
-    return None
-
-def get_attendance_id(user_id, subject, semester="semester-1"):
-    """Get attendance ID from the attendance collection."""
-    attendance_ref = db.collection("attendance").where("userId", "==", user_id).where("subject", "==", subject).where("semester", "==", semester).stream()
+    return get_user_directory().user_id_by_name(name)
+
+def identify_face(face):
+    """Return (folder_name, confidence) for a grayscale face crop, or (None, confidence)."""
+    recognizer, label_mapping = load_recognizer()
+    label_id, confidence = recognizer.predict(face)
+    if confidence >= 100:
+        return None, confidence
+    folder_name = next((folder for folder, id in label_mapping.items() if id == label_id), None)
+    return folder_name, confidence
+
+def detect_faces(gray):
+    return detect_recognition_faces(gray)
+
+def presence_sink(attendance_id, session_id, student_name):
+    """Build a flush callback that stores ``student_name``'s presence intervals in Firestore.
+
+    The attendance record belongs to the verified student, so intervals of
+    anyone else the recognizer picks up in the frame are not written to it.
+    """
+    db = get_db()
+
+    def sink(flushed):
+        for student, spans in flushed.items():
+            if student.lower() != student_name.lower():
+                continue
+            db.collection("presenceLogs").add({
+                "attendanceId": attendance_id,
+                "sessionId": session_id,
+                "name": student,
+                "intervals": [
+                    {"start": datetime.fromtimestamp(start).isoformat(), "end": datetime.fromtimestamp(end).isoformat()}
+                    for start, end in spans
+                ],
+            })
+    return sink
+
+def get_attendance(user_id, subject, semester="semester-1"):
+    """Get (attendance ID, attendance document) from the attendance collection."""
+    attendance_ref = get_db().collection("attendance").where("userId", "==", user_id).where("subject", "==", subject).where("semester", "==", semester).stream()
     for attendance in attendance_ref:
-        return attendance.id
-    return None
+        return attendance.id, attendance.to_dict() or {}
+    return None, None
 
 ### WebRTC Video Transformer ###
 class FaceVerificationTransformer(VideoTransformerBase):
@@ -141,22 +264,38 @@ class FaceVerificationTransformer(VideoTransformerBase):
         self.last_face = None
         self.face_detected = False
         self.model_loaded = False
-        
+        self.latest_gray = None
+        self.frame_lock = threading.Lock()
+
+    def get_latest_gray(self):
+        """Return (timestamp, gray) of the newest frame, or None before the first one."""
+        with self.frame_lock:
+            return self.latest_gray
+
     def transform(self, frame):
-        img = frame.to_ndarray(format="bgr24")
+        with metrics.span(STREAM, "to_ndarray"):
+            img = working_frame(frame, VIDEO_PROFILE)
 
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        with metrics.span(STREAM, "cvt_color"):
+            rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-        gray = cv2.cvtColor(rgb_img, cv2.COLOR_RGB2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+            gray = cv2.cvtColor(rgb_img, cv2.COLOR_RGB2GRAY)
+        with self.frame_lock:
+            self.latest_gray = (time.time(), gray)
+        with metrics.span(STREAM, "detect"):
+            faces = detect_recognition_faces(img)
         
-        for (x, y, w, h) in faces:
-            cv2.rectangle(rgb_img, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            if not self.face_detected:
-                self.last_face = gray[y:y+h, x:x+w]
-                self.face_detected = True
+        with metrics.span(STREAM, "draw"):
+            for (x, y, w, h) in faces:
+                cv2.rectangle(rgb_img, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                if not self.face_detected:
+                    self.last_face = gray[y:y+h, x:x+w]
+                    self.face_detected = True
+        metrics.frame_done(STREAM)
+        metrics.draw_overlay(rgb_img, STREAM)
                 
-        return cv2.cvtColor(rgb_img, cv2.COLOR_RGB2BGR)
+        with metrics.span(STREAM, "to_bgr"):
+            return cv2.cvtColor(rgb_img, cv2.COLOR_RGB2BGR)
 
 ### Main Function ###
 def verify_user():
@@ -170,21 +309,35 @@ def verify_user():
         st.warning("Please fill in all fields: Name, Subject, and Session.")
         return
 
-    if not os.path.exists(model_path):
-        st.info("Training face recognition model...")
-        if not train_model():
-            st.error("Failed to train the face recognition model.")
-            return
-    else:
+    runner = get_training_runner()
+    model_ready = os.path.exists(model_path)
+    label_mapping = {}
+    if model_ready:
         try:
-            face_recognizer.read(model_path)
-        except:
+            _, label_mapping = load_recognizer()
+        except Exception:
             st.info("Existing model appears invalid, retraining...")
-            if not train_model():
-                st.error("Failed to train the face recognition model.")
-                return
+            model_ready = False
+    detector = get_recognition_detector()
+    if model_ready and detector is not None and load_recognizer_meta().get("detector") != detector.name:
+        st.info(f"The face model was not trained on {detector.name} face crops; retraining...")
+        model_ready = False
+    job = runner.current()
+    if not model_ready and job is None:
+        job = runner.start()
+
+    if render_training_status(job) and not model_ready:
+        # Nothing to verify against yet; poll until the job finishes.
+        time.sleep(0.5)
+        st.rerun()
+    if job is None or not job.running:
+        label = "Update face model" if model_ready else "Retry training"
+        if st.button(label, help="Retrain in the background from the registered faces; verification keeps using the current model meanwhile."):
+            runner.start()
+            st.rerun()
+    if not model_ready:
+        return
 
-    label_mapping = load_label_mapping()
     if not label_mapping:
         st.error("No label mapping found. Please register users first.")
         return
@@ -194,10 +347,7 @@ def verify_user():
         video_transformer_factory=FaceVerificationTransformer,
         async_transform=True,
         mode=WebRtcMode.SENDRECV,
-        media_stream_constraints={
-            "video": True,
-            "audio": False
-        },
+        media_stream_constraints=VIDEO_PROFILE.constraints(),
         rtc_configuration={
             "iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]
         }
@@ -212,9 +362,8 @@ def verify_user():
             face = ctx.video_transformer.last_face
             if face is not None and isinstance(face, np.ndarray):
                 try:
-                    label_id, confidence = face_recognizer.predict(face)
+                    folder_name, confidence = identify_face(face)
                     if confidence < 100:
-                        folder_name = next((folder for folder, id in label_mapping.items() if id == label_id), None)
                         if folder_name:
                             if folder_name.lower() == name.lower():
                                 st.success(f"✅ Welcome back, {folder_name}! Confidence: {confidence:.2f}")
@@ -224,20 +373,20 @@ def verify_user():
                                     st.error("User not found in database.")
                                     return
 
-                                attendance_id = get_attendance_id(user_id, subject)
+                                attendance_id, attendance = get_attendance(user_id, subject)
                                 if not attendance_id:
                                     st.error(f"No attendance record found for {name} in subject {subject}.")
                                     return
 
                                 session_id = f"session{session}"
                                 timestamp = datetime.now().isoformat()
-                                db.collection("attendanceLogs").add({
-                                    "attendanceId": attendance_id,
-                                    "sessionId": session_id,
-                                    "timestamp": timestamp,
-                                    "isVerified": True
-                                })
+                                counter = log_attendance(get_db(), attendance_id, session_id, timestamp, True)
                                 st.success(f"Attendance logged for {name} in {subject}, session {session}.")
+                                minimum = attendance.get("minimum")
+                                status = "meets" if meets_minimum(counter, minimum) else "does not yet meet"
+                                st.info(f"{name} has attended {counter['verifiedSessions']} verified session(s) of {subject} "
+                                        f"and {status} the minimum of {minimum or 0}.")
+                                st.session_state.presence_target = (attendance_id, session_id, folder_name)
                             else:
                                 st.error(f"❌ Name mismatch: Predicted {folder_name}, but you entered {name}.")
                         else:
@@ -247,6 +396,56 @@ def verify_user():
                 except Exception as e:
                     st.error(f"Error during face prediction: {e}")
 
+        continuous_presence(ctx)
+
+def stop_presence():
+    scheduler = st.session_state.pop("presence_scheduler", None)
+    if scheduler is not None:
+        scheduler.stop()
+
+def continuous_presence(ctx):
+    """Re-identify faces in the background while the session stream is running."""
+    st.subheader("Continuous Presence")
+    target = st.session_state.get("presence_target")
+    scheduler = st.session_state.get("presence_scheduler")
+
+    if target is None:
+        st.caption("Verify a face to start presence tracking for this session.")
+        return
+
+    interval = st.slider("Re-verification interval (s)", min_value=1, max_value=30, value=5)
+
+    # A new stream or a newly verified student gets a fresh scheduler.
+    key = (ctx.video_transformer, target)
+    if scheduler is not None and (not ctx.state.playing or not scheduler.running or scheduler.key != key):
+        stop_presence()
+        scheduler = None
+
+    if scheduler is None and ctx.state.playing:
+        scheduler = PresenceScheduler(
+            frame_source=ctx.video_transformer.get_latest_gray,
+            detect_faces=detect_faces,
+            identify_face=lambda face: identify_face(face)[0],
+            interval=interval,
+            sink=presence_sink(*target),
+            key=key,
+        )
+        scheduler.start()
+        st.session_state.presence_scheduler = scheduler
+    elif scheduler is not None:
+        scheduler.set_interval(interval)
+
+    if scheduler is not None:
+        timeline = scheduler.timeline.snapshot()
+        st.write(f"Recognizer runs: {scheduler.recognitions} over {scheduler.ticks} checks")
+        for student, spans in timeline.items():
+            seconds = sum(end - start for start, end in spans)
+            st.write(f"{student}: present {int(seconds // 60)}:{int(seconds % 60):02d} across {len(spans)} interval(s)")
+
+def teardown():
+    """Called by main when the user navigates away from this page."""
+    stop_presence()
+
 def render():
     st.title("Face Verification")
     verify_user()
@@ -0,0 +1,90 @@
+import glob
+
+import av
+import cv2
+import numpy as np
+import pytest
+
+from model.emotion import emotion_model
+from modules import attendance_monitoring
+from utils.face_detection import get_face_detector
+
+SAMPLES = sorted(glob.glob("model/emotion/yolov11_finetuned/val_batch*_labels.jpg"))
+
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class FakeBoxes:
+    def __init__(self, rows):
+        self.data = FakeTensor(np.asarray(rows, dtype=np.float32).reshape(-1, 6))
+
+    def __len__(self):
+        return len(self.data.array)
+
+
+class FakeResult:
+    def __init__(self, rows, names):
+        self.boxes = FakeBoxes(rows)
+        self.names = names
+
+
+class FakeModel:
+    """Answers every input with one box of ``class_id``, like a YOLO detector."""
+
+    def __init__(self, names, class_id, score=0.9):
+        self.names = names
+        self.class_id = class_id
+        self.score = score
+
+    def predict(self, source, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        return [FakeResult([[0, 0, 10, 10, self.score, self.class_id]], self.names) for _ in sources]
+
+
+def monitoring_frame():
+    """A 640x480 frame holding the largest bundled sample face, big enough for the half-scale face pass."""
+    faces = []
+    for path in SAMPLES:
+        image = cv2.imread(path)
+        faces += [(w * h, image, (x, y, w, h)) for x, y, w, h in get_face_detector().boxes(image)]
+    if not faces:
+        pytest.skip("no face found in the bundled sample frames")
+    _, image, (x, y, w, h) = max(faces, key=lambda f: f[0])
+    m = w // 4
+    face = cv2.resize(image[max(y - m, 0):y + h + m, max(x - m, 0):x + w + m], (240, 240))
+    frame = np.full((480, 640, 3), 127, dtype=np.uint8)
+    frame[120:360, 200:440] = face
+    boxes = get_face_detector().boxes(cv2.resize(frame, None, fx=0.5, fy=0.5))
+    if not len(boxes):
+        pytest.skip("sample face not detectable at half scale")
+    return frame
+
+
+def test_monitoring_callback_feeds_the_emotion_panel(monkeypatch):
+    image = monitoring_frame()
+    seats = {"A1": {"region": (200, 120, 240, 240), "occupied": False, "start_time": None, "accumulated_time": 0.0}}
+
+    emotions = FakeModel({0: "happy", 1: "sad"}, class_id=1)
+    monkeypatch.setattr(emotion_model, "load_model", lambda: emotions)
+    monkeypatch.setattr(attendance_monitoring, "load_model", lambda: FakeModel({0: "person"}, class_id=0))
+    monkeypatch.setattr(attendance_monitoring, "get_inference_pool", lambda: None)
+    detector = emotion_model.EmotionDetector(seats_provider=lambda: seats, detect_every=1)
+    monkeypatch.setitem(attendance_monitoring.emotion_config, "detector", detector)
+    monkeypatch.setattr(attendance_monitoring, "global_seats", seats)
+
+    frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+    for _ in range(3):
+        out = attendance_monitoring.video_frame_callback(frame)
+    assert isinstance(out, av.VideoFrame)
+
+    distribution = detector.seat_distribution()
+    assert distribution == {"A1": {"sad": pytest.approx(1.0)}}
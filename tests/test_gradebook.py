@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+from utils import gradebook
+from utils.attendance_counters import log_attendance
+from utils.firestore_memory import MemoryFirestore
+
+
+def semester_db():
+    db = MemoryFirestore({
+        "reports": {
+            "r1": {"semester": "semester-1"},
+            "r2": {"semester": "semester-2"},
+        },
+        "subjects": {
+            "r1_math": {"reportId": "r1", "weight": 2, "passingScore": 70},
+            "r1_art": {"reportId": "r1", "weight": 1, "passingScore": 70},
+            "r2_math": {"reportId": "r2", "weight": 1, "passingScore": 70},
+        },
+        "assignments": {
+            "r1_math_assignment": {"subjectId": "r1_math", "weight": 0.5, "scores": [80, 100]},
+        },
+        "midExams": {
+            "r1_math_mid": {"subjectId": "r1_math", "weight": 0.5, "score": 70},
+            "r1_art_mid": {"subjectId": "r1_art", "weight": 1.0, "score": 60},
+            "r2_math_mid": {"subjectId": "r2_math", "weight": 1.0, "score": 100},
+        },
+        "finalExams": {},
+        "attendance": {
+            "a1": {"semester": "semester-1", "minimum": 2},
+            "a2": {"semester": "semester-1", "minimum": 1},
+            "a3": {"semester": "semester-2", "minimum": 1},
+        },
+    })
+    log_attendance(db, "a1", "session1", "2024-01-01T09:00:00")
+    log_attendance(db, "a1", "session2", "2024-01-08T09:00:00")
+    log_attendance(db, "a1", "session2", "2024-01-08T09:05:00")
+    log_attendance(db, "a2", "session1", "2024-01-01T09:00:00", is_verified=False)
+    return db
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 500])
+def test_read_collection_pages_through_every_document(page_size):
+    db = MemoryFirestore({"users": {f"u{i:02d}": {"n": i} for i in range(9)}})
+    frame = gradebook.read_collection(db, "users", page_size=page_size)
+    assert list(frame["id"]) == [f"u{i:02d}" for i in range(9)]
+    assert list(frame["n"]) == list(range(9))
+
+
+def test_read_collection_applies_where_across_pages():
+    db = MemoryFirestore({"attendance": {f"a{i}": {"semester": f"semester-{i % 2}"} for i in range(7)}})
+    frame = gradebook.read_collection(db, "attendance", page_size=2, where=("semester", "==", "semester-1"))
+    assert sorted(frame["id"]) == ["a1", "a3", "a5"]
+
+
+def test_read_collection_of_empty_collection():
+    assert gradebook.read_collection(MemoryFirestore(), "missing", page_size=2).empty
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 500])
+def test_compute_semester(page_size):
+    subjects, reports, attendance = gradebook.compute_semester(semester_db(), "semester-1", page_size)
+
+    subjects = subjects.set_index("id")
+    assert sorted(subjects.index) == ["r1_art", "r1_math"]
+    assert subjects.loc["r1_math", "score"] == pytest.approx(80.0)
+    assert subjects.loc["r1_math", "isPass"]
+    assert subjects.loc["r1_art", "score"] == pytest.approx(60.0)
+    assert not subjects.loc["r1_art", "isPass"]
+
+    assert list(reports["id"]) == ["r1"]
+    assert reports.iloc[0]["overallScore"] == pytest.approx((80.0 * 2 + 60.0) / 3)
+
+    attendance = attendance.set_index("id")
+    assert sorted(attendance.index) == ["a1", "a2"]
+    assert attendance.loc["a1", "verifiedSessions"] == 2
+    assert attendance.loc["a1", "isPass"]
+    assert attendance.loc["a2", "verifiedSessions"] == 0
+    assert not attendance.loc["a2", "isPass"]
+
+
+def test_run_writes_results_in_batches():
+    db = semester_db()
+    summary, *_ = gradebook.run(db, "semester-1")
+    assert summary == {"subjects": 2, "reports": 1, "attendance": 2}
+    assert db.collection("subjects").document("r1_math").get().get("isPass") is True
+    assert db.collection("reports").document("r1").get().get("overallScore") == pytest.approx(73.33)
+    assert db.collection("attendance").document("a2").get().get("isPass") is False
+    # Other semesters are left untouched.
+    assert db.collection("attendance").document("a3").get().get("isPass") is None
+
+
+def test_dry_run_does_not_write():
+    db = semester_db()
+    gradebook.run(db, "semester-1", dry_run=True)
+    assert db.collection("attendance").document("a1").get().get("isPass") is None
+
+
+def test_write_results_splits_batches():
+    db = MemoryFirestore({"attendance": {f"a{i}": {} for i in range(5)}})
+    frame = pd.DataFrame({"id": [f"a{i}" for i in range(5)], "isPass": [True, False, True, False, True]})
+    assert gradebook.write_results(db, "attendance", frame, ["isPass"], batch_size=2) == 5
+    assert [db.collection("attendance").document(f"a{i}").get().get("isPass") for i in range(5)] == [True, False, True, False, True]
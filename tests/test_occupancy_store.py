@@ -0,0 +1,48 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from utils.occupancy_store import OccupancyStore
+
+
+@pytest.fixture
+def jakarta_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Jakarta")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OccupancyStore(root=str(tmp_path), flush_seconds=3600)
+    yield store
+    store.close()
+
+
+def test_csv_export_is_sorted_across_parts(store):
+    base = time.time() - 600
+    store.append("A1", "s1", True, ts=base + 10)
+    store.append("A1", "s1", False, ts=base + 30)
+    store.flush()
+    store.append("B2", "s1", True, ts=base + 20)
+    store.flush()
+    store.append("B2", "s1", False, ts=base + 5)
+
+    lines = "".join(store.iter_csv(base, base + 60, chunk_rows=3)).splitlines()
+    assert lines[0] == "Timestamp,Seat Label,Session,Event"
+    stamps = [line.split(",")[0] for line in lines[1:]]
+    assert stamps == sorted(stamps)
+    assert [line.split(",")[1] for line in lines[1:]] == ["B2", "A1", "B2", "A1"]
+
+
+def test_heatmap_buckets_are_labelled_in_local_time(store, jakarta_time):
+    start = (time.time() // 60) * 60 - 600
+    store.append("A1", "s1", True, ts=start)
+    store.append("A1", "s1", False, ts=start + 120)
+
+    heatmap = store.heatmap(start, start + 300)
+    assert heatmap.index[0] == datetime.fromtimestamp(start)
+    assert heatmap["A1"].tolist()[:3] == [1.0, 1.0, 0.0]
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from modules import face_verification
+from utils.presence import PresenceScheduler
+
+
+def test_stale_frames_are_not_counted():
+    frame = (time.time() - 30.0, np.zeros((100, 100), dtype=np.uint8))
+    scheduler = PresenceScheduler(lambda: frame, lambda gray: [(10, 10, 40, 40)], lambda face: "ann", interval=2.0)
+    scheduler.tick()
+    assert scheduler.ticks == 0
+    assert scheduler.timeline.snapshot() == {}
+
+
+def test_scheduler_stops_and_flushes_once_the_stream_goes_idle():
+    flushed = []
+    start = time.time()
+    frames = iter([(start, np.zeros((100, 100), dtype=np.uint8))])
+
+    def frame_source():
+        return next(frames, None)
+
+    scheduler = PresenceScheduler(frame_source, lambda gray: [(10, 10, 40, 40)], lambda face: "ann",
+                                  interval=0.05, idle_timeout=0.3, sink=flushed.append, key="stream-1")
+    scheduler.start()
+    scheduler.join(timeout=5)
+    assert not scheduler.is_alive()
+    assert scheduler.key == "stream-1"
+    assert [list(f) for f in flushed] == [["ann"]]
+
+
+def write_model(path, mapping_path, mapping, seed):
+    rng = np.random.default_rng(seed)
+    faces = [rng.integers(0, 255, (64, 64), dtype=np.uint8) for _ in mapping]
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(faces, np.array(list(mapping.values()), dtype=np.int32))
+    recognizer.write(str(path))
+    with open(mapping_path, "w") as f:
+        json.dump(mapping, f)
+    return faces
+
+
+def test_recognizer_reloads_only_when_the_model_file_changes(tmp_path, monkeypatch):
+    model = tmp_path / "face_recognizer.yml"
+    mapping = tmp_path / "label_mapping.json"
+    monkeypatch.setattr(face_verification, "model_path", str(model))
+    monkeypatch.setattr(face_verification, "LABEL_MAPPING_FILE", str(mapping))
+    monkeypatch.setattr(face_verification, "_recognizer", None)
+
+    faces = write_model(model, mapping, {"ann": 0}, seed=1)
+    first, labels = face_verification.load_recognizer()
+    assert labels == {"ann": 0}
+    assert face_verification.load_recognizer()[0] is first
+    assert face_verification.identify_face(faces[0])[0] == "ann"
+
+    faces = write_model(model, mapping, {"ann": 0, "bob": 1}, seed=2)
+    os.utime(model, (time.time() + 5, time.time() + 5))
+    second, labels = face_verification.load_recognizer()
+    assert second is not first
+    assert labels == {"ann": 0, "bob": 1}
+    assert face_verification.identify_face(faces[1])[0] == "bob"
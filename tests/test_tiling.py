@@ -0,0 +1,48 @@
+import pytest
+
+from utils.tiling import _expand, plan_tiles, tiles_worthwhile
+
+FRAME = (1080, 1920)
+
+
+def contains(tile, box):
+    return tile[0] <= box[0] and tile[1] <= box[1] and tile[2] >= box[2] and tile[3] >= box[3]
+
+
+def assert_covered(regions, tiles, margin=0.5, frame=FRAME):
+    height, width = frame
+    for region in regions:
+        box = _expand(region, margin, width, height)
+        assert any(contains(tile, box) for tile in tiles), (region, tiles)
+    for x1, y1, x2, y2 in tiles:
+        assert all(isinstance(v, int) for v in (x1, y1, x2, y2))
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+
+
+def test_seat_wider_than_tile_with_fractional_edge():
+    regions = ((11, 0, 461, 100),)
+    tiles = plan_tiles(regions, FRAME)
+    assert len(tiles) == 1
+    assert_covered(regions, tiles)
+
+
+@pytest.mark.parametrize("regions", [
+    ((101, 33, 77, 51),),
+    ((3, 5, 7, 9), (640, 360, 33, 45), (1900, 1070, 15, 9)),
+    ((10, 10, 1001, 23), (1500, 700, 401, 379)),
+])
+def test_fractional_and_odd_width_seats_are_covered(regions):
+    assert_covered(regions, plan_tiles(regions, FRAME))
+
+
+def test_nearby_seats_share_a_tile():
+    regions = ((100, 100, 50, 50), (220, 140, 50, 50))
+    tiles = plan_tiles(regions, FRAME)
+    assert len(tiles) == 1
+    assert_covered(regions, tiles)
+    assert tiles_worthwhile(tiles, FRAME)
+
+
+def test_tiles_covering_the_whole_frame_are_not_worthwhile():
+    assert not tiles_worthwhile(((0, 0, 1920, 1080),), FRAME)
+    assert not tiles_worthwhile((), FRAME)
@@ -0,0 +1,103 @@
+import time
+
+from utils.firestore_memory import MemoryFirestore
+from utils.user_directory import UserDirectory
+
+
+def users_db():
+    return MemoryFirestore({"users": {
+        "u1": {"username": "ann", "name": "Ann"},
+        "u2": {"username": "bob", "name": "Bob"},
+        "u3": {"username": "bob2", "name": "Bob"},
+    }})
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+class CountingDirectory(UserDirectory):
+    reloads = 0
+
+    def _reload(self):
+        self.reloads += 1
+        super()._reload()
+
+
+def test_lookups_are_served_from_the_loaded_index():
+    directory = UserDirectory(users_db()).start()
+    assert directory.get("u1") == {"username": "ann", "name": "Ann"}
+    assert directory.find_by_username("ann") == ("u1", {"username": "ann", "name": "Ann"})
+    assert directory.ids_by_name("Bob") == ["u2", "u3"]
+    assert directory.user_id_by_name("Bob") == "u2"
+    assert directory.find_by_username("nobody") == (None, None)
+
+
+def test_snapshot_listener_applies_changes():
+    db = users_db()
+    directory = UserDirectory(db).start()
+
+    db.collection("users").document("u4").set({"username": "cy", "name": "Cy"})
+    db.collection("users").document("u1").update({"username": "anne"})
+    db.collection("users").document("u2").delete()
+
+    assert directory.by_username.get("cy") == "u4"
+    assert directory.by_username.get("anne") == "u1"
+    assert "ann" not in directory.by_username
+    assert directory.ids_by_name("Bob") == ["u3"]
+
+
+def test_missing_key_falls_back_to_a_query_and_indexes_the_result():
+    db = users_db()
+    directory = UserDirectory(db).start()
+    directory.stop()
+    db.collection("users").document("u5").set({"username": "dee", "name": "Dee"})
+    assert "dee" not in directory.by_username
+
+    assert directory.find_by_username("dee") == ("u5", {"username": "dee", "name": "Dee"})
+    assert directory.by_username["dee"] == "u5"
+    assert directory.ids_by_name("Dee") == ["u5"]
+
+
+def test_healthy_listener_on_a_quiet_collection_does_not_reload():
+    directory = CountingDirectory(users_db(), max_staleness=0.0).start()
+    for _ in range(5):
+        directory.get("u1")
+    assert directory.listener_healthy()
+    assert directory.reloads == 0
+
+
+def test_closed_listener_reloads_and_resubscribes():
+    db = users_db()
+    directory = CountingDirectory(db, max_staleness=0.0).start()
+    directory._watch._closed = True
+    db.collection("users").document("u6").set({"username": "eve", "name": "Eve"})
+
+    directory.get("u1")
+    wait_for(lambda: directory.reloads == 1 and not directory._reloading)
+    assert directory.listener_healthy()
+    assert directory.by_username["eve"] == "u6"
+
+
+def test_failed_snapshot_callback_marks_listener_unhealthy():
+    directory = UserDirectory(users_db()).start()
+    try:
+        directory._on_snapshot(None, [object()], None)
+    except Exception:
+        pass
+    assert not directory.listener_healthy()
+
+
+def test_reload_waits_for_max_staleness_without_a_listener():
+    db = users_db()
+    directory = CountingDirectory(db, max_staleness=60.0).start()
+    directory.stop()
+    directory.get("u1")
+    assert directory.reloads == 0
+
+    directory.last_update -= 60.0
+    directory.get("u1")
+    wait_for(lambda: directory.reloads == 1 and not directory._reloading)
@@ -0,0 +1,169 @@
+"""Per-attendance aggregate counters maintained alongside attendance log writes.
+
+Each ``attendanceCounters/<attendanceId>`` document holds the number of
+distinct verified sessions, the last time the student was seen and a bitmap of
+verified session numbers (bit N set for ``sessionN``, stored as a hex string so
+it is not limited to 64 sessions). Logging an attendance record updates the
+counter in the same transaction, so pass/fail checks read one small document
+instead of counting logs.
+
+    python -m utils.attendance_counters --reconcile [--dry-run]
+"""
+import argparse
+import logging
+import re
+
+from utils.gradebook import BATCH_SIZE, COUNTERS, read_collection
+
+logger = logging.getLogger(__name__)
+
+SESSION_PATTERN = re.compile(r"^session(\d+)$")
+
+
+def session_bit(session_id):
+    match = SESSION_PATTERN.match(session_id or "")
+    return int(match.group(1)) if match else None
+
+
+def parse_bitmap(value):
+    return int(value, 16) if value else 0
+
+
+def format_bitmap(bitmap):
+    return format(bitmap, "x")
+
+
+def run_transaction(db, func):
+    """Run ``func(transaction)`` atomically on Firestore or on the in-memory stand-in."""
+    if hasattr(db, "run_transaction"):
+        return db.run_transaction(func)
+    from firebase_admin import firestore
+    return firestore.transactional(func)(db.transaction())
+
+
+def log_attendance(db, attendance_id, session_id, timestamp, is_verified=True):
+    """Insert an attendanceLogs document and update its counter in one transaction.
+
+    Returns the counter document as written.
+    """
+    log_ref = db.collection("attendanceLogs").document()
+    counter_ref = db.collection(COUNTERS).document(attendance_id)
+    bit = session_bit(session_id)
+    if bit is None:
+        logger.warning("Session id %r is not of the form sessionN; it will not be counted.", session_id)
+
+    def update(transaction):
+        snapshot = counter_ref.get(transaction=transaction)
+        counter = snapshot.to_dict() if snapshot.exists else {}
+        bitmap = parse_bitmap(counter.get("sessionBitmap"))
+        if is_verified and bit is not None:
+            bitmap |= 1 << bit
+        last_seen = counter.get("lastSeen")
+        if is_verified and (last_seen is None or timestamp > last_seen):
+            last_seen = timestamp
+        counter = {
+            "attendanceId": attendance_id,
+            "verifiedSessions": bin(bitmap).count("1"),
+            "lastSeen": last_seen,
+            "sessionBitmap": format_bitmap(bitmap),
+        }
+        transaction.set(log_ref, {
+            "attendanceId": attendance_id,
+            "sessionId": session_id,
+            "timestamp": timestamp,
+            "isVerified": is_verified,
+        })
+        transaction.set(counter_ref, counter)
+        return counter
+
+    return run_transaction(db, update)
+
+
+def get_counter(db, attendance_id):
+    snapshot = db.collection(COUNTERS).document(attendance_id).get()
+    if not snapshot.exists:
+        return {"attendanceId": attendance_id, "verifiedSessions": 0, "lastSeen": None, "sessionBitmap": "0"}
+    return snapshot.to_dict()
+
+
+def meets_minimum(counter, minimum):
+    """Pass/fail for one attendance record from its counter document."""
+    return counter["verifiedSessions"] >= (minimum or 0)
+
+
+def build_counters(logs):
+    """Recompute counters from attendanceLogs rows (dicts); returns {attendanceId: counter}."""
+    counters = {}
+    for log in logs:
+        if not log.get("isVerified"):
+            continue
+        attendance_id = log.get("attendanceId")
+        counter = counters.setdefault(attendance_id, {"bitmap": 0, "lastSeen": None})
+        bit = session_bit(log.get("sessionId"))
+        if bit is not None:
+            counter["bitmap"] |= 1 << bit
+        timestamp = log.get("timestamp")
+        if timestamp and (counter["lastSeen"] is None or timestamp > counter["lastSeen"]):
+            counter["lastSeen"] = timestamp
+    return {
+        attendance_id: {
+            "attendanceId": attendance_id,
+            "verifiedSessions": bin(c["bitmap"]).count("1"),
+            "lastSeen": c["lastSeen"],
+            "sessionBitmap": format_bitmap(c["bitmap"]),
+        }
+        for attendance_id, c in counters.items()
+    }
+
+
+def reconcile(db, dry_run=False):
+    """Backfill or repair every counter from the logs; returns the IDs that changed."""
+    logs = read_collection(db, "attendanceLogs")
+    expected = build_counters(logs.to_dict("records")) if not logs.empty else {}
+    current = read_collection(db, COUNTERS)
+    current = {row["id"]: row for row in current.to_dict("records")} if not current.empty else {}
+
+    changed = [
+        attendance_id for attendance_id, counter in expected.items()
+        if any(current.get(attendance_id, {}).get(key) != value for key, value in counter.items())
+    ]
+    stale = [attendance_id for attendance_id in current if attendance_id not in expected]
+    if dry_run:
+        return changed + stale
+
+    batch = db.batch()
+    pending = 0
+    for attendance_id in changed + stale:
+        ref = db.collection(COUNTERS).document(attendance_id)
+        if attendance_id in expected:
+            batch.set(ref, expected[attendance_id])
+        else:
+            batch.delete(ref)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return changed + stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain attendanceCounters documents.")
+    parser.add_argument("--reconcile", action="store_true", help="Rebuild counters from attendanceLogs")
+    parser.add_argument("--dry-run", action="store_true", help="Report differences without writing")
+    args = parser.parse_args()
+    if not args.reconcile:
+        parser.print_help()
+        return
+
+    from utils.clients import get_db
+    changed = reconcile(get_db(), dry_run=args.dry_run)
+    print(f"{len(changed)} counter(s) {'differ' if args.dry_run else 'updated'}")
+    for attendance_id in changed:
+        print(f"  {attendance_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Benchmark inference settings on this machine and write a tuned profile.
+
+For every model the reference is the PyTorch backend at its default size with
+all classes. Each candidate (backend x imgsz x class filter) runs at each
+torch/OpenCV thread count on sample frames. A candidate is accepted if its
+detections agree with the reference (F1 at IoU 0.5 on the classes the app
+uses). The fastest accepted candidate wins, with the thread count chosen to
+minimise the total across models. The emotion model runs on face crops in the
+app, so it is tuned on face crops cut from the sample frames.
+
+    python -m utils.autotune [--models person emotion] [--frames dir] [--out inference_profile.json]
+"""
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import platform
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from utils.detections import DetectionBatch
+from utils.face_detection import get_face_detector
+from utils.inference_profile import DEFAULTS, PROFILE_PATH
+from utils.model_manager import MODEL_PATHS
+from utils.tracking import iou_matrix
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = "model/exports"
+SAMPLE_FRAMES = [
+    "model/cheating/yolov9m_finetuned/val_batch*_labels.jpg",
+    "model/emotion/yolov11_finetuned/val_batch*_labels.jpg",
+]
+REFERENCE_IMGSZ = {"cheating": 640, "person": 640, "emotion": 224}
+CANDIDATE_IMGSZ = {
+    "cheating": [320, 416, 480, 512, 640],
+    "person": [320, 416, 480, 512, 640],
+    # Face crops are a few hundred pixels at most.
+    "emotion": [96, 128, 160, 192, 224],
+}
+# Models that the app runs on face crops rather than whole frames.
+CROP_MODELS = {"emotion"}
+# Same margin as EmotionDetector.crop.
+CROP_MARGIN = 0.25
+# Classes each page actually consumes; None means all.
+APP_CLASSES = {"cheating": None, "person": [0], "emotion": None}
+# Confidence threshold each page predicts with; None means Ultralytics' default.
+APP_CONF = {"cheating": 0.5, "person": 0.3, "emotion": None}
+EXPORT_FORMATS = {"onnx": ".onnx", "openvino": "_openvino_model"}
+
+
+def load_frames(pattern=None, limit=16, size=(1280, 720)):
+    patterns = [os.path.join(pattern, "*")] if pattern and os.path.isdir(pattern) else [pattern] if pattern else SAMPLE_FRAMES
+    frames = []
+    for p in patterns:
+        for path in sorted(glob.glob(p)):
+            image = cv2.imread(path)
+            if image is not None:
+                frames.append(cv2.resize(image, size) if size else image)
+    return frames[:limit]
+
+
+def face_crops(frames, margin=CROP_MARGIN, limit=64):
+    """Face crops (with ``margin`` around each box) cut from ``frames``, as the emotion page feeds them."""
+    crops = []
+    for frame in frames:
+        h, w = frame.shape[:2]
+        for x, y, fw, fh in get_face_detector().boxes(frame):
+            mx, my = fw * margin, fh * margin
+            crop = frame[max(int(y - my), 0):min(int(y + fh + my), h), max(int(x - mx), 0):min(int(x + fw + mx), w)]
+            if crop.size:
+                crops.append(crop)
+    return crops[:limit]
+
+
+def set_threads(count):
+    import torch
+    torch.set_num_threads(count)
+    cv2.setNumThreads(count)
+
+
+def export_backend(name, backend):
+    """Export ``name`` to ``backend`` once (dynamic input size); returns the weights path or None."""
+    suffix = EXPORT_FORMATS[backend]
+    target = os.path.join(EXPORT_DIR, f"{name}_{backend}{suffix}")
+    if os.path.exists(target):
+        return target
+    from ultralytics import YOLO
+    try:
+        exported = YOLO(MODEL_PATHS[name]).export(format=backend, dynamic=True, verbose=False)
+    except Exception as e:
+        logger.warning("Skipping %s backend for %s: %s", backend, name, e)
+        return None
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    shutil.move(str(exported), target)
+    return target
+
+
+def detections(results, classes):
+    out = []
+    for result in results:
+        batch = DetectionBatch.from_result(result).filter(classes=classes)
+        out.append((batch.boxes, batch.class_ids))
+    return out
+
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    """F1 of candidate detections against the reference, matching boxes of the same class."""
+    hits = ref_total = cand_total = 0
+    for (ref_boxes, ref_cls), (boxes, cls) in zip(reference, candidate):
+        ref_total += len(ref_boxes)
+        cand_total += len(boxes)
+        if len(ref_boxes) == 0 or len(boxes) == 0:
+            continue
+        ious = iou_matrix(ref_boxes, boxes) * (ref_cls[:, None] == cls[None, :])
+        used = set()
+        for i in np.argsort(-ious.max(axis=1)):
+            j = int(np.argmax(ious[i]))
+            if ious[i, j] >= iou_threshold and j not in used:
+                used.add(j)
+                hits += 1
+    if ref_total == 0 and cand_total == 0:
+        return 1.0
+    return 2 * hits / (ref_total + cand_total)
+
+
+def time_predict(model, frames, repeats, **kwargs):
+    model.predict(frames[0], verbose=False, **kwargs)
+    latencies = []
+    results = []
+    for r in range(repeats):
+        for frame in frames:
+            start = time.perf_counter()
+            result = model.predict(frame, verbose=False, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if r == 0:
+                results.extend(result)
+    return float(np.percentile(np.array(latencies) * 1000, 50)), results
+
+
+def tune(names, frames, thread_counts, backends, repeats=2, min_agreement=0.9):
+    from ultralytics import YOLO
+
+    crops = face_crops(frames) if CROP_MODELS & set(names) else []
+    if CROP_MODELS & set(names) and not crops:
+        logger.warning("No faces found in the sample frames; skipping %s.", sorted(CROP_MODELS & set(names)))
+        names = [name for name in names if name not in CROP_MODELS]
+    samples = {name: crops if name in CROP_MODELS else frames for name in names}
+
+    weights = {name: {"pytorch": MODEL_PATHS[name]} for name in names}
+    for name in names:
+        for backend in backends:
+            if backend != "pytorch":
+                path = export_backend(name, backend)
+                if path:
+                    weights[name][backend] = path
+
+    references = {}
+    for name in names:
+        conf = {} if APP_CONF[name] is None else {"conf": APP_CONF[name]}
+        _, ref_results = time_predict(YOLO(MODEL_PATHS[name]), samples[name], 1, imgsz=REFERENCE_IMGSZ[name], **conf)
+        references[name] = detections(ref_results, APP_CLASSES[name])
+
+    candidates = {name: [] for name in names}
+    for threads in thread_counts:
+        set_threads(threads)
+        for name in names:
+            app_classes = APP_CLASSES[name]
+            conf = {} if APP_CONF[name] is None else {"conf": APP_CONF[name]}
+            reference = references[name]
+            for backend, path in weights[name].items():
+                model = YOLO(path) if backend == "pytorch" else YOLO(path, task="detect")
+                filters = [None] if app_classes is None else [None, app_classes]
+                for imgsz in CANDIDATE_IMGSZ[name]:
+                    for classes in filters:
+                        kwargs = {"imgsz": imgsz, **conf} if classes is None else {"imgsz": imgsz, "classes": classes, **conf}
+                        try:
+                            latency, results = time_predict(model, samples[name], repeats, **kwargs)
+                        except Exception as e:
+                            logger.warning("%s %s imgsz=%d failed: %s", name, backend, imgsz, e)
+                            continue
+                        score = agreement(reference, detections(results, app_classes))
+                        candidates[name].append({
+                            "threads": threads, "backend": backend, "weights": path, "imgsz": imgsz,
+                            "classes": classes, "p50_ms": latency, "agreement": score,
+                        })
+                        print(f"{name:<9} threads={threads:<2} {backend:<8} imgsz={imgsz:<4} "
+                              f"classes={classes} p50={latency:7.1f}ms agreement={score:.3f}")
+
+    # Pick the thread count with the lowest total latency over each model's best accepted candidate.
+    best_total, best = None, None
+    for threads in thread_counts:
+        chosen = {}
+        for name in names:
+            accepted = [c for c in candidates[name] if c["threads"] == threads and c["agreement"] >= min_agreement]
+            if accepted:
+                chosen[name] = min(accepted, key=lambda c: c["p50_ms"])
+        if len(chosen) < len(names):
+            continue
+        total = sum(c["p50_ms"] for c in chosen.values())
+        if best_total is None or total < best_total:
+            best_total, best = total, (threads, chosen)
+    return best, candidates
+
+
+def build_profile(best, min_agreement):
+    threads, chosen = best
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "min_agreement": min_agreement,
+        },
+        "threads": {"torch": threads, "opencv": threads},
+        "models": {
+            name: {key: c[key] for key in ("imgsz", "classes", "backend", "weights", "p50_ms", "agreement")}
+            for name, c in chosen.items()
+        },
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Tune inference settings for this machine.")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULTS), choices=list(DEFAULTS))
+    parser.add_argument("--frames", help="Directory or glob of sample frames (defaults to the bundled mosaics)")
+    parser.add_argument("--limit", type=int, default=16, help="Number of sample frames")
+    parser.add_argument("--threads", nargs="+", type=int,
+                        default=sorted({1, max(1, cpus // 4), max(1, cpus // 2), cpus}))
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "openvino"],
+                        choices=["pytorch", *EXPORT_FORMATS])
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--min-agreement", type=float, default=0.9)
+    parser.add_argument("--out", default=PROFILE_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        parser.error("No sample frames found")
+    best, candidates = tune(args.models, frames, args.threads, args.backends, args.repeats, args.min_agreement)
+    if best is None:
+        print("No candidate met the agreement threshold for every model; profile not written.")
+        return
+    profile = build_profile(best, args.min_agreement)
+    with open(args.out, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"\nWrote {args.out}:")
+    for name, settings in profile["models"].items():
+        default = DEFAULTS[name]["imgsz"]
+        print(f"  {name}: {settings['backend']} imgsz={settings['imgsz']} (default {default}) "
+              f"classes={settings['classes']} {settings['p50_ms']:.1f}ms agreement={settings['agreement']:.3f}")
+    print(f"  threads: {profile['threads']['torch']}")
+
+
+if __name__ == "__main__":
+    main()
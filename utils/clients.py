@@ -0,0 +1,29 @@
+import streamlit as st
+
+
+@st.cache_resource
+def get_db():
+    """Shared Firestore client, initializing Firebase on first use."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore, initialize_app
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(st.secrets["FIREBASE_SERVICE_ACCOUNT"].to_dict())
+        initialize_app(cred)
+    return firestore.client()
+
+
+@st.cache_resource
+def get_cloudinary():
+    """Shared Cloudinary module, configured on first use."""
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=st.secrets["CLOUDINARY_CLOUD_NAME"],
+        api_key=st.secrets["CLOUDINARY_API_KEY"],
+        api_secret=st.secrets["CLOUDINARY_API_SECRET"],
+        secure=True
+    )
+    return cloudinary
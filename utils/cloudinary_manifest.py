@@ -0,0 +1,127 @@
+"""Local manifest of the face images stored under ``AiSee/`` on Cloudinary.
+
+The first sync pages through every resource with ``next_cursor``. After that,
+a sync asks the Search API only for assets uploaded since the last run and
+merges them in. The folder's total count is then checked against the
+manifest, and any mismatch (a deleted image) triggers a full relisting. The
+manifest maps ``public_id`` to ``version``, ``bytes``, ``created_at``,
+``secure_url`` and the student ``folder``. Retraining diffs it against what
+the recognizer was last trained on instead of listing every folder.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+ROOT_FOLDER = "AiSee"
+MANIFEST_FILE = "model/absensi/cloudinary_manifest.json"
+PAGE_SIZE = 500
+# Uploads can become visible to search a little after their timestamp.
+CLOCK_SKEW = timedelta(minutes=5)
+FIELDS = ("version", "bytes", "created_at", "secure_url")
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"synced_at": None, "resources": {}}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _entry(resource):
+    public_id = resource["public_id"]
+    parts = public_id.split("/")
+    entry = {field: resource.get(field) for field in FIELDS}
+    entry["folder"] = parts[1] if len(parts) > 2 else None
+    return public_id, entry
+
+
+def list_all(cloudinary, root=ROOT_FOLDER, page_size=PAGE_SIZE):
+    """Every upload under ``root/``, following ``next_cursor`` until the listing is exhausted."""
+    resources = {}
+    cursor = None
+    while True:
+        kwargs = {"type": "upload", "prefix": f"{root}/", "max_results": page_size}
+        if cursor:
+            kwargs["next_cursor"] = cursor
+        page = cloudinary.api.resources(**kwargs)
+        for resource in page.get("resources", []):
+            public_id, entry = _entry(resource)
+            resources[public_id] = entry
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return resources
+
+
+def _search(cloudinary, expression, page_size=PAGE_SIZE):
+    """Yield search pages for ``expression``, following ``next_cursor``."""
+    cursor = None
+    while True:
+        search = cloudinary.Search().expression(expression).max_results(page_size)
+        if cursor:
+            search = search.next_cursor(cursor)
+        page = search.execute()
+        yield page
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return
+
+
+def list_changed(cloudinary, since, root=ROOT_FOLDER, page_size=PAGE_SIZE):
+    """Uploads (new or overwritten) under ``root/`` since ``since``; returns (resources, total_count)."""
+    stamp = (since - CLOCK_SKEW).strftime("%Y-%m-%dT%H:%M:%S")
+    resources = {}
+    for page in _search(cloudinary, f'folder:{root}/* AND uploaded_at>="{stamp}"', page_size):
+        for resource in page.get("resources", []):
+            public_id, entry = _entry(resource)
+            resources[public_id] = entry
+    total = cloudinary.Search().expression(f"folder:{root}/*").max_results(1).execute().get("total_count")
+    return resources, total
+
+
+def sync_manifest(cloudinary, path=MANIFEST_FILE, root=ROOT_FOLDER, full=False):
+    """Bring the local manifest up to date and return it."""
+    manifest = load_manifest(path)
+    started = datetime.now(timezone.utc)
+    resources = None
+    if manifest["synced_at"] and not full:
+        try:
+            changed, total = list_changed(cloudinary, datetime.fromisoformat(manifest["synced_at"]), root)
+            resources = {**manifest["resources"], **changed}
+            if total is not None and total != len(resources):
+                logger.info("Manifest has %d entries but Cloudinary reports %d; relisting.", len(resources), total)
+                resources = None
+        except Exception as e:
+            logger.warning("Incremental Cloudinary sync failed (%s); relisting.", e)
+            resources = None
+    if resources is None:
+        resources = list_all(cloudinary, root)
+    manifest = {"synced_at": started.isoformat(), "resources": resources}
+    save_manifest(manifest, path)
+    return manifest
+
+
+def folders(manifest):
+    return sorted({entry["folder"] for entry in manifest["resources"].values() if entry.get("folder")})
+
+
+def diff(trained, manifest):
+    """Compare {public_id: version} that was trained on with the manifest.
+
+    Returns (added, changed, removed) lists of public_ids.
+    """
+    current = manifest["resources"]
+    added = [pid for pid in current if pid not in trained]
+    changed = [pid for pid in current if pid in trained and trained[pid] != current[pid].get("version")]
+    removed = [pid for pid in trained if pid not in current]
+    return added, changed, removed
@@ -0,0 +1,112 @@
+"""Columnar detection results shared by every YOLO consumer.
+
+``DetectionBatch`` holds one structured NumPy array with a ``box`` (xyxy),
+``score``, ``class_id`` and ``track_id`` (-1 when untracked) field per
+detection. ``from_result`` copies ``result.boxes.data`` to the host once
+instead of touching ``box.xyxy``/``box.cls``/``box.conf`` per box, and
+filtering by class or confidence is a boolean mask rather than a Python loop.
+Batches pickle as a plain array, so the inference pool sends them as is.
+"""
+import numpy as np
+
+from utils.video_profile import map_boxes
+
+DTYPE = np.dtype([
+    ("box", np.float32, (4,)),
+    ("score", np.float32),
+    ("class_id", np.int32),
+    ("track_id", np.int32),
+])
+
+
+class DetectionBatch:
+    __slots__ = ("data", "names")
+
+    def __init__(self, data=None, names=None):
+        self.data = np.zeros(0, dtype=DTYPE) if data is None else data
+        self.names = names or {}
+
+    @classmethod
+    def from_arrays(cls, boxes, scores, class_ids, track_ids=None, names=None):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        data = np.zeros(len(boxes), dtype=DTYPE)
+        data["box"] = boxes
+        data["score"] = scores
+        data["class_id"] = class_ids
+        data["track_id"] = -1 if track_ids is None else track_ids
+        return cls(data, names)
+
+    @classmethod
+    def from_result(cls, result):
+        """Extract an ultralytics ``Results`` with a single device-to-host copy."""
+        names = getattr(result, "names", None)
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls(names=names)
+        # Rows are x1, y1, x2, y2, [track_id,] conf, cls.
+        raw = boxes.data.cpu().numpy()
+        track_ids = raw[:, 4] if raw.shape[1] == 7 else None
+        return cls.from_arrays(raw[:, :4], raw[:, -2], raw[:, -1], track_ids, names)
+
+    @classmethod
+    def concatenate(cls, batches, names=None):
+        batches = list(batches)
+        if not batches:
+            return cls(names=names)
+        return cls(np.concatenate([b.data for b in batches]), names or batches[0].names)
+
+    ### Columns ###
+    @property
+    def boxes(self):
+        return self.data["box"]
+
+    @property
+    def scores(self):
+        return self.data["score"]
+
+    @property
+    def class_ids(self):
+        return self.data["class_id"]
+
+    @property
+    def track_ids(self):
+        return self.data["track_id"]
+
+    def labels(self):
+        return [self.names.get(int(c), str(int(c))) for c in self.class_ids]
+
+    def xywh(self):
+        boxes = self.boxes.copy()
+        boxes[:, 2:] -= boxes[:, :2]
+        return boxes
+
+    ### Selection ###
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            index = [index]
+        return DetectionBatch(self.data[index], self.names)
+
+    def filter(self, classes=None, min_score=None):
+        """Keep detections of ``classes`` (ids) scoring at least ``min_score``."""
+        keep = np.ones(len(self.data), dtype=bool)
+        if classes is not None:
+            keep &= np.isin(self.class_ids, classes)
+        if min_score is not None:
+            keep &= self.scores >= min_score
+        return self if keep.all() else DetectionBatch(self.data[keep], self.names)
+
+    def mapped(self, scale=1.0, offset=(0, 0)):
+        """Copy with boxes taken from a scaled, offset model input back to frame coordinates."""
+        if scale == 1.0 and offset == (0, 0):
+            return self
+        data = self.data.copy()
+        data["box"] = map_boxes(data["box"], scale, offset)
+        return DetectionBatch(data, self.names)
+
+    def __iter__(self):
+        """Yield (label, score, box) for drawing and alerts."""
+        for label, row in zip(self.labels(), self.data):
+            yield label, float(row["score"]), row["box"]
@@ -0,0 +1,156 @@
+"""Pre/post-incident evidence clips kept as JPEG frames in a bounded ring buffer.
+
+Frames are JPEG-encoded at a reduced rate into a per-stream ring buffer capped
+by duration and bytes. When an incident fires the buffer is frozen, extended
+for a few seconds, and handed to a background writer that stores the clip as an
+MJPEG file and appends an entry to ``index.jsonl``. The video thread never
+touches the disk; if the writer falls behind, clips are dropped and logged.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_DIR = "evidence"
+
+
+class ClipWriter(threading.Thread):
+    def __init__(self, out_dir=EVIDENCE_DIR, max_pending=4):
+        super().__init__(name="evidence-writer", daemon=True)
+        self.out_dir = out_dir
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, clip):
+        try:
+            self.pending.put_nowait(clip)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Evidence writer busy, dropped clip %s", clip["clip_id"])
+            return False
+
+    def run(self):
+        while True:
+            clip = self.pending.get()
+            try:
+                self.write(clip)
+                self.written += 1
+            except Exception as e:
+                logger.error("Failed to write evidence clip %s: %s", clip["clip_id"], e)
+
+    def write(self, clip):
+        day = datetime.fromtimestamp(clip["start"]).strftime("%Y-%m-%d")
+        day_dir = os.path.join(self.out_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"{clip['clip_id']}.mjpeg")
+        # Concatenated JPEGs form a valid MJPEG stream (playable with ffplay/VLC).
+        with open(path, "wb") as f:
+            for _, data in clip["frames"]:
+                f.write(data)
+        entry = {
+            "clip_id": clip["clip_id"],
+            "stream": clip["stream"],
+            "label": clip["label"],
+            "score": clip["score"],
+            "incident_time": datetime.fromtimestamp(clip["incident"]).isoformat(),
+            "start": datetime.fromtimestamp(clip["start"]).isoformat(),
+            "end": datetime.fromtimestamp(clip["end"]).isoformat(),
+            "frames": len(clip["frames"]),
+            "timestamps": [round(ts - clip["start"], 3) for ts, _ in clip["frames"]],
+            "path": os.path.relpath(path, self.out_dir),
+        }
+        with open(os.path.join(self.out_dir, "index.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_clip_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ClipWriter()
+            _writer.start()
+        return _writer
+
+
+class EvidenceRecorder:
+    """Per-stream ring buffer of JPEG frames that turns incidents into clips."""
+
+    def __init__(self, stream, pre_seconds=5.0, post_seconds=5.0, max_clip_seconds=30.0,
+                 record_fps=10.0, max_bytes=8 * 1024 * 1024, jpeg_quality=70, writer=None):
+        self.stream = stream
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_clip_seconds = max_clip_seconds
+        self.frame_interval = 1.0 / record_fps
+        self.max_bytes = max_bytes
+        self.jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.writer = writer
+        self.ring = deque()
+        self.ring_bytes = 0
+        self.clip = None
+        self.last_frame_time = 0.0
+
+    def add_frame(self, img, ts=None):
+        ts = time.time() if ts is None else ts
+        if ts - self.last_frame_time < self.frame_interval:
+            return
+        self.last_frame_time = ts
+        ok, buffer = cv2.imencode(".jpg", img, self.jpeg_params)
+        if not ok:
+            return
+        data = buffer.tobytes()
+
+        if self.clip is not None:
+            self.clip["frames"].append((ts, data))
+            self.clip["bytes"] += len(data)
+            if ts >= self.clip["end"] or self.clip["bytes"] >= self.max_bytes * 2:
+                self._finish(ts)
+            return
+
+        self.ring.append((ts, data))
+        self.ring_bytes += len(data)
+        while self.ring and (ts - self.ring[0][0] > self.pre_seconds or self.ring_bytes > self.max_bytes):
+            _, old = self.ring.popleft()
+            self.ring_bytes -= len(old)
+
+    def trigger(self, label, score, ts=None):
+        """Start a clip, or extend the running one, for an incident at ``ts``."""
+        ts = time.time() if ts is None else ts
+        if self.clip is None:
+            frames = list(self.ring)
+            self.clip = {
+                "clip_id": f"{self.stream}_{int(ts * 1000)}",
+                "stream": self.stream,
+                "label": label,
+                "score": score,
+                "incident": ts,
+                "start": frames[0][0] if frames else ts,
+                "end": ts + self.post_seconds,
+                "frames": frames,
+                "bytes": self.ring_bytes,
+            }
+            self.ring.clear()
+            self.ring_bytes = 0
+        else:
+            self.clip["end"] = min(ts + self.post_seconds, self.clip["start"] + self.max_clip_seconds)
+            if score > self.clip["score"]:
+                self.clip["label"], self.clip["score"] = label, score
+
+    def _finish(self, ts):
+        clip, self.clip = self.clip, None
+        clip["end"] = ts
+        (self.writer or get_clip_writer()).submit(clip)
@@ -0,0 +1,231 @@
+"""Pluggable face detection shared by registration, verification, attendance and emotion.
+
+Two backends implement the same ``detect`` interface:
+
+* ``haar``  - the OpenCV frontal-face cascade the app has always used.
+* ``yunet`` - OpenCV's DNN detector (``cv2.FaceDetectorYN``), which also finds
+  non-frontal faces and returns five landmarks (eyes, nose tip, mouth corners).
+
+``get_face_detector()`` returns one instance per process; the backend is
+chosen with ``AISEE_FACE_DETECTOR`` (default ``haar``). Haar serves requests
+straight away, while ``start_face_detector()`` (called at app startup) fetches
+and loads any other backend on a background thread and swaps it in when ready,
+so no video callback ever waits on a model download.
+
+The LBPH recognizer is trained on detector crops, so it must see faces framed
+the same way at training and verification time. ``get_recognition_detector()``
+is therefore pinned to one backend for the life of the process
+(``AISEE_RECOGNITION_DETECTOR``, default ``haar``) and never switches.
+"""
+import abc
+import logging
+import os
+import threading
+import urllib.request
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HAAR_CASCADE = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+YUNET_MODEL = "model/face/face_detection_yunet_2023mar.onnx"
+YUNET_URL = "https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx"
+
+class FaceDetection(NamedTuple):
+    box: tuple
+    score: float
+    landmarks: Optional[np.ndarray]
+
+    def crop(self, image):
+        x, y, w, h = self.box
+        return image[max(y, 0):y + h, max(x, 0):x + w]
+
+
+def to_gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def to_bgr(image):
+    return image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+class FaceDetector(abc.ABC):
+    name = "base"
+    has_landmarks = False
+
+    @abc.abstractmethod
+    def detect(self, image, min_size=0, fine=False):
+        """Return a list of FaceDetection for a BGR or grayscale image.
+
+        ``fine`` asks for a more exhaustive search where the backend has one
+        (registration uses it to catch every usable frame).
+        """
+
+    def boxes(self, image, min_size=0, fine=False):
+        """(x, y, w, h) rows, like ``CascadeClassifier.detectMultiScale``."""
+        return [d.box for d in self.detect(image, min_size=min_size, fine=fine)]
+
+
+class HaarFaceDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, cascade_path=HAAR_CASCADE, scale_factor=1.2, fine_scale_factor=1.05, min_neighbors=5):
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Could not load Haar cascade from {cascade_path}")
+        self.scale_factor = scale_factor
+        self.fine_scale_factor = fine_scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image, min_size=0, fine=False):
+        faces = self.cascade.detectMultiScale(
+            to_gray(image),
+            scaleFactor=self.fine_scale_factor if fine else self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size),
+        )
+        return [FaceDetection(tuple(int(v) for v in face), 1.0, None) for face in faces]
+
+
+class YuNetFaceDetector(FaceDetector):
+    name = "yunet"
+    has_landmarks = True
+
+    def __init__(self, model_path=YUNET_MODEL, score_threshold=0.7, nms_threshold=0.3, top_k=50):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found at {model_path}")
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold, nms_threshold, top_k)
+        self.input_size = (320, 320)
+        # FaceDetectorYN keeps the input size as state, so concurrent streams take turns.
+        self.lock = threading.Lock()
+
+    def detect(self, image, min_size=0, fine=False):
+        image = to_bgr(image)
+        size = (image.shape[1], image.shape[0])
+        with self.lock:
+            if size != self.input_size:
+                self.detector.setInputSize(size)
+                self.input_size = size
+            _, faces = self.detector.detect(image)
+        if faces is None:
+            return []
+        detections = []
+        height, width = image.shape[:2]
+        for row in faces:
+            # Callers slice crops straight from the box, so keep it inside the frame.
+            x1, y1 = max(int(round(row[0])), 0), max(int(round(row[1])), 0)
+            x2, y2 = min(int(round(row[0] + row[2])), width), min(int(round(row[1] + row[3])), height)
+            x, y, w, h = x1, y1, x2 - x1, y2 - y1
+            if w < min_size or h < min_size:
+                continue
+            detections.append(FaceDetection((x, y, w, h), float(row[14]), row[4:14].reshape(5, 2).copy()))
+        return detections
+
+
+def download_yunet(model_path=YUNET_MODEL):
+    """Fetch the YuNet model if it is not on disk yet (blocking)."""
+    if os.path.exists(model_path):
+        return model_path
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    logger.info("Downloading YuNet face detector to %s", model_path)
+    urllib.request.urlretrieve(YUNET_URL, model_path + ".part")
+    os.replace(model_path + ".part", model_path)
+    return model_path
+
+
+BACKENDS = {"haar": HaarFaceDetector, "yunet": YuNetFaceDetector}
+DOWNLOADS = {"yunet": download_yunet}
+
+RECOGNITION_BACKEND = os.environ.get("AISEE_RECOGNITION_DETECTOR", "haar").lower()
+
+_detector = None
+_loader = None
+_detector_lock = threading.Lock()
+_recognition = None
+_recognition_loader = None
+_recognition_ready = threading.Event()
+
+
+def configured_backend(backend=None):
+    backend = (backend or os.environ.get("AISEE_FACE_DETECTOR", "haar")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown face detector {backend!r}; choose from {sorted(BACKENDS)}")
+    return backend
+
+
+def create_face_detector(backend=None):
+    """Build a detector, downloading its model first if needed (blocking)."""
+    backend = configured_backend(backend)
+    try:
+        if backend in DOWNLOADS:
+            DOWNLOADS[backend]()
+        return BACKENDS[backend]()
+    except Exception as e:
+        if backend == "haar":
+            raise
+        logger.warning("Face detector %s unavailable (%s); falling back to haar.", backend, e)
+        return HaarFaceDetector()
+
+
+def _load_backend(backend):
+    global _detector
+    detector = create_face_detector(backend)
+    with _detector_lock:
+        _detector = detector
+    logger.info("Face detector %s ready.", detector.name)
+
+
+def _load_recognition(backend):
+    global _recognition
+    _recognition = create_face_detector(backend)
+    _recognition_ready.set()
+    logger.info("Recognition face detector %s ready.", _recognition.name)
+
+
+def start_recognition_detector(backend=RECOGNITION_BACKEND):
+    """Load the recognizer's pinned detector (in the background unless it is Haar); safe to call more than once."""
+    global _recognition, _recognition_loader
+    backend = configured_backend(backend)
+    with _detector_lock:
+        if _recognition_loader is not None or _recognition_ready.is_set():
+            return
+        if backend == "haar":
+            _recognition = HaarFaceDetector()
+            _recognition_ready.set()
+            return
+        _recognition_loader = threading.Thread(target=_load_recognition, args=(backend,),
+                                               name="recognition-detector-load", daemon=True)
+        _recognition_loader.start()
+
+
+def get_recognition_detector(wait=False):
+    """The detector whose crops the LBPH recognizer is trained and verified on.
+
+    Returns None while a non-Haar backend is still loading, unless ``wait``.
+    """
+    start_recognition_detector()
+    if wait:
+        _recognition_ready.wait()
+    return _recognition
+
+
+def start_face_detector(backend=None):
+    """Serve Haar now and load the configured backend in the background; safe to call more than once."""
+    global _detector, _loader
+    backend = configured_backend(backend)
+    start_recognition_detector()
+    with _detector_lock:
+        if _detector is None:
+            _detector = HaarFaceDetector()
+        if backend != "haar" and _loader is None:
+            _loader = threading.Thread(target=_load_backend, args=(backend,), name="face-detector-load", daemon=True)
+            _loader.start()
+        return _detector
+
+
+def get_face_detector():
+    """The process-wide face detector (Haar until the configured backend has loaded)."""
+    detector = _detector
+    return detector if detector is not None else start_face_detector()
@@ -0,0 +1,242 @@
+"""In-memory stand-in for the subset of the Firestore client API this app uses.
+
+Supports ``collection().document()``, ``get``/``set``/``update``/``delete``,
+``add``, ``where``/``order_by``/``limit``/``start_after``/``stream``, write
+batches, simple transactions and ``on_snapshot`` listeners, so data-access code
+can run without a Firebase project.
+"""
+import copy
+import itertools
+import threading
+import uuid
+
+DOCUMENT_ID = "__name__"
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class Increment:
+    """Stand-in for ``firestore.Increment`` in ``update`` calls."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ArrayUnion:
+    """Stand-in for ``firestore.ArrayUnion`` in ``update`` calls."""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class DocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self.collection_name = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self.collection_name}/{self.id}"
+
+    def get(self, transaction=None):
+        with self._db._lock:
+            data = self._db._data.get(self.collection_name, {}).get(self.id)
+            return DocumentSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        self._db._write(self.collection_name, self.id, data, merge=merge)
+
+    def update(self, data):
+        if not self.get().exists:
+            raise KeyError(f"No document to update: {self.path}")
+        self._db._write(self.collection_name, self.id, data, merge=True)
+
+    def delete(self):
+        self._db._delete(self.collection_name, self.id)
+
+
+class Query:
+    def __init__(self, db, collection, filters=(), order=None, limit_count=None, after=None):
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = order
+        self._limit = limit_count
+        self._after = after
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, order=self._order, limit_count=self._limit, after=self._after)
+        state.update(changes)
+        return Query(self._db, self._collection, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field):
+        return self._copy(order=field)
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def _value(self, doc_id, data, field):
+        return doc_id if field == DOCUMENT_ID else data.get(field)
+
+    def stream(self):
+        with self._db._lock:
+            docs = list(self._db._data.get(self._collection, {}).items())
+        docs = [
+            (doc_id, data) for doc_id, data in docs
+            if all(_OPS[op](self._value(doc_id, data, field), value) for field, op, value in self._filters)
+        ]
+        order = self._order or DOCUMENT_ID
+        docs.sort(key=lambda item: (self._value(item[0], item[1], order) is None, self._value(item[0], item[1], order)))
+        if self._after is not None:
+            after_key = self._value(self._after.id, self._after.to_dict() or {}, order)
+            docs = [item for item in docs if self._value(item[0], item[1], order) > after_key]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        for doc_id, data in docs:
+            yield DocumentSnapshot(DocumentReference(self._db, self._collection, doc_id), copy.deepcopy(data))
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        return self._db._watch(self, callback)
+
+
+class CollectionReference(Query):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._db, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class WriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self._ops.append(ref.delete)
+
+    def commit(self):
+        with self._db._lock:
+            for op in self._ops:
+                op()
+        self._db.commits += 1
+        self._ops = []
+
+
+class Transaction(WriteBatch):
+    """Reads see committed data; writes apply atomically on ``commit``."""
+
+    def get(self, ref):
+        return ref.get()
+
+
+class MemoryFirestore:
+    def __init__(self, data=None):
+        self._data = copy.deepcopy(data) if data else {}
+        self._lock = threading.RLock()
+        self._watchers = []
+        self._watch_ids = itertools.count()
+        self.commits = 0
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self):
+        return Transaction(self)
+
+    def run_transaction(self, func, *args, **kwargs):
+        """Run ``func(transaction, ...)`` and commit its writes atomically."""
+        with self._lock:
+            transaction = self.transaction()
+            result = func(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+
+    def _apply(self, current, data):
+        for key, value in data.items():
+            if isinstance(value, Increment):
+                current[key] = current.get(key, 0) + value.value
+            elif isinstance(value, ArrayUnion):
+                existing = list(current.get(key, []))
+                current[key] = existing + [v for v in value.values if v not in existing]
+            else:
+                current[key] = copy.deepcopy(value)
+        return current
+
+    def _write(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            docs = self._data.setdefault(collection, {})
+            current = dict(docs.get(doc_id, {})) if merge else {}
+            docs[doc_id] = self._apply(current, data)
+        self._notify(collection)
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            self._data.get(collection, {}).pop(doc_id, None)
+        self._notify(collection)
+
+    def _watch(self, query, callback):
+        watch_id = next(self._watch_ids)
+        self._watchers.append((watch_id, query, callback))
+        callback(query.get(), [], None)
+
+        class Watch:
+            def unsubscribe(watch):
+                self._watchers[:] = [w for w in self._watchers if w[0] != watch_id]
+        return Watch()
+
+    def _notify(self, collection):
+        for _, query, callback in list(self._watchers):
+            if query._collection == collection:
+                callback(query.get(), [], None)
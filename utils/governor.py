@@ -0,0 +1,189 @@
+"""Server-wide admission control for the YOLO video streams.
+
+Every frame callback asks ``get_governor().admit(stream)`` whether to run
+inference on the current frame and at which input size. The governor tracks
+live sessions (one per callback thread, dropped after ``session_ttl`` seconds
+without frames) and samples process CPU usage. When CPU stays above
+``high_water`` it raises a server-wide degradation level; when it stays below
+``low_water`` it steps back down. Each level caps inference FPS and input size
+per stream, and lower-priority streams give up capacity first.
+
+Only the first ``max_full_sessions`` sessions in priority order run at the
+current level; later ones run one level lower, so an extra classroom joining
+does not slow down everyone already connected.
+"""
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import streamlit as st
+
+from utils import metrics
+
+# Lower number = higher priority.
+PRIORITIES = {
+    "exam_supervisor": 0,
+    "attendance_monitoring": 1,
+    "emotion_detector": 2,
+}
+
+# LEVELS[level][priority] = (max inference fps or None for every frame, input size).
+# An fps of 0 pauses inference for that priority.
+LEVELS = [
+    {0: (None, 640), 1: (None, 640), 2: (None, 224)},
+    {0: (None, 640), 1: (None, 640), 2: (4, 224)},
+    {0: (None, 640), 1: (6, 480), 2: (2, 160)},
+    {0: (10, 480), 1: (3, 480), 2: (0, 160)},
+    {0: (5, 320), 1: (1, 320), 2: (0, 160)},
+]
+LEVEL_NAMES = ["normal", "emotion reduced", "monitoring reduced", "exam reduced", "minimum"]
+
+
+class Decision(NamedTuple):
+    run: bool
+    imgsz: int
+    level: int
+    max_fps: Optional[float]
+
+
+class SessionState:
+    def __init__(self, stream, now):
+        self.stream = stream
+        self.priority = PRIORITIES.get(stream, max(PRIORITIES.values()) + 1)
+        self.started = now
+        self.last_seen = now
+        self.last_run = 0.0
+        self.level = 0
+
+
+class ResourceGovernor:
+    def __init__(self, max_full_sessions=None, high_water=0.85, low_water=0.6,
+                 raise_after=2, lower_after=5, sample_interval=1.0, session_ttl=5.0):
+        cpus = os.cpu_count() or 1
+        self.max_full_sessions = max_full_sessions or max(1, cpus // 2)
+        self.high_water = high_water
+        self.low_water = low_water
+        self.raise_after = raise_after
+        self.lower_after = lower_after
+        self.sample_interval = sample_interval
+        self.session_ttl = session_ttl
+        self.cpus = cpus
+        self.level = 0
+        self.cpu_load = 0.0
+        self.sessions = {}
+        self._above = 0
+        self._below = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    ### CPU sampling ###
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="resource-governor", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _sample_loop(self):
+        last_cpu = time.process_time()
+        last_wall = time.perf_counter()
+        while not self._stop.wait(self.sample_interval):
+            cpu, wall = time.process_time(), time.perf_counter()
+            load = (cpu - last_cpu) / max((wall - last_wall) * self.cpus, 1e-6)
+            last_cpu, last_wall = cpu, wall
+            self.observe(load)
+
+    def observe(self, load):
+        """Feed one CPU load sample (0..1 of all cores) and adjust the level with hysteresis."""
+        with self._lock:
+            self.cpu_load = load
+            self._expire(time.time())
+            if not self.sessions:
+                self.level = 0
+                self._above = self._below = 0
+                return
+            if load > self.high_water:
+                self._above += 1
+                self._below = 0
+            elif load < self.low_water:
+                self._below += 1
+                self._above = 0
+            else:
+                self._above = self._below = 0
+            if self._above >= self.raise_after and self.level < len(LEVELS) - 1:
+                self.level += 1
+                self._above = 0
+            elif self._below >= self.lower_after and self.level > 0:
+                self.level -= 1
+                self._below = 0
+            self._assign_levels()
+
+    ### Sessions ###
+    def _expire(self, now):
+        for key in [k for k, s in self.sessions.items() if now - s.last_seen > self.session_ttl]:
+            del self.sessions[key]
+
+    def _assign_levels(self):
+        ranked = sorted(self.sessions.values(), key=lambda s: (s.priority, s.started))
+        for rank, session in enumerate(ranked):
+            extra = 0 if rank < self.max_full_sessions else 1
+            session.level = min(self.level + extra, len(LEVELS) - 1)
+
+    def admit(self, stream, session=None):
+        """Decide whether this frame of ``stream`` should run inference, and at what input size."""
+        session = session or metrics.current_session()
+        now = time.time()
+        with self._lock:
+            state = self.sessions.get((stream, session))
+            if state is None:
+                state = self.sessions[(stream, session)] = SessionState(stream, now)
+                self._assign_levels()
+            state.last_seen = now
+            max_fps, imgsz = LEVELS[state.level][min(state.priority, max(PRIORITIES.values()))]
+            if max_fps is None:
+                run = True
+            elif max_fps == 0:
+                run = False
+            else:
+                run = now - state.last_run >= 1.0 / max_fps
+            if run:
+                state.last_run = now
+            return Decision(run, imgsz, state.level, max_fps)
+
+    def status(self):
+        with self._lock:
+            self._expire(time.time())
+            counts = {}
+            for state in self.sessions.values():
+                counts[state.stream] = counts.get(state.stream, 0) + 1
+            return {
+                "level": self.level,
+                "name": LEVEL_NAMES[self.level],
+                "cpu_load": self.cpu_load,
+                "sessions": counts,
+                "max_full_sessions": self.max_full_sessions,
+            }
+
+
+@st.cache_resource
+def get_governor():
+    max_full = int(os.environ.get("AISEE_MAX_FULL_SESSIONS", "0") or 0) or None
+    return ResourceGovernor(max_full_sessions=max_full).start()
+
+
+def render_governor_status():
+    """Show the current degradation level so users know why video looks slower."""
+    status = get_governor().status()
+    sessions = ", ".join(f"{stream}: {n}" for stream, n in sorted(status["sessions"].items())) or "none"
+    message = (f"Server load: level {status['level']} ({status['name']}), CPU {status['cpu_load']:.0%}, "
+               f"active streams - {sessions}")
+    if status["level"] == 0:
+        st.caption(message)
+    else:
+        st.warning(message + ". Inference rate or resolution is reduced to keep latency bounded.")
+    return status
@@ -0,0 +1,176 @@
+"""Bulk gradebook and attendance-pass computation over the Firestore schema.
+
+Each collection in ``db-design.txt`` is read once, in pages, into a DataFrame;
+the collections are joined on their ID prefixes and scores are computed for a
+whole semester with vectorized operations. Results are written back in batched
+updates. Attendance passes read the ``attendanceCounters`` documents kept by
+``utils.attendance_counters`` rather than recounting ``attendanceLogs``. Pass a
+``MemoryFirestore`` as ``db`` to run without Firebase.
+
+    python -m utils.gradebook --semester semester-1 [--dry-run]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 500
+BATCH_SIZE = 400
+DOCUMENT_ID = "__name__"
+COUNTERS = "attendanceCounters"
+
+
+def read_collection(db, name, page_size=PAGE_SIZE, where=None):
+    """Read a whole collection in pages ordered by document ID; returns a DataFrame with an ``id`` column."""
+    query = db.collection(name)
+    if where is not None:
+        query = query.where(*where)
+    query = query.order_by(DOCUMENT_ID).limit(page_size)
+    rows = []
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        for doc in page:
+            rows.append({"id": doc.id, **(doc.to_dict() or {})})
+        if len(page) < page_size:
+            break
+        last = page[-1]
+    return pd.DataFrame(rows)
+
+
+def _column(frame, name, default=np.nan):
+    return frame[name] if name in frame else pd.Series(default, index=frame.index)
+
+
+def subject_scores(subjects, assignments, mid_exams, final_exams):
+    """Weighted subject scores; assignment scores are averaged per assignment document first."""
+    parts = []
+    if not assignments.empty:
+        averages = assignments["scores"].map(lambda s: float(np.mean(s)) if isinstance(s, list) and s else np.nan)
+        parts.append(pd.DataFrame({"subjectId": assignments["subjectId"], "weight": assignments["weight"], "score": averages}))
+    for exams in (mid_exams, final_exams):
+        if not exams.empty:
+            parts.append(exams[["subjectId", "weight", "score"]])
+    if not parts:
+        return subjects.assign(score=np.nan)
+
+    components = pd.concat(parts, ignore_index=True).dropna(subset=["score", "weight"])
+    components["weighted"] = components["score"].astype(float) * components["weight"].astype(float)
+    totals = components.groupby("subjectId")[["weighted", "weight"]].sum()
+    scores = (totals["weighted"] / totals["weight"].replace(0, np.nan)).rename("score")
+    result = subjects.merge(scores, left_on="id", right_index=True, how="left")
+    result["isPass"] = result["score"].fillna(-np.inf) >= _column(result, "passingScore").astype(float)
+    return result
+
+
+def report_scores(reports, subjects):
+    """Overall score per report as the subject-weight-weighted mean of subject scores."""
+    scored = subjects.dropna(subset=["score"])
+    scored = scored.assign(weighted=scored["score"] * scored["weight"].astype(float))
+    totals = scored.groupby("reportId")[["weighted", "weight"]].sum()
+    overall = (totals["weighted"] / totals["weight"].replace(0, np.nan)).rename("overallScore")
+    return reports.drop(columns=["overallScore"], errors="ignore").merge(overall, left_on="id", right_index=True, how="left")
+
+
+def attendance_passes(attendance, counters):
+    """Verified sessions per attendance record, read from its counter, compared with its minimum."""
+    if counters.empty:
+        counts = pd.Series(dtype=float)
+    else:
+        counts = counters.set_index("id")["verifiedSessions"]
+    result = attendance.copy()
+    result["verifiedSessions"] = result["id"].map(counts).fillna(0).astype(int)
+    result["isPass"] = result["verifiedSessions"] >= _column(result, "minimum", 0).astype(float)
+    return result
+
+
+def compute_semester(db, semester, page_size=PAGE_SIZE):
+    """Return (subjects, reports, attendance) DataFrames with computed fields for one semester."""
+    reports = read_collection(db, "reports", page_size, where=("semester", "==", semester))
+    subjects = read_collection(db, "subjects", page_size)
+    assignments = read_collection(db, "assignments", page_size)
+    mid_exams = read_collection(db, "midExams", page_size)
+    final_exams = read_collection(db, "finalExams", page_size)
+    attendance = read_collection(db, "attendance", page_size, where=("semester", "==", semester))
+    counters = read_collection(db, COUNTERS, page_size)
+
+    report_ids = set(reports["id"]) if not reports.empty else set()
+    if not subjects.empty:
+        subjects = subjects[subjects["reportId"].isin(report_ids)]
+        subject_ids = set(subjects["id"])
+        # Component documents are keyed "<subjectId>_<component>"; keep only this semester's.
+        assignments, mid_exams, final_exams = (
+            frame[frame["subjectId"].isin(subject_ids)] if not frame.empty else frame
+            for frame in (assignments, mid_exams, final_exams)
+        )
+        subjects = subject_scores(subjects, assignments, mid_exams, final_exams)
+    if not reports.empty:
+        reports = report_scores(reports, subjects if not subjects.empty else pd.DataFrame(columns=["reportId", "score", "weight"]))
+    if not attendance.empty:
+        attendance = attendance_passes(attendance, counters)
+    return subjects, reports, attendance
+
+
+def _clean(value):
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 2)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def write_results(db, collection, frame, fields, batch_size=BATCH_SIZE):
+    """Write ``fields`` of each row back to ``collection`` in batched updates; returns rows written."""
+    if frame.empty:
+        return 0
+    batch = db.batch()
+    pending = 0
+    written = 0
+    for row in frame[["id", *fields]].itertuples(index=False):
+        batch.update(db.collection(collection).document(row[0]), {f: _clean(v) for f, v in zip(fields, row[1:])})
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            written += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
+
+
+def run(db, semester, dry_run=False, page_size=PAGE_SIZE):
+    subjects, reports, attendance = compute_semester(db, semester, page_size)
+    summary = {"subjects": len(subjects), "reports": len(reports), "attendance": len(attendance)}
+    if not dry_run:
+        # Subjects and reports without any graded component keep their stored values.
+        if not subjects.empty:
+            write_results(db, "subjects", subjects.dropna(subset=["score"]), ["isPass"])
+        if not reports.empty:
+            write_results(db, "reports", reports.dropna(subset=["overallScore"]), ["overallScore"])
+        write_results(db, "attendance", attendance, ["isPass"])
+    return summary, subjects, reports, attendance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute scores and pass flags for a semester.")
+    parser.add_argument("--semester", required=True)
+    parser.add_argument("--dry-run", action="store_true", help="Compute and print without writing back")
+    args = parser.parse_args()
+
+    from utils.clients import get_db
+    summary, subjects, reports, attendance = run(get_db(), args.semester, dry_run=args.dry_run)
+    print(summary)
+    if args.dry_run:
+        for name, frame, columns in (("subjects", subjects, ["id", "score", "isPass"]),
+                                     ("reports", reports, ["id", "overallScore"]),
+                                     ("attendance", attendance, ["id", "verifiedSessions", "isPass"])):
+            if not frame.empty:
+                print(f"\n{name}\n{frame[columns].to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    main()
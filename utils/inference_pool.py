@@ -0,0 +1,226 @@
+"""Optional process pool for YOLO inference with shared-memory frame transfer.
+
+Frames are copied into fixed-size slots of one ``multiprocessing.shared_memory``
+block; only the slot number, shape and predict arguments travel through the
+task queue, and workers answer with the structured array of a
+``DetectionBatch``. Every worker pins its torch/OpenCV thread
+counts (and, where supported, its CPU affinity) so several pools-worth of
+streams do not oversubscribe the machine.
+
+When every slot is busy, or the pool fails, ``predict`` returns None and the
+caller runs the model in its own thread instead. Each worker publishes the
+request it is working on, so if one dies mid-task the result dispatcher fails
+that request, returns its slot and starts a replacement process.
+
+Enable with ``AISEE_INFERENCE_PROCESSES=<workers>``; 0 (the default) keeps all
+inference in-process.
+"""
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils import inference_profile
+from utils.detections import DetectionBatch
+from utils.model_manager import MODEL_PATHS
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAME_BYTES = 1920 * 1080 * 3
+
+
+def _pin_worker(index, workers, threads):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        per_worker = max(1, len(cores) // workers)
+        assigned = cores[index * per_worker:(index + 1) * per_worker] or cores
+        os.sched_setaffinity(0, assigned)
+    import cv2
+    import torch
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+IDLE = -1
+
+
+def _worker_main(index, workers, threads, shm_name, slot_bytes, tasks, results, model_paths, current):
+    _pin_worker(index, workers, threads)
+    from ultralytics import YOLO
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    models = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            request_id, model_name, slot, shape, kwargs = task
+            # Lets the parent reclaim the slot if this process dies before answering.
+            current[index] = request_id
+            names = None
+            try:
+                model = models.get(model_name)
+                if model is None:
+                    path = model_paths[model_name]
+                    model = models[model_name] = YOLO(path) if path.endswith(".pt") else YOLO(path, task="detect")
+                    names = model.names
+                # The parent does not reuse the slot until we answer, so predict on the view directly.
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                result = model.predict(frame, verbose=False, **kwargs)[0]
+                detections = DetectionBatch.from_result(result).data
+                results.put((request_id, model_name, slot, detections, names, None))
+            except Exception as e:
+                results.put((request_id, model_name, slot, None, names, f"{type(e).__name__}: {e}"))
+            current[index] = IDLE
+    finally:
+        shm.close()
+
+
+class InferencePool:
+    def __init__(self, workers, slots=None, slot_bytes=MAX_FRAME_BYTES, model_paths=None, threads=None):
+        if model_paths is None:
+            model_paths = {name: inference_profile.weights(name, path) for name, path in MODEL_PATHS.items()}
+        self.workers = workers
+        self.slots = slots or workers * 2
+        self.slot_bytes = slot_bytes
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.model_paths = dict(model_paths)
+        ctx = self.ctx = mp.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.free_slots = queue.Queue()
+        for slot in range(self.slots):
+            self.free_slots.put(slot)
+        # request_id -> (future, slot); whoever pops an entry returns its slot.
+        self.pending = {}
+        self.names = {}
+        self.current = ctx.Array("q", [IDLE] * workers)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.processes = [self._spawn(i) for i in range(workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch, name="inference-results", daemon=True)
+        self._dispatcher.start()
+
+    def _spawn(self, index):
+        self.current[index] = IDLE
+        process = self.ctx.Process(target=_worker_main, name=f"inference-{index}", daemon=True,
+                                   args=(index, self.workers, self.threads, self.shm.name, self.slot_bytes,
+                                         self.tasks, self.results, self.model_paths, self.current))
+        process.start()
+        return process
+
+    def _finish(self, request_id):
+        """Pop a pending request and free its slot; None if it was already finished."""
+        with self._lock:
+            entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return None
+        future, slot = entry
+        self.free_slots.put(slot)
+        return future
+
+    def _reap(self):
+        """Fail the task of any dead worker, reclaim its slot and restart it."""
+        for index, process in enumerate(self.processes):
+            if self._closed or process.is_alive():
+                continue
+            request_id = self.current[index]
+            logger.warning("Inference worker %s exited with code %s; restarting.", process.name, process.exitcode)
+            if request_id != IDLE:
+                future = self._finish(request_id)
+                if future is not None:
+                    future.set_exception(RuntimeError(f"{process.name} died while running request {request_id}"))
+            self.processes[index] = self._spawn(index)
+
+    def _dispatch(self):
+        while True:
+            try:
+                item = self.results.get(timeout=1.0)
+            except queue.Empty:
+                self._reap()
+                continue
+            if item is None:
+                break
+            request_id, model_name, slot, detections, names, error = item
+            if names is not None:
+                self.names[model_name] = names
+            future = self._finish(request_id)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(DetectionBatch(detections, self.names.get(model_name)))
+
+    def submit(self, model_name, image, timeout=0.05, **kwargs):
+        """Queue ``image`` for ``model_name``; returns a Future of a DetectionBatch, or None if no slot frees up in time."""
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if image.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {image.nbytes} bytes exceeds slot size {self.slot_bytes}")
+        try:
+            slot = self.free_slots.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        target = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        target[...] = image
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self.pending[request_id] = (future, slot)
+        self.tasks.put((request_id, model_name, slot, image.shape, kwargs))
+        return future
+
+    def predict(self, model_name, image, timeout=10.0, **kwargs):
+        """DetectionBatch for ``image``, or None when the pool is saturated or failed (predict in-thread instead)."""
+        future = self.submit(model_name, image, **kwargs)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except (FutureTimeout, RuntimeError) as e:
+            logger.warning("Pooled %s inference failed: %s", model_name, str(e) or "timed out")
+            return None
+
+    def close(self):
+        self._closed = True
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+        self.results.put(None)
+        self.shm.close()
+        self.shm.unlink()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_size():
+    return int(os.environ.get("AISEE_INFERENCE_PROCESSES", "0") or 0)
+
+
+def get_inference_pool():
+    """Shared pool when enabled through AISEE_INFERENCE_PROCESSES, otherwise None."""
+    global _pool
+    workers = pool_size()
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(workers)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,75 @@
+"""Deployment-specific inference settings written by ``python -m utils.autotune``.
+
+The profile is a JSON file (``inference_profile.json`` in the working
+directory, or ``AISEE_INFERENCE_PROFILE``) of the form::
+
+    {
+      "threads": {"torch": 4, "opencv": 2},
+      "models": {
+        "person": {"imgsz": 480, "classes": [0], "backend": "onnx", "weights": "model/exports/person_onnx.onnx"},
+        ...
+      }
+    }
+
+Without a profile, every model keeps the settings the app has always used.
+"""
+import functools
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PATH = os.environ.get("AISEE_INFERENCE_PROFILE", "inference_profile.json")
+
+DEFAULTS = {
+    "cheating": {"imgsz": 640, "classes": None},
+    "person": {"imgsz": 640, "classes": [0]},
+    "emotion": {"imgsz": 224, "classes": None},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_profile(path=PROFILE_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable inference profile %s: %s", path, e)
+        return {}
+
+
+def model_settings(name):
+    settings = dict(DEFAULTS.get(name, {"imgsz": 640, "classes": None}))
+    settings.update(load_profile().get("models", {}).get(name, {}))
+    return settings
+
+
+def weights(name, default):
+    """Tuned weights file for ``name`` (e.g. an ONNX export) if it exists, else ``default``."""
+    path = model_settings(name).get("weights")
+    return path if path and os.path.exists(path) else default
+
+
+def predict_kwargs(name, imgsz_cap=None):
+    """Keyword arguments for ``predict`` on model ``name``; ``imgsz_cap`` lowers the tuned size."""
+    settings = model_settings(name)
+    imgsz = settings["imgsz"] if imgsz_cap is None else min(settings["imgsz"], imgsz_cap)
+    kwargs = {"imgsz": imgsz}
+    if settings.get("classes") is not None:
+        kwargs["classes"] = list(settings["classes"])
+    return kwargs
+
+
+def apply_threads():
+    """Apply the tuned torch/OpenCV thread counts to this process, if the profile has them."""
+    threads = load_profile().get("threads", {})
+    if threads.get("opencv"):
+        import cv2
+        cv2.setNumThreads(int(threads["opencv"]))
+    if threads.get("torch"):
+        import torch
+        torch.set_num_threads(int(threads["torch"]))
+    return threads
@@ -0,0 +1,244 @@
+"""Per-stage timing spans for the frame callbacks and training path.
+
+Instrumentation is off unless ``AISEE_METRICS=1`` is set (or ``enable()`` is
+called); while off, ``span`` returns a shared no-op context manager.
+When on, samples are aggregated per stream session into rolling windows and
+cumulative histograms, exported at ``http://127.0.0.1:<port>/metrics`` in the
+Prometheus text format.
+"""
+import bisect
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+WINDOW = 256
+# Worker threads come and go with WebRTC sessions; drop their series once idle this long.
+SESSION_TTL = 300.0
+DEFAULT_PORT = int(os.environ.get("AISEE_METRICS_PORT", "9108"))
+
+_enabled = os.environ.get("AISEE_METRICS") == "1"
+_overlay = os.environ.get("AISEE_METRICS_OVERLAY") == "1"
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class StageStats:
+    def __init__(self):
+        self.window = deque(maxlen=WINDOW)
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def add(self, ms):
+        self.window.append(ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def percentile(self, q):
+        if not self.window:
+            return 0.0
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    def __init__(self, session_ttl=SESSION_TTL):
+        self._lock = threading.Lock()
+        self.session_ttl = session_ttl
+        self.stages = {}
+        self.frame_times = {}
+        self.last_seen = {}
+        self._last_evict = time.monotonic()
+
+    def _touch(self, stream, session):
+        now = time.monotonic()
+        self.last_seen[(stream, session)] = now
+        if now - self._last_evict >= min(self.session_ttl, 60.0):
+            self._evict_idle(now)
+
+    def _evict_idle(self, now):
+        idle = {key for key, seen in self.last_seen.items() if now - seen > self.session_ttl}
+        self._last_evict = now
+        if not idle:
+            return
+        for key in idle:
+            del self.last_seen[key]
+            self.frame_times.pop(key, None)
+        for key in [k for k in self.stages if k[:2] in idle]:
+            del self.stages[key]
+
+    def record(self, stream, session, stage, ms):
+        with self._lock:
+            stats = self.stages.get((stream, session, stage))
+            if stats is None:
+                stats = self.stages[(stream, session, stage)] = StageStats()
+            stats.add(ms)
+            self._touch(stream, session)
+
+    def tick_frame(self, stream, session):
+        with self._lock:
+            self._touch(stream, session)
+            times = self.frame_times.get((stream, session))
+            if times is None:
+                times = self.frame_times[(stream, session)] = deque(maxlen=60)
+            times.append(time.perf_counter())
+
+    def fps(self, stream, session):
+        with self._lock:
+            times = self.frame_times.get((stream, session))
+            if not times or len(times) < 2:
+                return 0.0
+            return (len(times) - 1) / max(times[-1] - times[0], 1e-6)
+
+    def summary(self, stream, session):
+        """Return {stage: (p50_ms, p95_ms)} for one session."""
+        with self._lock:
+            return {
+                stage: (stats.percentile(0.5), stats.percentile(0.95))
+                for (s, sess, stage), stats in self.stages.items()
+                if s == stream and sess == session
+            }
+
+    def prometheus(self):
+        lines = [
+            "# HELP aisee_stage_latency_ms Per-stage latency of video callbacks and training.",
+            "# TYPE aisee_stage_latency_ms histogram",
+        ]
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            items = list(self.stages.items())
+            sessions = list(self.frame_times)
+        for (stream, session, stage), stats in items:
+            labels = f'stream="{stream}",session="{session}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, stats.buckets):
+                cumulative += count
+                lines.append(f'aisee_stage_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'aisee_stage_latency_ms_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f"aisee_stage_latency_ms_sum{{{labels}}} {stats.total_ms:.3f}")
+            lines.append(f"aisee_stage_latency_ms_count{{{labels}}} {stats.count}")
+        lines.append("# TYPE aisee_stream_fps gauge")
+        for stream, session in sessions:
+            lines.append(f'aisee_stream_fps{{stream="{stream}",session="{session}"}} {self.fps(stream, session):.2f}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(overlay=None):
+    global _enabled, _overlay
+    _enabled = True
+    if overlay is not None:
+        _overlay = overlay
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def overlay_enabled():
+    return _enabled and _overlay
+
+
+def current_session():
+    """Each WebRTC session processes frames on its own worker thread."""
+    return threading.current_thread().name
+
+
+@contextlib.contextmanager
+def _timed_span(stream, stage, session):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.record(stream, session or current_session(), stage, (time.perf_counter() - start) * 1000)
+
+
+def span(stream, stage, session=None):
+    """Time the enclosed block as ``stage`` of ``stream``."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _timed_span(stream, stage, session)
+
+
+def timed(stream, stage):
+    """Decorator form of ``span``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _timed_span(stream, stage, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def frame_done(stream, session=None):
+    if _enabled:
+        registry.tick_frame(stream, session or current_session())
+
+
+def draw_overlay(img, stream, session=None):
+    """Draw FPS and per-stage p50/p95 latency in the top-left corner of ``img``."""
+    if not overlay_enabled():
+        return img
+    import cv2
+
+    session = session or current_session()
+    lines = [f"{stream} {registry.fps(stream, session):.1f} fps"]
+    for stage, (p50, p95) in sorted(registry.summary(stream, session).items()):
+        lines.append(f"{stage}: {p50:.1f}/{p95:.1f} ms")
+    for i, text in enumerate(lines):
+        y = 18 + i * 18
+        cv2.putText(img, text, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3)
+        cv2.putText(img, text, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return img
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; safe to call more than once."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
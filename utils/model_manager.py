@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import streamlit as st
+
+from utils import inference_profile
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATHS = {
+    "cheating": "model/cheating/yolov9m_finetuned.pt",
+    "person": "yolo11n.pt",
+    # Same weights as "person", loaded separately: ultralytics stores predict settings on
+    # the model, so the exam gate (imgsz 320) must not share attendance's instance.
+    "person_gate": "yolo11n.pt",
+    "emotion": "model/emotion/yolov11_finetuned.pt",
+}
+
+# Weights that ultralytics downloads on first use instead of shipping with the repo.
+DOWNLOADABLE = {"yolo11n.pt"}
+
+
+
+class ModelManager:
+    """Load and warm up YOLO models in a background thread and share them across sessions."""
+
+    def __init__(self, model_paths):
+        self.model_paths = dict(model_paths)
+        self.models = {}
+        self.status = {name: "pending" for name in self.model_paths}
+        self.errors = {}
+        self.timings = {name: {} for name in self.model_paths}
+        self._ready = {name: threading.Event() for name in self.model_paths}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load_all, name="model-preload", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load_all(self):
+        inference_profile.apply_threads()
+        for name in self.model_paths:
+            self._load(name)
+
+    def _load(self, name):
+        path = inference_profile.weights(name, self.model_paths[name])
+        try:
+            if not os.path.exists(path) and os.path.basename(path) not in DOWNLOADABLE:
+                raise FileNotFoundError(f"Model file not found at {path}.")
+
+            self.status[name] = "loading"
+            start = time.perf_counter()
+            from ultralytics import YOLO
+            # Exported weights (ONNX, OpenVINO) cannot infer their task from the file.
+            model = YOLO(path) if path == self.model_paths[name] else YOLO(path, task="detect")
+            self.timings[name]["load"] = time.perf_counter() - start
+
+            self.status[name] = "warming"
+            start = time.perf_counter()
+            imgsz = inference_profile.predict_kwargs(name)["imgsz"]
+            model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+            self.timings[name]["warmup"] = time.perf_counter() - start
+
+            self.models[name] = model
+            self.status[name] = "ready"
+            logger.info("Model %s ready (load %.2fs, warm-up %.2fs)", name,
+                        self.timings[name]["load"], self.timings[name]["warmup"])
+        except Exception as e:
+            self.status[name] = "error"
+            self.errors[name] = str(e)
+            logger.error("Failed to load model %s: %s", name, e)
+        finally:
+            self._ready[name].set()
+
+    def is_ready(self, name):
+        return self.status.get(name) == "ready"
+
+    def get(self, name, wait=True, timeout=None):
+        """Return the warmed model, or None if it is not available yet."""
+        self.start()
+        if wait:
+            self._ready[name].wait(timeout)
+        return self.models.get(name)
+
+    def report(self):
+        return {
+            name: {"status": self.status[name], "error": self.errors.get(name), **self.timings[name]}
+            for name in self.model_paths
+        }
+
+
+@st.cache_resource
+def get_model_manager():
+    return ModelManager(MODEL_PATHS).start()
+
+
+def render_model_status(names):
+    """Show readiness of the given models; returns True when all are ready."""
+    manager = get_model_manager()
+    report = manager.report()
+    for name in names:
+        entry = report[name]
+        if entry["status"] == "error":
+            st.error(f"Model '{name}' failed to load: {entry['error']}")
+        elif entry["status"] != "ready":
+            st.info(f"Model '{name}' is {entry['status']}... video will show annotations once it is ready.")
+    with st.expander("Model load timings"):
+        for name in names:
+            entry = report[name]
+            load = entry.get("load")
+            warmup = entry.get("warmup")
+            st.write(
+                f"{name}: {entry['status']}"
+                + (f" - load {load:.2f}s" if load is not None else "")
+                + (f", warm-up {warmup:.2f}s" if warmup is not None else "")
+            )
+    return all(report[name]["status"] == "ready" for name in names)
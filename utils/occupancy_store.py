@@ -0,0 +1,256 @@
+"""Append-only columnar store of seat enter/leave events.
+
+Events are buffered in memory and a background writer thread flushes them as
+small Parquet parts into one directory per day (``occupancy/date=YYYY-MM-DD/``),
+so ``append`` never touches the disk on the video callback thread. Every part
+is described by a line in that day's ``_index.jsonl`` (time range, seats,
+sessions), so range queries open only the parts that can contain matching rows
+and read only the columns they need. Queries also see the rows that are still
+in memory, without forcing a flush.
+"""
+import atexit
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = "occupancy"
+SCHEMA = pa.schema([
+    ("ts", pa.float64()),
+    ("seat", pa.string()),
+    ("session", pa.string()),
+    ("occupied", pa.bool_()),
+])
+
+
+class OccupancyStore:
+    def __init__(self, root=STORE_DIR, flush_rows=256, flush_seconds=30.0):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        # Rows taken from the buffer whose part is not in the index yet, by batch.
+        self._inflight = {}
+        self._batches = itertools.count()
+        self._lock = threading.Lock()
+        # Held while publishing a part to the index and while a query lists parts,
+        # so a query sees each row either in a part or in memory, never both.
+        self._visibility_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._due = threading.Event()
+        self._closed = False
+        self._part = 0
+        self._writer = threading.Thread(target=self._write_loop, name="occupancy-writer", daemon=True)
+        self._writer.start()
+
+    ### Writing ###
+    def append(self, seat, session, occupied, ts=None):
+        """Buffer one event; safe to call from a frame callback (no I/O)."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._buffer.append((ts, seat, session, bool(occupied)))
+            due = len(self._buffer) >= self.flush_rows
+        if due:
+            self._due.set()
+
+    def _write_loop(self):
+        while not self._closed:
+            self._due.wait(self.flush_seconds)
+            self._due.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Occupancy flush failed: %s", e)
+
+    def flush(self):
+        """Write buffered rows now (blocking); the writer thread does this on its own."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                if not rows:
+                    return
+                batch = next(self._batches)
+                self._inflight[batch] = rows
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d"), []).append(row)
+            entries = [(day, self._write_part(day, day_rows)) for day, day_rows in by_day.items()]
+            with self._visibility_lock:
+                for day, entry in entries:
+                    with open(os.path.join(self.root, f"date={day}", "_index.jsonl"), "a") as f:
+                        f.write(json.dumps(entry) + "\n")
+                with self._lock:
+                    del self._inflight[batch]
+
+    def close(self):
+        self._closed = True
+        self._due.set()
+        self.flush()
+
+    def _write_part(self, day, rows):
+        day_dir = os.path.join(self.root, f"date={day}")
+        os.makedirs(day_dir, exist_ok=True)
+        with self._lock:
+            self._part += 1
+            name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._part}.parquet"
+        ts, seats, sessions, occupied = zip(*rows)
+        table = pa.table({"ts": ts, "seat": seats, "session": sessions, "occupied": occupied}, schema=SCHEMA)
+        pq.write_table(table, os.path.join(day_dir, name))
+        return {
+            "file": name,
+            "rows": len(rows),
+            "min_ts": min(ts),
+            "max_ts": max(ts),
+            "seats": sorted(set(seats)),
+            "sessions": sorted(set(sessions)),
+        }
+
+    ### Reading ###
+    def _days(self, start, end):
+        day = datetime.fromtimestamp(start).date()
+        last = datetime.fromtimestamp(end).date()
+        while day <= last:
+            yield day.strftime("%Y-%m-%d")
+            day += timedelta(days=1)
+
+    def _parts(self, start, end, seats=None, session=None):
+        """Yield paths of parts whose index entry overlaps the filters."""
+        for day in self._days(start, end):
+            index_path = os.path.join(self.root, f"date={day}", "_index.jsonl")
+            if not os.path.exists(index_path):
+                continue
+            with open(index_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["max_ts"] < start or entry["min_ts"] > end:
+                        continue
+                    if seats is not None and not set(entry["seats"]) & set(seats):
+                        continue
+                    if session is not None and session not in entry["sessions"]:
+                        continue
+                    yield os.path.join(self.root, f"date={day}", entry["file"])
+
+    def _pending(self, start, end, seats=None, session=None):
+        """Rows still in memory (buffered or being written) that match the filters."""
+        with self._lock:
+            rows = list(self._buffer)
+            for batch in self._inflight.values():
+                rows.extend(batch)
+        frame = pd.DataFrame(rows, columns=SCHEMA.names).astype(
+            {name: t.to_pandas_dtype() for name, t in zip(SCHEMA.names, SCHEMA.types)})
+        keep = (frame["ts"] >= start) & (frame["ts"] <= end)
+        if seats is not None:
+            keep &= frame["seat"].isin(list(seats))
+        if session is not None:
+            keep &= frame["session"] == session
+        return frame[keep].reset_index(drop=True)
+
+    def iter_events(self, start, end, seats=None, session=None):
+        """Yield one DataFrame of events per matching part, then the unflushed rows, filtered to the range."""
+        filters = [("ts", ">=", start), ("ts", "<=", end)]
+        if seats is not None:
+            filters.append(("seat", "in", list(seats)))
+        if session is not None:
+            filters.append(("session", "==", session))
+        with self._visibility_lock:
+            paths = list(self._parts(start, end, seats, session))
+            pending = self._pending(start, end, seats, session)
+        for path in paths:
+            frame = pq.read_table(path, filters=filters).to_pandas()
+            if len(frame):
+                yield frame
+        if len(pending):
+            yield pending
+
+    def events(self, start, end, seats=None, session=None):
+        frames = list(self.iter_events(start, end, seats, session))
+        if not frames:
+            return pd.DataFrame({name: pd.Series(dtype=t.to_pandas_dtype()) for name, t in zip(SCHEMA.names, SCHEMA.types)})
+        return pd.concat(frames, ignore_index=True).sort_values("ts", kind="stable")
+
+    def intervals(self, start, end, seats=None, session=None, lookback=86400.0):
+        """Occupied intervals clipped to [start, end] as a DataFrame (seat, session, start, end).
+
+        Events up to ``lookback`` seconds before ``start`` are read so a seat that
+        was entered before the range and is still occupied is counted.
+        """
+        end = min(end, time.time())
+        frame = self.events(start - lookback, end, seats, session)
+        rows = []
+        for (seat, sess), group in frame.groupby(["seat", "session"], sort=False):
+            ts = group["ts"].to_numpy()
+            occupied = group["occupied"].to_numpy()
+            # Keep only state changes, then pair each enter with the following leave.
+            changes = np.concatenate(([True], occupied[1:] != occupied[:-1]))
+            ts, occupied = ts[changes], occupied[changes]
+            if len(occupied) and not occupied[0]:
+                ts = ts[1:]
+            enters = ts[0::2]
+            leaves = ts[1::2]
+            ends = np.full(len(enters), float(end))
+            ends[:len(leaves)] = leaves
+            starts = np.clip(enters, start, end)
+            ends = np.clip(ends, start, end)
+            keep = ends > starts
+            rows.extend((seat, sess, s, e) for s, e in zip(starts[keep], ends[keep]))
+        return pd.DataFrame(rows, columns=["seat", "session", "start", "end"])
+
+    def seat_time(self, start, end, seats=None, session=None):
+        """Total occupied seconds per seat within [start, end]."""
+        intervals = self.intervals(start, end, seats, session)
+        if intervals.empty:
+            return {}
+        return (intervals["end"] - intervals["start"]).groupby(intervals["seat"]).sum().to_dict()
+
+    def heatmap(self, start, end, seats=None, session=None, freq_seconds=60):
+        """Occupied fraction per seat and time bucket; rows are bucket start times, columns seats."""
+        intervals = self.intervals(start, end, seats, session)
+        edges = np.arange(start - start % freq_seconds, end + freq_seconds, freq_seconds)
+        columns = sorted(intervals["seat"].unique()) if not intervals.empty else []
+        grid = np.zeros((len(edges) - 1, len(columns)))
+        for col, seat in enumerate(columns):
+            seat_intervals = intervals[intervals["seat"] == seat]
+            for s, e in zip(seat_intervals["start"], seat_intervals["end"]):
+                overlap = np.minimum(edges[1:], e) - np.maximum(edges[:-1], s)
+                grid[:, col] += np.clip(overlap, 0, None)
+        # Label buckets in local time, like the day partitions and the CSV export.
+        index = pd.DatetimeIndex([datetime.fromtimestamp(edge) for edge in edges[:-1]])
+        return pd.DataFrame(np.clip(grid / freq_seconds, 0, 1), index=index, columns=columns)
+
+    def iter_csv(self, start, end, seats=None, session=None, chunk_rows=5000):
+        """Stream the raw event log, sorted by time, as CSV text chunks of ``chunk_rows`` rows."""
+        yield "Timestamp,Seat Label,Session,Event\n"
+        # Parts (and the unflushed rows) can overlap in time, so sort across all of them.
+        events = self.events(start, end, seats, session)
+        for offset in range(0, len(events), chunk_rows):
+            frame = events.iloc[offset:offset + chunk_rows]
+            out = io.StringIO()
+            writer = csv.writer(out)
+            for ts, seat, sess, occupied in zip(frame["ts"], frame["seat"], frame["session"], frame["occupied"]):
+                writer.writerow([datetime.fromtimestamp(ts).isoformat(), seat, sess, "enter" if occupied else "leave"])
+            yield out.getvalue()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_occupancy_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OccupancyStore()
+            atexit.register(_store.close)
+        return _store
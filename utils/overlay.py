@@ -0,0 +1,185 @@
+"""Metadata-only overlay mode for the YOLO video pages.
+
+Normally a frame callback draws boxes into the frame and returns a new
+``av.VideoFrame``, which aiortc then re-encodes for the browser. In overlay
+mode the page streams ``SENDONLY``: the server still decodes frames for
+inference, but it neither draws nor encodes. Instead the callback publishes
+a small list of shapes (box, caption, colour) under a per-session key. A
+``components.html`` preview in the browser shows the local camera and polls
+``<AISEE_OVERLAY_URL>/overlay/<key>``, drawing the shapes on a canvas scaled
+from the server's working-frame size.
+
+The endpoint listens on ``AISEE_OVERLAY_HOST:AISEE_OVERLAY_PORT``
+(127.0.0.1:9109 by default). ``AISEE_OVERLAY_URL`` is the address the
+browser uses for it. It must be reachable from the browser, and must be
+https when the app itself is served over https.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_HOST = os.environ.get("AISEE_OVERLAY_HOST", "127.0.0.1")
+OVERLAY_PORT = int(os.environ.get("AISEE_OVERLAY_PORT", "9109"))
+OVERLAY_URL = os.environ.get("AISEE_OVERLAY_URL", f"http://localhost:{OVERLAY_PORT}").rstrip("/")
+# Keys of streams that stopped publishing are dropped after this long.
+TTL = 60.0
+
+
+def css_color(bgr):
+    b, g, r = (int(c) for c in bgr)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def shape(box, color, text="", subtext=""):
+    """One overlay shape: an xyxy ``box`` in working-frame pixels, a BGR ``color`` and captions."""
+    x1, y1, x2, y2 = (round(float(v), 1) for v in box)
+    return {"box": [x1, y1, x2, y2], "color": css_color(color), "text": text, "subtext": subtext}
+
+
+class OverlayStore:
+    def __init__(self, ttl=TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._latest = {}
+
+    def publish(self, key, frame_shape, shapes):
+        height, width = frame_shape[:2]
+        now = time.time()
+        with self._lock:
+            seq = self._latest.get(key, {}).get("seq", 0) + 1
+            self._latest[key] = {"seq": seq, "ts": now, "width": width, "height": height, "shapes": shapes}
+            for stale in [k for k, v in self._latest.items() if now - v["ts"] > self.ttl]:
+                del self._latest[stale]
+
+    def get(self, key):
+        with self._lock:
+            return self._latest.get(key)
+
+
+store = OverlayStore()
+
+
+def publish(key, frame_shape, shapes):
+    store.publish(key, frame_shape, shapes)
+
+
+class _OverlayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        payload = store.get(parts[1]) if len(parts) == 2 and parts[0] == "overlay" else None
+        if payload is None:
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            return
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        # The preview runs in a component iframe with its own origin.
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_overlay_server(port=OVERLAY_PORT, host=OVERLAY_HOST):
+    """Serve /overlay/<key> on a daemon thread; safe to call more than once."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _OverlayHandler)
+            except OSError as e:
+                logger.warning("Overlay endpoint not started on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="overlay-server", daemon=True).start()
+    return _server
+
+
+def session_key(stream):
+    """Unguessable overlay key for ``stream`` in this browser session."""
+    keys = st.session_state.setdefault("overlay_keys", {})
+    if stream not in keys:
+        keys[stream] = f"{stream}-{secrets.token_urlsafe(12)}"
+    return keys[stream]
+
+
+_PREVIEW_HTML = """
+<div style="position:relative;width:100%">
+  <video id="video" autoplay muted playsinline style="width:100%;display:block;background:#000"></video>
+  <canvas id="canvas" style="position:absolute;left:0;top:0;width:100%;height:100%"></canvas>
+</div>
+<div id="status" style="font:12px sans-serif;color:#888"></div>
+<script>
+const url = __URL__, constraints = __CONSTRAINTS__, interval = __INTERVAL__;
+const video = document.getElementById("video"), canvas = document.getElementById("canvas");
+const status = document.getElementById("status"), ctx = canvas.getContext("2d");
+navigator.mediaDevices.getUserMedia(constraints)
+  .then((stream) => { video.srcObject = stream; })
+  .catch((e) => { status.textContent = "Camera preview unavailable: " + e; });
+
+function draw(meta) {
+  canvas.width = video.clientWidth;
+  canvas.height = video.clientHeight;
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  if (!meta) return;
+  const sx = canvas.width / meta.width, sy = canvas.height / meta.height;
+  ctx.lineWidth = 2;
+  ctx.font = "14px sans-serif";
+  for (const s of meta.shapes) {
+    const [x1, y1, x2, y2] = s.box;
+    ctx.strokeStyle = ctx.fillStyle = s.color;
+    ctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+    if (s.text) ctx.fillText(s.text, x1 * sx, Math.max(y1 * sy - 6, 12));
+    if (s.subtext) ctx.fillText(s.subtext, x1 * sx, y2 * sy + 16);
+  }
+}
+
+let seq = -1;
+async function poll() {
+  try {
+    const response = await fetch(url, { cache: "no-store" });
+    if (response.status === 200) {
+      const meta = await response.json();
+      if (meta.seq !== seq) { seq = meta.seq; draw(meta); }
+      status.textContent = "";
+    } else {
+      draw(null);
+    }
+  } catch (e) {
+    status.textContent = "Overlay endpoint unreachable at " + url;
+  }
+  setTimeout(poll, interval);
+}
+poll();
+</script>
+"""
+
+
+def render_overlay_preview(stream, profile, height=None):
+    """Local camera preview with server detections drawn on top; returns the session's overlay key."""
+    start_overlay_server()
+    key = session_key(stream)
+    html = (_PREVIEW_HTML
+            .replace("__URL__", json.dumps(f"{OVERLAY_URL}/overlay/{key}"))
+            .replace("__CONSTRAINTS__", json.dumps(profile.constraints()))
+            .replace("__INTERVAL__", str(max(1000 // profile.fps, 33))))
+    components.html(html, height=height or int(profile.height * 704 / profile.width) + 30)
+    return key
@@ -0,0 +1,69 @@
+"""Cheap person-detector gate in front of a heavier per-frame model.
+
+The gate runs a small person detector at low resolution and tells the caller
+whether to skip the heavy model, run it on a crop around the examinees, or run
+it on the full frame. To avoid missing incidents it keeps running the heavy
+model for a few frames after people disappear and audits the full frame
+periodically.
+"""
+import threading
+
+import numpy as np
+
+from utils.detections import DetectionBatch
+
+PERSON_CLASS = 0
+FULL_FRAME = "full"
+
+
+class PersonGate:
+    def __init__(self, imgsz=320, conf=0.25, margin=0.15, full_frame_ratio=0.6,
+                 grace_frames=15, audit_every=30):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.margin = margin
+        self.full_frame_ratio = full_frame_ratio
+        self.grace_frames = grace_frames
+        self.audit_every = audit_every
+        # Each WebRTC session calls back on its own thread, so counters are per session.
+        self._local = threading.local()
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, "frame_index"):
+            state.frame_index = 0
+            state.frames_since_person = self.grace_frames + 1
+            state.last_region = None
+        return state
+
+    def select_region(self, person_model, image):
+        """Return None to skip, FULL_FRAME, or an (x1, y1, x2, y2) crop for the heavy model."""
+        state = self._state()
+        state.frame_index += 1
+        if state.frame_index % self.audit_every == 0:
+            return FULL_FRAME
+
+        results = person_model.predict(image, imgsz=self.imgsz, conf=self.conf,
+                                       classes=[PERSON_CLASS], verbose=False)
+        boxes = DetectionBatch.from_result(results[0]).boxes if len(results) > 0 else np.zeros((0, 4))
+
+        height, width = image.shape[:2]
+        if len(boxes) == 0:
+            state.frames_since_person += 1
+            if state.frames_since_person <= self.grace_frames:
+                return state.last_region or FULL_FRAME
+            return None
+
+        state.frames_since_person = 0
+        x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+        x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+        mx, my = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+        region = (
+            int(max(x1 - mx, 0)), int(max(y1 - my, 0)),
+            int(min(x2 + mx, width)), int(min(y2 + my, height)),
+        )
+        area = (region[2] - region[0]) * (region[3] - region[1])
+        if area >= self.full_frame_ratio * width * height:
+            region = FULL_FRAME
+        state.last_region = region
+        return region
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+
+from utils.tracking import IoUTracker, xywh_to_xyxy
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTimeline:
+    """Per-student presence intervals stored as [start, end] pairs."""
+
+    def __init__(self, gap_tolerance=10.0):
+        self.gap_tolerance = gap_tolerance
+        self.intervals = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name, ts=None):
+        """Record that a student was seen at ``ts``."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            spans = self.intervals.setdefault(name, [])
+            if spans and ts - spans[-1][1] <= self.gap_tolerance:
+                spans[-1][1] = ts
+            else:
+                spans.append([ts, ts])
+
+    def total_seconds(self, name):
+        with self._lock:
+            return sum(end - start for start, end in self.intervals.get(name, []))
+
+    def snapshot(self):
+        with self._lock:
+            return {name: [list(span) for span in spans] for name, spans in self.intervals.items()}
+
+    def flush(self, now=None):
+        """Pop closed intervals, keeping the open one of each student."""
+        now = time.time() if now is None else now
+        flushed = {}
+        with self._lock:
+            for name, spans in self.intervals.items():
+                closed = [span for span in spans if now - span[1] > self.gap_tolerance]
+                if closed:
+                    flushed[name] = closed
+                    self.intervals[name] = spans[len(closed):]
+        return flushed
+
+    def flush_all(self):
+        with self._lock:
+            flushed = {name: spans for name, spans in self.intervals.items() if spans}
+            self.intervals = {}
+        return flushed
+
+
+class PresenceScheduler(threading.Thread):
+    """Periodically re-identify faces from the latest frame of a stream.
+
+    Faces are tracked between ticks so the recognizer only runs on tracks that
+    are new or still unidentified; known tracks reuse their cached identity.
+    ``frame_source`` returns ``(timestamp, gray)``; a frame older than one
+    interval means the stream has stalled, and nobody is marked present from it.
+    With no fresh frame for ``idle_timeout`` seconds (the page was left or the
+    stream closed) the scheduler flushes and stops. ``key`` identifies what the
+    scheduler serves, so callers can tell when it must be replaced.
+    """
+
+    def __init__(self, frame_source, detect_faces, identify_face, interval=2.0,
+                 flush_interval=60.0, retry_interval=5.0, sink=None, timeline=None,
+                 idle_timeout=60.0, key=None):
+        super().__init__(daemon=True)
+        self.key = key
+        self.idle_timeout = idle_timeout
+        self.last_frame = time.time()
+        self.frame_source = frame_source
+        self.detect_faces = detect_faces
+        self.identify_face = identify_face
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.sink = sink
+        self.timeline = timeline or PresenceTimeline(gap_tolerance=max(3 * interval, 10.0))
+        self.tracker = IoUTracker(iou_threshold=0.3, max_missed=2)
+        self.identities = {}
+        self._last_attempt = {}
+        self._stop_event = threading.Event()
+        self.recognitions = 0
+        self.ticks = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def set_interval(self, interval):
+        self.interval = interval
+        self.timeline.gap_tolerance = max(3 * interval, 10.0)
+
+    @property
+    def running(self):
+        return self.is_alive() and not self._stop_event.is_set()
+
+    def tick(self, now=None):
+        """Run one re-verification pass over the latest frame."""
+        now = time.time() if now is None else now
+        frame = self.frame_source()
+        if frame is None:
+            return
+        frame_ts, gray = frame
+        if gray is None or now - frame_ts > max(self.interval, 1.0):
+            return
+        self.last_frame = now
+        self.ticks += 1
+        faces = self.detect_faces(gray)
+        tracks, _ = self.tracker.update(xywh_to_xyxy(faces))
+
+        live_ids = set(self.tracker.tracks)
+        for track_id in list(self.identities):
+            if track_id not in live_ids:
+                del self.identities[track_id]
+                self._last_attempt.pop(track_id, None)
+
+        for track in tracks:
+            name = self.identities.get(track.track_id)
+            if name is None:
+                if now - self._last_attempt.get(track.track_id, 0.0) < self.retry_interval:
+                    continue
+                self._last_attempt[track.track_id] = now
+                x1, y1, x2, y2 = track.box.astype(int)
+                face = gray[max(y1, 0):y2, max(x1, 0):x2]
+                if face.size == 0:
+                    continue
+                self.recognitions += 1
+                name = self.identify_face(face)
+                if name is None:
+                    continue
+                self.identities[track.track_id] = name
+            self.timeline.mark(name, now)
+
+    def _flush(self, flushed):
+        if flushed and self.sink is not None:
+            try:
+                self.sink(flushed)
+            except Exception as e:
+                logger.warning("Presence flush failed: %s", e)
+
+    def run(self):
+        last_flush = time.time()
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning("Presence re-verification failed: %s", e)
+            if time.time() - last_flush >= self.flush_interval:
+                self._flush(self.timeline.flush())
+                last_flush = time.time()
+            if time.time() - self.last_frame > self.idle_timeout:
+                logger.info("Presence stream idle for %.0fs; stopping.", self.idle_timeout)
+                break
+        self._flush(self.timeline.flush_all())
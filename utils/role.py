@@ -1,23 +1,11 @@
-import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore, initialize_app
-from firebase_admin.auth import verify_id_token
 import os
+from utils.user_directory import get_user_directory
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(st.secrets["FIREBASE_SERVICE_ACCOUNT"].to_dict())
-    initialize_app(cred)
-
-db = firestore.client()
-
 def get_user_info(username: str):
-    users_ref = db.collection("users")
-    query = users_ref.where("username", "==", username).limit(1).stream()
-
-    for user in query:
-        user_data = user.to_dict()
+    _, user_data = get_user_directory().find_by_username(username)
+    if user_data:
         return user_data.get("password", None), user_data.get("role", None)
-    
+
     return None, None
\ No newline at end of file
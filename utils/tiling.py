@@ -0,0 +1,81 @@
+"""Seat-aware tiled inference for high-resolution classroom cameras.
+
+Only tiles that cover configured seat regions are run through the model, in a
+single batch, and the detections are merged back into frame coordinates.
+"""
+import functools
+import math
+
+import numpy as np
+
+from utils.detections import DetectionBatch
+from utils.tracking import iou_matrix
+
+
+def _expand(region, margin, width, height):
+    x, y, w, h = region
+    mx, my = w * margin, h * margin
+    return (max(x - mx, 0), max(y - my, 0), min(x + w + mx, width), min(y + h + my, height))
+
+
+@functools.lru_cache(maxsize=32)
+def plan_tiles(regions, frame_shape, tile_size=640, margin=0.5):
+    """Return xyxy tiles (ints) that together cover every seat region plus a margin.
+
+    ``regions`` is a tuple of (x, y, w, h) seat rectangles and ``frame_shape``
+    the (height, width) of the frame. Seats are grouped greedily, top-left first,
+    into ``tile_size`` squares; a seat larger than a tile gets its own tile.
+    """
+    height, width = frame_shape[:2]
+    boxes = sorted((_expand(r, margin, width, height) for r in regions), key=lambda b: (b[1], b[0]))
+    tiles = []
+    remaining = list(boxes)
+    while remaining:
+        x1, y1, x2, y2 = remaining.pop(0)
+        # Floor the start and ceil the end so a fractional seat edge stays inside its tile.
+        size_w = max(tile_size, math.ceil(x2) - math.floor(x1))
+        size_h = max(tile_size, math.ceil(y2) - math.floor(y1))
+        tx1 = math.floor(min(max(x1, 0), max(width - size_w, 0)))
+        ty1 = math.floor(min(max(y1, 0), max(height - size_h, 0)))
+        tx2 = min(tx1 + size_w, width)
+        ty2 = min(ty1 + size_h, height)
+        tiles.append((tx1, ty1, tx2, ty2))
+        remaining = [b for b in remaining if not (b[0] >= tx1 and b[1] >= ty1 and b[2] <= tx2 and b[3] <= ty2)]
+    return tuple(tiles)
+
+
+def tiles_worthwhile(tiles, frame_shape):
+    """Tiling only pays off when the tiles cover less than the whole frame."""
+    height, width = frame_shape[:2]
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in tiles)
+    return 0 < area < width * height
+
+
+def nms(boxes, scores, class_ids, iou_threshold=0.5):
+    """Class-aware greedy non-maximum suppression; returns kept indices."""
+    order = np.argsort(-scores)
+    keep = []
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    ious = iou_matrix(boxes, boxes)
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= (ious[i] > iou_threshold) & (class_ids == class_ids[i])
+    return np.array(keep, dtype=np.int64)
+
+
+def tiled_predict(model, img, tiles, tile_size=640, **predict_kwargs):
+    """Run ``model`` on the given tiles as one batch.
+
+    Returns a DetectionBatch in frame coordinates.
+    """
+    crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    results = model.predict(crops, imgsz=tile_size, verbose=False, **predict_kwargs)
+    batch = DetectionBatch.concatenate(
+        DetectionBatch.from_result(result).mapped(offset=(x1, y1))
+        for (x1, y1, _, _), result in zip(tiles, results)
+    )
+    if len(batch) == 0:
+        return batch
+    return batch[nms(batch.boxes, batch.scores, batch.class_ids)]
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def xywh_to_xyxy(boxes):
+    """Convert (x, y, w, h) boxes to (x1, y1, x2, y2)."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    out = boxes.copy()
+    out[:, 2] = boxes[:, 0] + boxes[:, 2]
+    out[:, 3] = boxes[:, 1] + boxes[:, 3]
+    return out
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two sets of xyxy boxes."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.missed = 0
+        self.age = 0
+
+
+class IoUTracker:
+    """Greedy IoU tracker that keeps stable IDs for boxes across frames."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = {}
+        self._next_id = 1
+
+    def update(self, boxes):
+        """Match xyxy boxes to tracks and return (tracks, new_track_ids)."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        track_ids = list(self.tracks.keys())
+        track_boxes = np.array([self.tracks[t].box for t in track_ids], dtype=np.float32).reshape(-1, 4)
+        ious = iou_matrix(track_boxes, boxes)
+
+        matched_tracks = set()
+        matched_boxes = set()
+        if ious.size:
+            for flat in np.argsort(-ious, axis=None):
+                ti, bi = np.unravel_index(flat, ious.shape)
+                if ious[ti, bi] < self.iou_threshold:
+                    break
+                if ti in matched_tracks or bi in matched_boxes:
+                    continue
+                track = self.tracks[track_ids[ti]]
+                track.box = boxes[bi]
+                track.missed = 0
+                track.age += 1
+                matched_tracks.add(ti)
+                matched_boxes.add(bi)
+
+        for ti, track_id in enumerate(track_ids):
+            if ti not in matched_tracks:
+                track = self.tracks[track_id]
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+
+        new_ids = []
+        for bi, box in enumerate(boxes):
+            if bi not in matched_boxes:
+                track = Track(self._next_id, box)
+                self.tracks[track.track_id] = track
+                new_ids.append(track.track_id)
+                self._next_id += 1
+
+        visible = [t for t in self.tracks.values() if t.missed == 0]
+        return visible, new_ids
+
+    def reset(self):
+        self.tracks.clear()
@@ -0,0 +1,112 @@
+"""Single-flight background jobs with staged progress.
+
+A ``JobRunner`` runs its target in a daemon thread and hands every caller the
+same ``Job`` while one is in flight, so two sessions that ask for training
+at once share a single run. The target receives the job and reports progress
+through ``job.stage(name, total)`` / ``job.advance()``. Anything it returns
+is the job's result, and any exception marks the job failed. Whatever the
+job replaces (e.g. the loaded recognizer) stays in use until the target
+swaps it in at the very end.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRAINING_STAGES = ("listing", "fetching", "detecting", "training", "writing")
+
+
+class Job:
+    def __init__(self, job_id, stages):
+        self.id = job_id
+        self.stages = tuple(stages)
+        self.state = "running"
+        self.current_stage = None
+        self.done = 0
+        self.total = None
+        self.warnings = []
+        self.error = None
+        self.result = None
+        self.started = time.time()
+        self.finished = None
+        self._finished = threading.Event()
+
+    ### Reporting (called from the job thread) ###
+    def stage(self, name, total=None):
+        self.current_stage = name
+        self.done = 0
+        self.total = total
+
+    def advance(self, count=1):
+        self.done += count
+
+    def warn(self, message):
+        logger.warning("Job %s: %s", self.id, message)
+        self.warnings.append(message)
+
+    ### Status (called from any thread) ###
+    @property
+    def running(self):
+        return self.state == "running"
+
+    def fraction(self):
+        """Overall progress in [0, 1], counting each stage as an equal share."""
+        if not self.running:
+            return 1.0
+        if self.current_stage not in self.stages:
+            return 0.0
+        index = self.stages.index(self.current_stage)
+        within = min(self.done / self.total, 1.0) if self.total else 0.0
+        return (index + within) / len(self.stages)
+
+    def describe(self):
+        if self.state == "failed":
+            return f"failed: {self.error}"
+        if self.state == "succeeded":
+            return f"finished in {self.finished - self.started:.1f}s"
+        if self.current_stage is None:
+            return "starting"
+        count = f" {self.done}/{self.total}" if self.total else ""
+        return f"{self.current_stage}{count}"
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+
+class JobRunner:
+    """Run ``target(job)`` in the background, at most one at a time."""
+
+    def __init__(self, name, target, stages=TRAINING_STAGES):
+        self.name = name
+        self.target = target
+        self.stages = stages
+        self.job = None
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start a job, or return the one already running."""
+        with self._lock:
+            if self.job is not None and self.job.running:
+                return self.job
+            self._runs += 1
+            job = self.job = Job(f"{self.name}-{self._runs}", self.stages)
+        threading.Thread(target=self._run, args=(job,), name=job.id, daemon=True).start()
+        return job
+
+    def _run(self, job):
+        try:
+            job.result = self.target(job)
+            job.state = "succeeded"
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished = time.time()
+            job._finished.set()
+
+    def current(self):
+        """The running job, or the last one to finish, or None."""
+        return self.job
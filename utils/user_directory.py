@@ -0,0 +1,176 @@
+"""Process-wide, in-memory index of the ``users`` collection.
+
+The collection is loaded once and kept current by a Firestore snapshot
+listener, so logins and name lookups are dictionary reads. Staleness is
+bounded two ways:
+
+* a lookup that misses falls back to a single Firestore query, so a user
+  created a moment ago can log in before the listener delivers them;
+* if the listener has failed (it could not be opened, its stream closed or
+  the snapshot callback raised) and nothing has been delivered for
+  ``max_staleness`` seconds, the next lookup triggers a background reload and
+  resubscription. A healthy listener on a quiet collection is left alone.
+
+Pass a ``MemoryFirestore`` as ``db`` to use it without Firebase.
+"""
+import logging
+import threading
+import time
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "users"
+
+
+class UserDirectory:
+    def __init__(self, db, max_staleness=300.0):
+        self.db = db
+        self.max_staleness = max_staleness
+        self.by_id = {}
+        self.by_username = {}
+        self.by_name = {}
+        self.last_update = 0.0
+        self._lock = threading.RLock()
+        self._watch = None
+        self._listener_error = None
+        self._reloading = False
+
+    ### Index maintenance ###
+    def _index(self, doc_id, data):
+        self._unindex(doc_id)
+        self.by_id[doc_id] = data
+        if data.get("username"):
+            self.by_username[data["username"]] = doc_id
+        if data.get("name"):
+            self.by_name.setdefault(data["name"], set()).add(doc_id)
+
+    def _unindex(self, doc_id):
+        old = self.by_id.pop(doc_id, None)
+        if old is None:
+            return
+        if self.by_username.get(old.get("username")) == doc_id:
+            del self.by_username[old["username"]]
+        ids = self.by_name.get(old.get("name"))
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self.by_name[old["name"]]
+
+    def _replace_all(self, docs):
+        with self._lock:
+            self.by_id, self.by_username, self.by_name = {}, {}, {}
+            for doc in docs:
+                self._index(doc.id, doc.to_dict() or {})
+            self.last_update = time.time()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        try:
+            self._apply_snapshot(docs, changes)
+        except Exception as e:
+            # Firestore closes the watch when the callback raises; remember it so lookups reload.
+            logger.warning("User directory listener failed: %s", e)
+            self._listener_error = e
+            raise
+
+    def _apply_snapshot(self, docs, changes):
+        if not changes:
+            self._replace_all(docs)
+            return
+        with self._lock:
+            for change in changes:
+                kind = getattr(change.type, "name", str(change.type))
+                if kind == "REMOVED":
+                    self._unindex(change.document.id)
+                else:
+                    self._index(change.document.id, change.document.to_dict() or {})
+            self.last_update = time.time()
+
+    ### Lifecycle ###
+    def start(self):
+        """Load the collection and subscribe to changes; returns self."""
+        self._replace_all(self.db.collection(COLLECTION).stream())
+        self._subscribe()
+        return self
+
+    def _subscribe(self):
+        self._listener_error = None
+        try:
+            self._watch = self.db.collection(COLLECTION).on_snapshot(self._on_snapshot)
+        except Exception as e:
+            logger.warning("User directory listener unavailable (%s); relying on periodic reloads.", e)
+            self._watch = None
+
+    def listener_healthy(self):
+        """True while the snapshot listener is open and has not failed."""
+        if self._watch is None or self._listener_error is not None:
+            return False
+        # google-cloud-firestore's Watch sets _closed once its stream ends or errors.
+        return not getattr(self._watch, "_closed", False)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _reload(self):
+        try:
+            self.stop()
+            self._replace_all(self.db.collection(COLLECTION).stream())
+            self._subscribe()
+        except Exception as e:
+            logger.warning("User directory reload failed: %s", e)
+        finally:
+            self._reloading = False
+
+    def _check_staleness(self):
+        with self._lock:
+            if self._reloading or self.listener_healthy():
+                return
+            if time.time() - self.last_update < self.max_staleness:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="user-directory-reload", daemon=True).start()
+
+    def _fallback(self, field, value):
+        """Query Firestore directly for a key the index does not have, and index what it finds."""
+        found = []
+        for doc in self.db.collection(COLLECTION).where(field, "==", value).stream():
+            with self._lock:
+                self._index(doc.id, doc.to_dict() or {})
+            found.append(doc.id)
+        return found
+
+    ### Lookups ###
+    def get(self, user_id):
+        self._check_staleness()
+        with self._lock:
+            return self.by_id.get(user_id)
+
+    def find_by_username(self, username):
+        """Return (user_id, data) for ``username``, or (None, None)."""
+        self._check_staleness()
+        with self._lock:
+            user_id = self.by_username.get(username)
+        if user_id is None:
+            found = self._fallback("username", username)
+            user_id = found[0] if found else None
+        with self._lock:
+            return (user_id, self.by_id.get(user_id)) if user_id else (None, None)
+
+    def ids_by_name(self, name):
+        self._check_staleness()
+        with self._lock:
+            ids = sorted(self.by_name.get(name, ()))
+        return ids or sorted(self._fallback("name", name))
+
+    def user_id_by_name(self, name):
+        ids = self.ids_by_name(name)
+        return ids[0] if ids else None
+
+
+@st.cache_resource
+def get_user_directory():
+    from utils.clients import get_db
+    return UserDirectory(get_db()).start()
@@ -0,0 +1,63 @@
+"""Per-page capture profiles for the WebRTC streams.
+
+A profile asks the browser for a resolution and frame rate through
+``media_stream_constraints``. The server enforces it regardless of what
+arrives: ``working_frame`` scales oversize frames down while converting them
+to BGR (one libswscale pass), so everything after that works at a fixed size.
+That frame (or a crop of it) goes to the model as is; the model's own
+letterbox fits it to ``imgsz``. ``map_boxes`` brings detections from crops or
+scaled inputs back to working-frame coordinates for drawing.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class VideoProfile(NamedTuple):
+    width: int
+    height: int
+    fps: int
+
+    def constraints(self):
+        return {
+            "video": {
+                "width": {"ideal": self.width},
+                "height": {"ideal": self.height},
+                "frameRate": {"ideal": self.fps, "max": self.fps},
+            },
+            "audio": False,
+        }
+
+
+PROFILES = {
+    # Shown at 720p; the model's letterbox fits it to the cheating model's imgsz.
+    "exam_supervisor": VideoProfile(1280, 720, 15),
+    "attendance_monitoring": VideoProfile(640, 480, 15),
+    # Hall cameras keep full resolution so tiled inference can see distant seats.
+    "attendance_hall": VideoProfile(1920, 1080, 10),
+    "face_registration": VideoProfile(640, 480, 15),
+    "face_verification": VideoProfile(640, 480, 15),
+}
+
+
+def fit_size(width, height, profile):
+    """Size of a ``width`` x ``height`` frame scaled down (never up) to fit the profile."""
+    scale = min(profile.width / width, profile.height / height, 1.0)
+    # Even dimensions keep libswscale on its fast paths.
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def working_frame(frame, profile):
+    """Convert an ``av.VideoFrame`` to a BGR array no larger than the profile."""
+    width, height = fit_size(frame.width, frame.height, profile)
+    if (width, height) == (frame.width, frame.height):
+        return frame.to_ndarray(format="bgr24")
+    return frame.reformat(width=width, height=height, format="bgr24").to_ndarray()
+
+
+def map_boxes(boxes, scale=1.0, offset=(0, 0)):
+    """Map (N, 4) xyxy boxes from a scaled, offset model input back to working-frame coordinates."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) / scale
+    boxes[:, [0, 2]] += offset[0]
+    boxes[:, [1, 3]] += offset[1]
+    return boxes